@@ -1,53 +1,54 @@
 #!python3
 
 from typing import NamedTuple
-import re
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import functools
+import itertools
+import hashlib
 import json
 import time
 import os
 import shutil
 import logging
+import threading
 import traceback
 import glob
+import filecmp
 from pathlib import Path
+from . import vdf, scan, store, archive, chunks, verify, inotify
+from .cache import FileCache, RootsCache
+from .library import LibraryIndex
+from .store import ObjectStore
+from .copier import Copier
+from .progress import Progress, Cancelled
+from .catalog import Catalog
+from .dirty import DirtyTracker
+from .governor import IoGovernor
+from . import retention
 
 
 logger = None
 
-"""Try to parse a valve vdf file.  Returning all key/value pairs it finds as string pairs.
-If no matching keys are found or we fail reading the file, an empty dict will be returned
-Note: this doesn't preserve hierarchy - only keys are checked
+"""Try to parse a valve appmanifest (.acf) file.  Returning the contents of its top level "AppState" block.
+If we fail reading the file, an empty dict will be returned
 """
 
 
-def _parse_vcf(path: str) -> dict:
-    kvMatch = re.compile(r'\s*"(.+)"\s+"(.+)"\s*')
-    d = {}
+def _parse_acf(path: str, cache: FileCache) -> dict:
     try:
-        with open(path) as f:
-            for line in f:
-                # ignore leading/trailing space.  Now ideal like looks like "key"   "value"
-                m = kvMatch.fullmatch(line)
-                if m:
-                    d[m.group(1)] = m.group(2)
+        return vdf.root_block(cache.get(path, vdf.load_file))
     except FileNotFoundError:
         logger.warning(f'App for { path } is not currently mounted, skipping')
     except Exception:
         logger.error(
             f'Failed parsing vcf { path } due to exception { traceback.format_exc() }')
-    return d
+    return {}
 
 
-def _parse_libs(path: str) -> list[str]:
-    kvMatch = re.compile(r'\s*"path"\s+"(.+)"\s*')
-    d = []
-    with open(path) as f:
-        for line in f:
-            # ignore leading/trailing space.  Now ideal like looks like "key"   "value"
-            m = kvMatch.fullmatch(line)
-            if m:
-                d.append(m.group(1))
-    return d
+def _parse_libs(path: str, cache: FileCache) -> list[str]:
+    libs = vdf.root_block(cache.get(path, vdf.load_file))
+    return [v["path"] for v in libs.values() if isinstance(v, dict) and "path" in v]
 
 
 class Config(NamedTuple):
@@ -73,13 +74,76 @@ class Engine:
 
         # a dict from gameid -> gameinfo for all installed games.  ONLY USED ON DESKTOP not DECKY
         self.all_games = None
+        self.library_index = LibraryIndex()  # used to keep all_games up to date
+
+        # picks the fastest way to copy files between each pair of filesystems
+        self.copier = Copier()
+
+        # All blocking work runs on these (rather than on the event loop).  Backups of different games can run at
+        # once (on _backup_executor), everything else runs one job at a time.  Operations on the same game never
+        # overlap (see _game_lock) and garbage collection waits until nothing else is running (see _request_gc).
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="steamback_io")
+        self._backup_executor = ThreadPoolExecutor(
+            max_workers=4, thread_name_prefix="steamback_backup")
+        self._game_locks = {}  # game_id -> threading.Lock
+        self._game_locks_lock = threading.Lock()
+        self._busy = 0  # how many blocking jobs are running
+        self._busy_cond = threading.Condition()
+        # the objects and chunks of deleted snapshots, to delete once no job is running if nothing else uses them
+        self._gc_objects: set[str] = set()
+        self._gc_chunks: set[str] = set()
+        self.progress = None  # the Progress of the current (or last) backup or restore
+        # limits the disk bandwidth of our background work (backups, culling, scrubbing), especially while games run
+        self.governor = IoGovernor()
+        self._local = threading.local()  # .progress is the Progress of the job running on this thread
+        self._catalog = None  # opened on first use by _get_catalog
+
+        # the deduplicated contents of all our snapshots
+        self.store = ObjectStore(os.path.join(
+            config.app_data_dir, "objects"), self.copier.copy2)
         self.account_ids: set[int] = set()
         self.dry_run = False  # Set to true to suppress 'real' writes to directories
-        self.max_saves = 10  # default to a max of ten saves
+        self.max_saves = 10  # by default keep the newest this many saves of each game (None for no limit)
+        # game_id -> retention.Policy, for games which need something other than default_retention
+        self.retention: dict[int, retention.Policy] = {}
+        self.default_retention: retention.Policy = None  # if None keep the newest max_saves
+        self.quota_bytes: int = None  # if set, delete the oldest saves (but never a game's newest) to stay below this
+        # if True, snapshot directories only contain the files that changed since the previous snapshot (the rest are
+        # only listed in the manifest).  Such snapshots can't be restored by steamback versions older than this.
+        self.incremental_snapshots = False
+        self.differential_restore = True  # restores only write the files which differ from the snapshot
+        # "dir" stores snapshots as directories (deduplicated with our object store), "archive" as compressed .sbar
+        # files (which steamback versions older than this can't restore)
+        self.snapshot_format = "dir"
+        # if set, files of at least this many bytes are split into content defined chunks (stored in chunk_store), so
+        # a big save which only changed in a few places only needs space for the changed chunks.  Such snapshots
+        # can't be restored by steamback versions older than this.
+        self.chunk_threshold: int = None
+        self.chunk_store = ObjectStore(os.path.join(
+            config.app_data_dir, "chunks"), self.copier.copy2)
+        # while a game runs (see watch_game) note which of its save files are written, so the backup when it exits
+        # only needs to look at those
+        self.track_dirty = True
+        self._trackers = {}  # game_id -> (filename of the snapshot it compares against, DirtyTracker)
+        self.verify_threads = 4  # how many files we hash at once when verifying a snapshot
+        self.scrub_bytes_per_sec = 8 * 1024 * 1024  # how fast background verification (scrubbing) may read
+        self.scan_time_budget = 10.0  # max secs we spend scanning the files of any one game for autoclouds
+        self.concurrent_scan = True  # scan games in parallel in find_supported (one thread pool per storage device)
+        self.scan_threads = 8  # max threads scanning an internal drive
+        self.scan_threads_removable = 2  # max threads for a removable device, SD cards are slow at random reads
+        self._device_executors = {}  # st_dev -> the ThreadPoolExecutor scanning games on that device
 
         # don't generate backups if the files haven't changed since last backup
         self.ignore_unchanged = True
 
+        # parsed appmanifest, libraryfolders and remotecache files (so we don't keep reparsing them)
+        self.vdf_cache = FileCache()
+
+        # the save_games_roots we found on previous runs
+        self.roots_cache = RootsCache(os.path.join(
+            config.app_data_dir, "save_roots.json"))
+
     def add_account_id(self, id_num: int):
         logger.debug(f'Setting account id { id_num } on { self }')
         self.account_ids.add(id_num)
@@ -110,6 +174,17 @@ class Engine:
         # logger.debug(f'Using saves directory { p }')
         return p
 
+    """
+    Return our index of the snapshots in the saves directory
+    """
+
+    def _get_catalog(self) -> Catalog:
+        if not self._catalog:
+            saves_dir = self._get_savesdir()
+            self._catalog = Catalog(os.path.join(self.config.app_data_dir, "catalog.sqlite"),
+                                    saves_dir, self._load_all_saveinfos)
+        return self._catalog
+
     """
     Return the steam root directory
     """
@@ -153,8 +228,8 @@ class Engine:
 
     def _parse_installdir(self, game_info: dict) -> str:
         app_dir = self._get_steamapps_dir(game_info)
-        vcf = _parse_vcf(os.path.join(
-            app_dir, f'appmanifest_{ game_info["game_id"] }.acf'))
+        vcf = _parse_acf(os.path.join(
+            app_dir, f'appmanifest_{ game_info["game_id"] }.acf'), self.vdf_cache)
         install_dir = vcf.get("installdir", None)
         return install_dir
 
@@ -164,40 +239,18 @@ class Engine:
     def _get_all_library(self) -> list[str]:
         steam_dir = self.get_steam_root()
         app_dir = os.path.join(steam_dir, "steamapps")
-        return _parse_libs(os.path.join(app_dir, "libraryfolders.vdf"))
+        return _parse_libs(os.path.join(app_dir, "libraryfolders.vdf"), self.vdf_cache)
 
     """Return all games that can be found on this system (only used for python apps - when in Decky this comes from JS)
     """
 
     def find_all_game_info(self) -> list[dict]:
-        r = []
-        rdict = {}  # a dict from game id int to the gameinfo object
-        for steam_dir in self._get_all_library():
-            app_dir = os.path.join(steam_dir, "steamapps")
-            files = []  # default to assume no files
-            try:
-                files = filter(lambda f: f.startswith("appmanifest_")
-                               and f.endswith(".acf"), os.listdir(app_dir))
-            except Exception as e:
-                logger.warning(
-                    f'Skipping invalid library directory { app_dir } due to { e }')
-
-            for f in files:
-                vcf = _parse_vcf(os.path.join(app_dir, f))
-                id = vcf.get("appid", None)
-                name = vcf.get("name", None)
-                if id and name:
-                    id = int(id)
-                    info = {
-                        # On a real steamdeck there may be multiple install_roots (main vs sdcard etc) (but only one per game)
-                        "install_root": steam_dir,
-                        "game_id": id,
-                        "game_name": name,
-                    }
-                    r.append(info)
-                    rdict[id] = info
-
-        self.all_games = rdict
+        if self.all_games is None:
+            self.all_games = {}
+        r = self.library_index.update(self._get_all_library(), self.all_games,
+                                      lambda path: _parse_acf(path, self.vdf_cache))
+        logger.debug(
+            f'Found { len(r) } games, { self.library_index.parsed } manifests parsed so far')
         return r
 
     """
@@ -222,19 +275,19 @@ class Engine:
         return rootdir
 
     """
-    Find all directories that contain steam_autocloud.vdf files or None
+    Find all directories that contain steam_autocloud.vdf files, returns a scan.ScanResult
     """
 
-    def _find_autoclouds(self, game_info: dict, is_linux_game: bool) -> list[str]:
+    def _find_autoclouds(self, game_info: dict, is_linux_game: bool, deadline: float = None) -> scan.ScanResult:
         root_dir = self._get_game_saves_root(game_info, is_linux_game)
 
-        p = Path(root_dir)
-        files = p.rglob("steam_autocloud.vdf")
         # we want the directories that contained the autocloud
-        dirs = list(map(lambda f: str(f.parent), files))
+        r = scan.find_dirs_containing(
+            root_dir, "steam_autocloud.vdf", deadline=deadline)
 
-        logger.debug(f'Autoclouds in { root_dir } are { dirs }')
-        return dirs
+        logger.debug(
+            f'Autoclouds in { root_dir } are { r.dirs } (visited { r.dirs_visited } dirs)')
+        return r
 
     """
     Try to figure out where this game stores its save files. return that path or None
@@ -319,9 +372,10 @@ class Engine:
 
     """
     Try to figure out where this game stores its save files. return a (possibly empty) list of candidate directories we found
+    and whether our search was complete (False if we had to give up on part of the autocloud scan)
     """
 
-    def _find_save_games(self, game_info, rcf: list[str]) -> list[str]:
+    def _find_save_games(self, game_info, rcf: list[str]) -> tuple[list[str], bool]:
         dirs = self._get_gamedir(game_info["game_id"])
 
         foundDirs = []
@@ -339,7 +393,7 @@ class Engine:
         # finding saves only work if we have already found the installdir for this game...
         if not self._parse_installdir(game_info):
             logger.error(f"Invalid game_info, not installdir { game_info }")
-            return foundDirs
+            return foundDirs, True
 
         # okay - now check the standard doc roots for games - do this before looking for autoclouds because it is more often the match
         likely = self._search_likely_locations(game_info, rcf)
@@ -348,12 +402,19 @@ class Engine:
         # Alas, now we need to scan the install dir to look for steam_autocloud.vdf files.  If found that means the dev is doing the 'lazy'
         # way of just saying "backup all files due to some path we enter in our web admin console".
 
-        # FIXME, cache this expensive result
-        autoclouds = self._find_autoclouds(game_info, is_linux_game=True)
+        # (our caller caches the result of this expensive search in roots_cache)
+        deadline = time.monotonic() + self.scan_time_budget
+        scanned = self._find_autoclouds(
+            game_info, is_linux_game=True, deadline=deadline)
+        complete = not scanned.truncated
+        autoclouds = scanned.dirs
 
         # Not found on linux, try looking in windows
         if len(autoclouds) < 1:
-            autoclouds = self._find_autoclouds(game_info, is_linux_game=False)
+            scanned = self._find_autoclouds(
+                game_info, is_linux_game=False, deadline=deadline)
+            complete = complete and not scanned.truncated
+            autoclouds = scanned.dirs
 
         # Convert the autocloud file locations to the correct file root location for backup/restore (based on paths mentioned in the rcf file)
         # FIXME, I don't know the python equivalent of flatmap.
@@ -370,7 +431,7 @@ class Engine:
 
         # remove any duplicates (by briefly converting into a dict, which preserves order)
         foundDirs = list(dict.fromkeys(foundDirs))
-        return foundDirs
+        return foundDirs, complete
 
     """ 
     confirm that at least one savegame exists, to validate our assumptions about where they are being stored
@@ -390,78 +451,112 @@ class Engine:
         return False
 
     """
-    Read the rcf file for the specified game, or if not found return None
+    Read the remotecache.vdf files for the specified game (one per account that has played it)
     """
 
-    def _read_rcf(self, game_info: dict) -> list[str]:
+    def _read_remotecaches(self, game_info: dict) -> list[vdf.RemoteCache]:
         dirs = self._get_gamedir(game_info["game_id"])
         paths = [os.path.join(d, "remotecache.vdf") for d in dirs]
-        # logger.debug(f'Read rcf {path}')
 
-        rcf = []
+        caches = []
         for path in paths:
-            if os.path.isfile(path):
-                with open(path) as f:
-                    s = f.read()  # read full file as a string
-                    lines = s.split("\n")
-                    # logger.debug(f'file is {lines}')
-
-                    # drop first two lines because they are "gameid" {
-                    lines = lines[2:]
-                    # We look for lines containing quotes and immediately preceeding lines with just an open brace
-                    prevl = None
-
-                    skipping = False
-                    for l in lines:
-                        s = l.strip()
-                        if skipping:  # skip the contents of {} records
-                            if s == "}":
-                                skipping = False
-                        elif s == "{":
-                            if prevl:
-                                # prevl will have quote chars as first and last of string.  Remove them
-                                filename = (prevl[1:])[:-1]
-                                rcf.append(filename)
-                                prevl = None
-
-                            # Now skip until we get a close brace
-                            skipping = True
-                        else:
-                            prevl = s
-            else:
+            try:
+                caches.append(self.vdf_cache.get(path, vdf.read_remotecache))
+            except FileNotFoundError:
                 logger.debug(f"No rcf {path}")
+        return caches
+
+    """
+    Read the rcf file for the specified game, or if not found return None
+    """
+
+    def _read_rcf(self, game_info: dict) -> list[str]:
+        caches = self._read_remotecaches(game_info)
+        rcf = [p for c in caches for p in c.paths]
 
         logger.debug(f'Read rcf with { len(rcf) } entries')
 
         # If we haven't already found where the savegames for this app live, do so now (or fail if not findable)
         if "save_games_roots" not in game_info:
-            saveRoots = self._find_save_games(game_info, rcf)
-            if len(saveRoots) < 1:
-                logger.warning(
-                    f'Unable to backup { game_info }: not yet supported')
+            key = self._get_roots_key(game_info, caches)
+            found, rootsDict = self.roots_cache.get(game_info["game_id"], key)
+            if found and rootsDict and not all(map(os.path.isdir, rootsDict)):
+                found = False  # the saves moved out from under us, so search again
+
+            if not found:
+                rootsDict, complete = self._find_save_games_roots(
+                    game_info, rcf)
+                if complete:
+                    self.roots_cache.put(game_info["game_id"], key, rootsDict)
+                else:
+                    # don't remember a partial answer, we'll search again next time (hopefully with less else going on)
+                    logger.warning(
+                        f'Not caching the save roots of { game_info["game_id"] }, the scan was truncated')
+            elif not rootsDict:
+                logger.debug(f'Cached as not supported { game_info }')
+
+            if not rootsDict:
                 return None
-
-            # remove save_game roots which don't seem to match any filenames in the existing rcf data from valve
-            # confirm that at least one savegame exists, to validate our assumptions about where they are being stored
-            # if no savegame found claim we can't back this app up.
-            saveRoots = list(
-                filter(lambda root: self._rcf_is_valid(root, rcf), saveRoots))
-            if len(saveRoots) < 1:
-                logger.warning(
-                    f'RCF seems invalid, not backing up { game_info }')
-                return None
-
-            # For legacy purposes, use the first found entry as save_games_root, we store this as a dict mapping
-            # directory name in game to the suffix used on our backup dir.  To keep compatibility with old rev1
-            # steamback we use emptystring for the first found root and _n for everyone after.
-            rootsDict = {}
-            for idx, dir in enumerate(saveRoots):
-                rootsDict[dir] = "" if idx == 0 else f"_{ idx }"
             game_info["save_games_roots"] = rootsDict
 
         # logger.debug(f'rcf files are {r}')
         return rcf
 
+    """
+    Return a key that changes whenever a search for the save roots of this game could give a different answer
+    """
+
+    def _get_roots_key(self, game_info: dict, caches: list[vdf.RemoteCache]) -> list:
+        acf = _parse_acf(os.path.join(self._get_steamapps_dir(game_info),
+                         f'appmanifest_{ game_info["game_id"] }.acf'), self.vdf_cache)
+
+        # the proton prefixes we might look in (recreating one gives it a new inode)
+        prefixes = []
+        for is_system_dir in ([True, False] if self._is_on_mmc(game_info) else [False]):
+            compat = os.path.join(self._get_steamapps_dir(
+                game_info, is_system_dir), 'compatdata', str(game_info["game_id"]))
+            try:
+                version = self.vdf_cache.get(os.path.join(compat, "version"),
+                                             lambda p: Path(p).read_text().strip())
+                prefixes.append(
+                    [version, os.stat(os.path.join(compat, "pfx")).st_ino])
+            except OSError:
+                prefixes.append(None)
+
+        # the top level directories used by valve (these decide which of our candidate dirs are valid)
+        tops = sorted({p.split("/")[0] for c in caches for p in c.paths})
+
+        return [game_info["install_root"], acf.get("buildid"), acf.get("installdir"), prefixes, tops]
+
+    """
+    Search for the save_games_roots dict for a game (or None if we can't support it), and whether the search was complete
+    """
+
+    def _find_save_games_roots(self, game_info: dict, rcf: list[str]) -> tuple[dict, bool]:
+        saveRoots, complete = self._find_save_games(game_info, rcf)
+        if len(saveRoots) < 1:
+            logger.warning(
+                f'Unable to backup { game_info }: not yet supported')
+            return None, complete
+
+        # remove save_game roots which don't seem to match any filenames in the existing rcf data from valve
+        # confirm that at least one savegame exists, to validate our assumptions about where they are being stored
+        # if no savegame found claim we can't back this app up.
+        saveRoots = list(
+            filter(lambda root: self._rcf_is_valid(root, rcf), saveRoots))
+        if len(saveRoots) < 1:
+            logger.warning(
+                f'RCF seems invalid, not backing up { game_info }')
+            return None, complete
+
+        # For legacy purposes, use the first found entry as save_games_root, we store this as a dict mapping
+        # directory name in game to the suffix used on our backup dir.  To keep compatibility with old rev1
+        # steamback we use emptystring for the first found root and _n for everyone after.
+        rootsDict = {}
+        for idx, dir in enumerate(saveRoots):
+            rootsDict[dir] = "" if idx == 0 else f"_{ idx }"
+        return rootsDict, complete
+
     """Get the root directory this game uses for its save files
     """
 
@@ -469,44 +564,211 @@ class Engine:
         return game_info["save_games_roots"]
 
     """
-    Parse valve rcf json objects and copy named files.  Given one particular source and one particular dest directory
+    Copy the files named in rcf (relative to src_dir) into our object store, and hardlink them into dest_dir.  Returns
+    a manifest of the files stored: a dict of filename -> [sha256, size, st_mtime_ns]
+
+    known is the manifest of the previous snapshot, files whose size and mtime match it aren't read again.  If
+    incremental they aren't even linked into dest_dir, the manifest alone refers to their (already stored) object.
+    Files of at least chunk_threshold bytes are never in dest_dir, their manifest entries get a fourth element: the
+    list of chunks (in chunk_store) which make up the file.
 
-    {
-	"ChangeNumber"		"-6703994677807818784"
-	"ostype"		"-184"
-	"my games/XCOM2/XComGame/SaveData/profile.bin"
-	{
-		"root"		"2"
-		"size"		"15741"
-		"localtime"		"1671427173"
-		"time"		"1671427172"
-		"remotetime"		"1671427172"
-		"sha"		"df59d8d7b2f0c7ddd25e966493d61c1b107f9b7a"
-		"syncstate"		"1"
-		"persiststate"		"0"
-		"platformstosync2"		"-1"
-	}
+    If dirty is given (the files a DirtyTracker saw written since the known snapshot) the other files in known are
+    assumed unchanged, without even a stat.
     """
 
-    def _copy_by_rcf(self, rcf: list, src_dir: str, dest_dir: str):
-        numCopied = 0
+    def _store_by_rcf(self, rcf: list, src_dir: str, dest_dir: str, known: dict, incremental: bool = False,
+                      dirty: set = None) -> dict:
+        manifest = {}
+        numLinked = 0
         for k in rcf:
-            spath = os.path.join(src_dir, k)
-
-            # if the filename contains directories - create them
-            if os.path.exists(spath):
-                numCopied = numCopied + 1
+            prev = known.get(k)
+            if prev and dirty is not None and k not in dirty and not self.dry_run:
+                if incremental or len(prev) > 3:
+                    manifest[k] = prev  # the known snapshot still references its object (or chunks)
+                    numLinked += 1
+                    self._add_progress(prev[1])
+                    continue
                 dpath = os.path.join(dest_dir, k)
-                # logger.debug(f'Copying file { k }')
-                if not self.dry_run:
-                    dir = os.path.dirname(dpath)
-                    os.makedirs(dir, exist_ok=True)
-                    shutil.copy2(spath, dpath)
+                os.makedirs(os.path.dirname(dpath), exist_ok=True)
+                if self.store.link(prev[0], dpath):
+                    manifest[k] = prev
+                    numLinked += 1
+                    self._add_progress(prev[1])
+                    continue
+
+            spath = os.path.join(src_dir, k)
+            try:
+                st = os.stat(spath)
+            except OSError:
+                continue  # missing file, nothing to save
+            dpath = os.path.join(dest_dir, k)
+            if self.dry_run:
+                continue
+
+            unchanged = prev and prev[1] == st.st_size and prev[2] == st.st_mtime_ns
+            if self.chunk_threshold is not None and st.st_size >= self.chunk_threshold:
+                if unchanged and len(prev) > 3 and all(map(self.chunk_store.has, prev[3])):
+                    manifest[k] = prev
+                    numLinked += 1
+                else:
+                    manifest[k] = self._chunk_file(spath, st)
+                self._add_progress(st.st_size)
+                continue
+            if unchanged and incremental and os.path.exists(self.store.object_path(prev[0])):
+                digest = prev[0]
+                numLinked += 1
             else:
-                # logger.warning(f'Not copying missing file { k }')
-                pass
+                os.makedirs(os.path.dirname(dpath), exist_ok=True)
+                if unchanged and self.store.link(prev[0], dpath):
+                    digest = prev[0]
+                    numLinked += 1
+                else:
+                    digest = self.store.add(spath, dpath)
+            manifest[k] = [digest, st.st_size, st.st_mtime_ns]
+            self._add_progress(st.st_size)
+
+        logger.info(
+            f'Stored { len(manifest) } files from { src_dir } to { dest_dir } ({ numLinked } unchanged)')
+        return manifest
+
+    """
+    Split a file into chunks, adding any we don't already have to chunk_store.  Returns its manifest entry.
+    """
+
+    def _chunk_file(self, path: str, st: os.stat_result) -> list:
+        h = hashlib.sha256()
+        chunk_list = []
+        with open(path, "rb") as f:
+            for c in chunks.iter_chunks(f):
+                h.update(c)
+                chunk_list.append(self.chunk_store.add_bytes(c))
+        return [h.hexdigest(), st.st_size, st.st_mtime_ns, chunk_list]
+
+    """
+    Like _store_by_rcf, but compresses the files into a single archive file
+    """
+
+    def _archive_by_rcf(self, rcf: list, src_dir: str, archive_path: str) -> dict:
+        manifest = {}
+        if self.dry_run:
+            return manifest
+        with archive.ArchiveWriter(archive_path) as w:
+            for k in rcf:
+                spath = os.path.join(src_dir, k)
+                if not os.path.exists(spath):
+                    continue  # missing file, nothing to save
+                digest, size, mtime_ns = w.add_file(k, spath)
+                manifest[k] = [digest, size, mtime_ns]
+                self._add_progress(size)
+
         logger.info(
-            f'Copied { numCopied } files from { src_dir } to { dest_dir }')
+            f'Archived { len(manifest) } files from { src_dir } to { archive_path }')
+        return manifest
+
+    def _add_progress(self, num_bytes: int):
+        p = getattr(self._local, "progress", None)
+        if p:
+            p.add(num_bytes)
+        self.governor.account(num_bytes, check=p.check if p else None)
+
+    """
+    Start tracking the progress of a backup or restore of a game, returns the Progress
+    """
+
+    def _start_progress(self, op: str, game_info: dict, rcf: list[str]) -> Progress:
+        # the best estimate of how much we need to copy without statting everything
+        num_bytes = sum(
+            e.size for c in self._read_remotecaches(game_info) for e in c.entries)
+        return self._set_progress(Progress(
+            op, game_info["game_id"], len(rcf), num_bytes))
+
+    def _set_progress(self, p: Progress) -> Progress:
+        self.progress = self._local.progress = p
+        return p
+
+    """
+    Run a blocking function on one of our worker threads (by default the one for everything but backups)
+    """
+    async def _run_blocking(self, fn, *args, executor: ThreadPoolExecutor = None):
+        return await asyncio.get_running_loop().run_in_executor(executor or self._executor,
+                                                                functools.partial(self._run_job, fn, *args))
+
+    def _run_job(self, fn, *args):
+        with self._busy_cond:
+            self._busy += 1
+        try:
+            return fn(*args)
+        finally:
+            with self._busy_cond:
+                self._busy -= 1
+                if self._busy == 0 and (self._gc_objects or self._gc_chunks):
+                    self._collect_garbage()
+
+    """
+    The lock held while backing up or restoring a game
+    """
+
+    def _game_lock(self, game_id: int) -> threading.Lock:
+        with self._game_locks_lock:
+            return self._game_locks.setdefault(game_id, threading.Lock())
+
+    """
+    Ask for the objects and chunks used by the snapshots in deleted to be deleted (if nothing else uses them), as soon
+    as no job is running (one might be adding objects which aren't yet referenced by any snapshot)
+    """
+
+    def _request_gc(self, deleted: list[dict]):
+        with self._busy_cond:
+            for si in deleted:
+                for files in si.get("manifest", {}).values():
+                    for e in files.values():
+                        self._gc_objects.add(e[0])
+                        if len(e) > 3:
+                            self._gc_chunks.update(e[3])
+            if self._busy == 0:
+                self._collect_garbage()
+
+    """
+    Only looks at the candidates _request_gc collected, so we never have to scan the whole store.  An object is unused
+    once no snapshot directory hardlinks it and no incremental manifest refers to it; chunks are only ever referred to
+    by manifests.  The catalog is only read if some candidate might be unused.
+    """
+
+    def _collect_garbage(self):
+        objects, self._gc_objects = self._gc_objects, set()
+        chunks, self._gc_chunks = self._gc_chunks, set()
+        unlinked = self.store.unlinked(objects)
+        if unlinked:
+            unlinked -= self._get_manifest_only_objects()
+            logger.debug(
+                f'Removed { self.store.remove(unlinked) } unused objects')
+        if chunks:
+            chunks -= self._get_used_chunks()
+            logger.debug(
+                f'Removed { self.chunk_store.remove(chunks) } unused chunks')
+
+    """
+    Return the progress of the current (or most recent) backup or restore as a dict, or None if there hasn't been one
+    """
+
+    def get_progress(self) -> dict:
+        p = self.progress
+        return p.to_dict() if p else None
+
+    """
+    Ask the current backup (or the undo stage of a restore) to stop, returns True if there was something to cancel
+    """
+
+    def cancel(self) -> bool:
+        p = self.progress
+        return p.cancel() if p else False
+
+    """
+    Return the state of our I/O throttling (see IoGovernor.state) as a dict
+    """
+
+    def get_io_state(self) -> dict:
+        return self.governor.state()
 
     """
     Find the timestamp of the most recently updated file in a directory
@@ -535,12 +797,35 @@ class Engine:
 
         return max_time
 
+    """
+    Return a fingerprint of the save files valve knows about for this game, or None if we can't make one
+
+    This is a hash of the ChangeNumber and the per-file records from the remotecache.vdf files (plus the save roots
+    we use), so if it differs from the fingerprint of a snapshot steam has synced changes since.  It can't tell us
+    about changes steam hasn't synced yet (the remotecache is only rewritten after a cloud sync).
+    """
+
+    def _get_rcf_fingerprint(self, game_info: dict) -> str:
+        caches = self._read_remotecaches(game_info)
+        if not caches or any(c.change_number is None for c in caches):
+            return None
+
+        h = hashlib.sha1()
+        for root in sorted(self._get_game_roots(game_info)):
+            h.update(f'{ root }\n'.encode())
+        for c in caches:
+            h.update(f'{ c.change_number }\n'.encode())
+            for e in sorted(c.entries):
+                h.update(
+                    f'{ e.path }\0{ e.sha }\0{ e.size }\0{ e.time }\0{ e.root }\n'.encode())
+        return h.hexdigest()
+
     """
     Create a save file directory save-GAMEID-timestamp and return SaveInfo object
     Also write the sister save-GAMEID-timestamp.json metadata file
     """
 
-    def _create_savedir(self, game_info: dict, is_undo: bool = False) -> dict:
+    def _create_savedir(self, game_info: dict, is_undo: bool = False, rcf_fingerprint: str = None) -> dict:
         game_id = game_info["game_id"]
         # This better be populated by now!
         assert game_info["save_games_roots"]
@@ -552,14 +837,21 @@ class Engine:
             "filename": f'{ "undo" if is_undo else "save" }_{ game_id }_{ ts }',
             "is_undo": is_undo
         }
+        if rcf_fingerprint:
+            si["rcf_fingerprint"] = rcf_fingerprint
+
+        logger.debug(f'Creating savedir JSON { si }')
+        self._write_saveinfo(si)
+        return si
 
+    def _write_saveinfo(self, si: dict):
         path = self._saveinfo_to_dir(si)
-        logger.debug(f'Creating savedir JSON {path}, {si}')
         if not self.dry_run:
-            with open(path + ".json", 'w') as fp:
-                json.dump(si, fp, indent=1)
-
-        return si
+            catalog = self._get_catalog()
+            with catalog.changing():
+                with open(path + ".json", 'w') as fp:
+                    json.dump(si, fp, indent=1)
+                catalog.put(si)
 
     """
     Load a savesaveinfo.json from the saves directory
@@ -599,34 +891,110 @@ class Engine:
 
         filepath = os.path.join(root, filename) + "*"
         files = glob.glob(filepath)
-        for f in files:
-            logger.debug(f'Deleting {f}')
-            try:
-                if os.path.isfile(f):
-                    os.remove(f)
-                elif os.path.isdir(f):
-                    shutil.rmtree(f, ignore_errors=True)
-            except OSError:
-                pass
+        catalog = self._get_catalog()
+        with catalog.changing():
+            for f in files:
+                logger.debug(f'Deleting {f}')
+                try:
+                    if os.path.isfile(f):
+                        os.remove(f)
+                    elif os.path.isdir(f):
+                        shutil.rmtree(f, ignore_errors=True)
+                except OSError:
+                    pass
+            catalog.remove(filename)
 
     """
-    we keep only the most recent undo and the most recent 10 saves
+    Return the retention policy for a game
     """
-    async def _cull_old_saves(self):
-        infos = await self.get_saveinfos()
 
-        undos = list(filter(lambda i: i["is_undo"], infos))
-        saves = list(filter(lambda i: not i["is_undo"], infos))
+    def _get_retention(self, game_id: int) -> retention.Policy:
+        return self.retention.get(game_id) or self.default_retention or retention.Policy(
+            keep_last=self.max_saves if self.max_saves is not None else float("inf"))
+
+    """
+    Delete snapshots we no longer need: all but the most recent undo, the saves of game_id which its retention policy
+    doesn't want and then (if we are over quota_bytes) the oldest saves of any game.
+    """
+
+    def _cull_old_saves(self, game_id: int = None):
+        catalog = self._get_catalog()
+        deleted = []
+
+        def delete(todel: dict):
+            logger.info(f'Culling { todel["filename"] }')
+            # if not self.dry_run: we ignore dryrun for culling otherwise our test system dir fills up
+            self._delete_savedir(todel["filename"])
+            self.governor.account_delete()
+            deleted.append(todel)
+
+        extra = catalog.count(is_undo=True) - 1
+        if extra > 0:
+            for todel in catalog.oldest(extra, is_undo=True):
+                delete(todel)
+
+        if game_id is not None:
+            saves = catalog.list_for_game(game_id)
+            for todel in retention.select_to_delete(saves, self._get_retention(game_id)):
+                delete(todel)
+
+        if self.quota_bytes is not None:
+            excess = self._select_excess(
+                catalog.save_sizes(), catalog.total_size())
+            for todel in sorted(catalog.get_many(excess), key=lambda si: si["timestamp"]):
+                delete(todel)
+
+        # free any file contents which were only used by the snapshots we just deleted
+        if deleted:
+            self._request_gc(deleted)
+
+    """
+    The objects which incremental snapshots refer to without a hardlink, these must not be garbage collected
+    """
+
+    def _get_manifest_only_objects(self) -> set[str]:
+        r = set()
+        for si in self._get_catalog().all():
+            if si.get("incremental"):
+                for files in si["manifest"].values():
+                    r.update(e[0] for e in files.values())
+        return r
+
+    """
+    The chunks which make up the chunked files of all our snapshots
+    """
+
+    def _get_used_chunks(self) -> set[str]:
+        r = set()
+        for si in self._get_catalog().all():
+            if si.get("chunked"):
+                for files in si["manifest"].values():
+                    for e in files.values():
+                        if len(e) > 3:
+                            r.update(e[3])
+        return r
 
-        def delete_oldest(files, to_keep):
-            while len(files) > to_keep:
-                todel = files.pop()
-                logger.info(f'Culling { todel }')
-                # if not self.dry_run: we ignore dryrun for culling otherwise our test system dir fills up
-                self._delete_savedir(todel["filename"])
+    """
+    Choose which saves to delete (oldest first, but never a game's newest) to get under quota_bytes, the only limit
+    across games.  saves is catalog.save_sizes() and total the size of all our snapshots (including the undos).
+    Returns filenames.
+    """
 
-        delete_oldest(undos, 1)
-        delete_oldest(saves, self.max_saves)
+    def _select_excess(self, saves: list[tuple], total: int) -> list[str]:
+        r = []
+        if total > self.quota_bytes:
+            # saves is oldest first, so the last save we see of each game is its newest
+            newest = {game_id: filename for filename, game_id, timestamp, size in saves}
+            for filename, game_id, timestamp, size in saves:
+                if total <= self.quota_bytes:
+                    break
+                if newest[game_id] != filename:  # never delete the only remaining save of a game
+                    r.append(filename)
+                    total -= size
+            if total > self.quota_bytes:
+                logger.warning(
+                    f'Unable to get below quota of { self.quota_bytes } bytes, using { total }')
+        return r
 
     """
     Given a save_info return a full pathname to that directory
@@ -639,44 +1007,165 @@ class Engine:
     """
     Get the newest saveinfo for a specified game (or None if not found)
     """
-    async def _get_newest_save(self, game_id):
-        infos = await self.get_saveinfos()
-
-        # Find first matching item or None
-        newest = next(
-            (x for x in infos if x["game_info"]["game_id"] == game_id and not x["is_undo"]), None)
-        return newest
+    def _get_newest_save(self, game_id):
+        return self._get_catalog().newest_for_game(game_id)
 
     """
     Copy all savegame info from the game into our mirror (might have multiple save root directories)
+
+    If only is provided (a dict of game root -> filenames) just those files are saved, rather than all in the rcf.
+    If dirty is provided (a dict of game root -> filenames) it lists the only files which may differ from previous.
+    If extra is provided (a dict of game root -> filenames, see _session_files) those are saved as well as the rcf's.
     """
 
-    def _copy_all_to_saveinfo(self, save_info: dict, rcf: list[str]):
+    def _copy_all_to_saveinfo(self, save_info: dict, rcf: list[str], previous: dict = None, only: dict = None,
+                              dirty: dict = None, extra: dict = None):
         try:
             game_info = save_info["game_info"]
             dest_basename = self._saveinfo_to_dir(save_info)
             gameRoots = self._get_game_roots(game_info)
+            known = previous.get("manifest", {}) if previous else {}
+            is_archive = self.snapshot_format == "archive"
+            incremental = self.incremental_snapshots and bool(
+                known) and not is_archive
+            manifest = {}
             for src_dir, suffix in gameRoots.items():
                 dest_dir = dest_basename + suffix
                 # logger.debug(f'copying gamedir { src_dir } to { dest_dir }')
-                self._copy_by_rcf(rcf, src_dir, dest_dir)
+                files = only.get(src_dir, []) if only is not None else rcf
+                if extra and extra.get(src_dir):
+                    files = files + extra[src_dir]
+                if is_archive:
+                    manifest[suffix] = self._archive_by_rcf(
+                        files, src_dir, dest_dir + ".sbar")
+                else:
+                    manifest[suffix] = self._store_by_rcf(
+                        files, src_dir, dest_dir, known.get(suffix, {}), incremental,
+                        dirty.get(src_dir) if dirty is not None else None)
+            if is_archive:
+                save_info["format"] = "archive"
+            if incremental:
+                save_info["incremental"] = True
+            if any(len(e) > 3 for files in manifest.values() for e in files.values()):
+                save_info["chunked"] = True
+            if only is not None:
+                save_info["partial"] = True  # only some of the game's files, restoring it leaves the rest alone
+            # a cancel which arrived while we stored the last file (i.e. the undo of a one file restore) still counts
+            p = getattr(self._local, "progress", None)
+            if p:
+                p.check()
+
+            # remember what we stored (older snapshots don't have a manifest, they are just plain copies)
+            save_info["manifest"] = manifest
+            save_info["size"] = sum(e[1] for files in manifest.values()
+                                    for e in files.values())
+            self._write_saveinfo(save_info)
         except:
             # Don't keep old directory/json around if we encounter an exception
             self._delete_savedir(save_info["filename"])
             raise  # rethrow
 
     """
-    Copy all savegame info from our mirror into the game
+    Work out which files restoring save_info needs to write, returns (plan, report).  The plan is a dict of game root
+    directory -> list of (filename, path of the saved copy (or an archive.Member or chunks.Chunked), size, mtime_ns).  The report counts
+    the files we can skip because the game already has an identical copy.
     """
 
-    def _copy_all_from_saveinfo(self, save_info: dict, rcf: list[str]):
-        game_info = save_info["game_info"]
+    def _plan_restore(self, save_info: dict, rcf: list[str]) -> tuple[dict, dict]:
         mirror_basename = self._saveinfo_to_dir(save_info)
-        gameRoots = self._get_game_roots(game_info)
-        for dest_dir, suffix in gameRoots.items():
+        manifest = save_info.get("manifest")
+        plan = {}
+        report = {"files_written": 0, "bytes_written": 0,
+                  "files_skipped": 0, "bytes_skipped": 0}
+        for dest_dir, suffix in self._get_game_roots(save_info["game_info"]).items():
             src_dir = mirror_basename + suffix
-            # logger.debug(f'copying backup dir { src_dir } to { dest_dir }')
-            self._copy_by_rcf(rcf, src_dir, dest_dir)
+            if manifest is not None:
+                files = [(k, e[0], e[1], e[2], e[3] if len(e) > 3 else None)
+                         for k, e in manifest.get(suffix, {}).items()]
+            else:
+                # an old snapshot, which is just copies (with their original mtimes) of the files in the rcf
+                files = []
+                for k in rcf:
+                    try:
+                        st = os.stat(os.path.join(src_dir, k))
+                    except OSError:
+                        continue
+                    files.append((k, None, st.st_size, st.st_mtime_ns, None))
+
+            todo = []
+            for k, digest, size, mtime_ns, chunk_list in files:
+                spath = os.path.join(src_dir, k)
+                if chunk_list is not None:
+                    spath = chunks.Chunked(chunk_list)
+                elif save_info.get("format") == "archive":
+                    spath = archive.Member(src_dir + ".sbar", k)
+                elif digest and not os.path.exists(spath):
+                    # not in the snapshot dir, so an unchanged file of an incremental snapshot
+                    spath = self.store.object_path(digest)
+                if self.differential_restore and self._is_same_file(os.path.join(dest_dir, k), spath, size, mtime_ns, digest):
+                    report["files_skipped"] += 1
+                    report["bytes_skipped"] += size
+                else:
+                    todo.append((k, spath, size, mtime_ns))
+            plan[dest_dir] = todo
+        return plan, report
+
+    """
+    Return True if the game file dpath already has the contents we'd restore from spath
+    """
+
+    def _is_same_file(self, dpath: str, spath: str, size: int, mtime_ns: int, digest: str) -> bool:
+        try:
+            st = os.stat(dpath)
+        except OSError:
+            return False
+        if st.st_size != size:
+            return False
+        if st.st_mtime_ns == mtime_ns:
+            return True  # same size and time, like rsync we assume that means the same contents
+        # only reading the game file is still much cheaper than writing it (especially on an SD card)
+        if digest:
+            return store.hash_file(dpath) == digest
+        return filecmp.cmp(dpath, spath, shallow=False)
+
+    """
+    Write the files in a restore plan into the game directories, adding what we wrote to the report
+    """
+
+    def _write_restore(self, plan: dict, report: dict):
+        readers = {}  # archive path -> ArchiveReader
+        for dest_dir, todo in plan.items():
+            for k, spath, size, mtime_ns in todo:
+                if not self.dry_run:
+                    dpath = os.path.join(dest_dir, k)
+                    os.makedirs(os.path.dirname(dpath), exist_ok=True)
+                    if isinstance(spath, archive.Member):
+                        if spath.archive not in readers:
+                            readers[spath.archive] = archive.ArchiveReader(
+                                spath.archive)
+                        readers[spath.archive].extract(spath.name, dpath)
+                    elif isinstance(spath, chunks.Chunked):
+                        with open(dpath, "wb") as f:
+                            for digest in spath.chunks:
+                                with open(self.chunk_store.object_path(digest), "rb") as c:
+                                    f.write(c.read())
+                    else:
+                        self.copier.copy2(spath, dpath)
+                    # hardlinked files share one mtime between all snapshots, so put back the time the file had when saved
+                    os.utime(dpath, ns=(mtime_ns, mtime_ns))
+                    self._add_progress(size)
+                report["files_written"] += 1
+                report["bytes_written"] += size
+            logger.info(f'Restored { len(todo) } files to { dest_dir }')
+
+    """
+    Copy all savegame info from our mirror into the game, returns a report of the bytes/files written and skipped
+    """
+
+    def _copy_all_from_saveinfo(self, save_info: dict, rcf: list[str]) -> dict:
+        plan, report = self._plan_restore(save_info, rcf)
+        self._write_restore(plan, report)
+        return report
 
     """
     Backup a particular game.
@@ -685,57 +1174,337 @@ class Engine:
     SaveInfo is a dict with filename, game_id, timestamp, is_undo
     game_info is a dict of game_id and install_root
     """
-    async def do_backup(self, game_info: dict, dry_run: bool = False) -> dict:
+    async def do_backup(self, game_info: dict, dry_run: bool = False, in_session: bool = False) -> dict:
+        return await self._run_blocking(self._do_backup, game_info, dry_run, in_session, executor=self._backup_executor)
+
+    def _do_backup(self, game_info: dict, dry_run: bool, in_session: bool = False) -> dict:
+        self.governor.begin_job(True)
+        with self._game_lock(game_info["game_id"]):
+            return self._backup(game_info, dry_run, in_session)
+
+    """
+    in_session is for snapshots taken while the game is running, these are only made if the save files changed since
+    the newest snapshot and are tagged so retention can thin them out.
+    """
+
+    def _backup(self, game_info: dict, dry_run: bool, in_session: bool = False) -> dict:
         logger.info(f'Attempting backup of { game_info }')
         rcf = self._read_rcf(game_info)
+        self.roots_cache.save()
 
         if not rcf:
             return None
 
         game_id = game_info["game_id"]
-        newest_save = await self._get_newest_save(game_id)
-        if newest_save and self.ignore_unchanged:
-            game_timestamp = self._get_rcf_timestamp(rcf, game_info)
-            if newest_save["timestamp"] > game_timestamp:
+        fingerprint = self._get_rcf_fingerprint(game_info)
+        newest_save = self._get_newest_save(game_id)
+        # during (and at the end of) a session steam's rcf doesn't list the save files the game has made since it started
+        extra = None if dry_run or not (in_session or (newest_save and newest_save.get("in_session"))) \
+            else self._session_files(game_info, rcf, newest_save)
+        if in_session and newest_save and not self._saves_changed(game_info, rcf, newest_save, extra):
+            # (steam doesn't update the remotecache until the game exits, so we look at the files themselves)
+            logger.debug(
+                f'No changes to the saves of { game_id } since the last snapshot')
+            return None
+        dirty = None if dry_run else self._finish_tracking(
+            game_id, newest_save)
+        if newest_save and self.ignore_unchanged and not in_session:
+            if dirty and any(dirty.values()):
+                unchanged = False  # we saw the game write its files (steam might not have synced them yet)
+            elif newest_save.get("in_session"):
+                unchanged = False  # always make a regular snapshot of the end of a session
+            elif fingerprint and newest_save.get("rcf_fingerprint", fingerprint) != fingerprint:
+                unchanged = False  # steam has synced something new
+            else:
+                # steam only rewrites the remotecache after a cloud sync (which might not have happened yet, or be
+                # turned off), so a matching fingerprint doesn't prove anything: check the file times
+                game_timestamp = self._get_rcf_timestamp(rcf, game_info)
+                unchanged = newest_save["timestamp"] > game_timestamp
+            if unchanged:
                 logger.warning(
                     f'Skipping backup for { game_id } - no changed files')
                 return None
 
         if not dry_run:
-            saveInfo = self._create_savedir(game_info)
-            self._copy_all_to_saveinfo(saveInfo, rcf)
+            progress = self._start_progress("backup", game_info, rcf)
+            try:
+                with self._get_catalog().changing():
+                    saveInfo = self._create_savedir(
+                        game_info, rcf_fingerprint=fingerprint)
+                    if in_session:
+                        saveInfo["in_session"] = True
+                    self._copy_all_to_saveinfo(
+                        saveInfo, rcf, newest_save, dirty=dirty, extra=extra)
+            except Cancelled:
+                logger.warning(f'Backup of { game_id } cancelled')
+                return None
+            finally:
+                progress.finish()
 
-            await self._cull_old_saves()
+            self._cull_old_saves(game_id)
+            if in_session:
+                self._watch_game(game_info)  # the game is still running, track changes from our new snapshot
             return saveInfo
         else:
             return {}  # For dryruns return a placeholder empty dict to indicate 'would have backed up'
 
+    """
+    Call when a game starts, from then until its next backup we track which of its save files it writes.  Returns
+    False if we can't (i.e. no inotify, or no previous snapshot to compare with).
+    """
+    async def watch_game(self, game_info: dict) -> bool:
+        return await self._run_blocking(self._watch_game, game_info)
+
+    def _watch_game(self, game_info: dict) -> bool:
+        if not self.track_dirty or self.snapshot_format == "archive" or not inotify.available():
+            return False
+        rcf = self._read_rcf(game_info)
+        if not rcf:
+            return False
+        game_id = game_info["game_id"]
+        previous = self._get_newest_save(game_id)
+        # snapshots without a manifest (or archives) can't be referred to by the next one
+        if not previous or previous.get("manifest") is None or previous.get("format") == "archive":
+            return False
+
+        self._finish_tracking(game_id, None)
+        known = {root: previous["manifest"].get(suffix, {})
+                 for root, suffix in self._get_game_roots(game_info).items()}
+        self._trackers[game_id] = (previous["filename"], DirtyTracker(known))
+        logger.debug(f'Tracking writes to the save files of { game_id }')
+        return True
+
+    """
+    Save files the game has made since steam last wrote its rcf (steam only does that after the game exits), returns a
+    dict of game root -> filenames which aren't in the rcf.  We look for new files next to the ones in the rcf, at any
+    new files DirtyTracker saw written (i.e. in directories made during the session) and at the files of this kind
+    which the snapshot previous saved.
+    """
+
+    def _session_files(self, game_info: dict, rcf: list[str], previous: dict = None) -> dict:
+        listed = set(rcf)
+
+        def wanted(k: str) -> bool:
+            return k not in listed and os.path.basename(k) != "steam_autocloud.vdf"  # (that is steam's, not the game's)
+        tracked = self._trackers.get(game_info["game_id"])
+        seen = tracked[1].dirty_files() if tracked else {}
+        manifest = (previous or {}).get("manifest") or {}
+        r = {}
+        for root, suffix in self._get_game_roots(game_info).items():
+            found = set()
+            for reldir in {os.path.dirname(k) for k in rcf}:
+                try:
+                    with os.scandir(os.path.join(root, reldir)) as it:
+                        for entry in it:
+                            k = os.path.join(
+                                reldir, entry.name) if reldir else entry.name
+                            if wanted(k) and entry.is_file(follow_symlinks=False):
+                                found.add(k)
+                except OSError:
+                    pass  # the game hasn't made this directory (yet)
+            for k in itertools.chain(seen.get(root, ()), manifest.get(suffix, {})):
+                if k not in found and wanted(k) and os.path.isfile(os.path.join(root, k)):
+                    found.add(k)
+            if found:
+                r[root] = sorted(found)
+        if r:
+            logger.debug(
+                f'{ game_info["game_id"] } has { sum(map(len, r.values())) } save files steam doesn\'t know about yet')
+        return r
+
+    """
+    Return True if any of a game's save files (those in the rcf, and extra: a dict of game root -> filenames) might
+    differ from those in the snapshot previous.  Cheap: we only look at what DirtyTracker saw, or else at the size and
+    mtime of each file.
+    """
+
+    def _saves_changed(self, game_info: dict, rcf: list[str], previous: dict, extra: dict = None) -> bool:
+        tracked = self._trackers.get(game_info["game_id"])
+        if tracked and tracked[0] == previous["filename"]:
+            dirty = tracked[1].has_dirty()
+            if dirty is not None:
+                return dirty
+        manifest = previous.get("manifest")
+        if manifest is None:
+            return True
+        for root, suffix in self._get_game_roots(game_info).items():
+            known = manifest.get(suffix, {})
+            for k in rcf + (extra or {}).get(root, []):
+                try:
+                    st = os.stat(os.path.join(root, k))
+                except OSError:
+                    if k in known:
+                        return True  # deleted
+                    continue
+                e = known.get(k)
+                if not e or e[1] != st.st_size or e[2] != st.st_mtime_ns:
+                    return True
+        return False
+
+    """
+    Stop tracking a game's writes, returns the dirty files if they are relative to the snapshot previous (else None)
+    """
+
+    def _finish_tracking(self, game_id: int, previous: dict) -> dict:
+        tracked = self._trackers.pop(game_id, None)
+        if not tracked:
+            return None
+        base, tracker = tracked
+        dirty = tracker.finish()
+        if dirty is None or not previous or previous["filename"] != base:
+            return None
+        logger.info(
+            f'{ game_id } wrote { sum(map(len, dirty.values())) } of its save files')
+        return dirty
+
     """
     Restore a particular savegame using the saveinfo object
     """
-    async def do_restore(self, save_info: dict):
+    async def do_restore(self, save_info: dict) -> dict:
+        return await self._run_blocking(self._do_restore, save_info)
+
+    def _do_restore(self, save_info: dict) -> dict:
+        self.governor.begin_job(False)  # the user is waiting for this one
+        with self._game_lock(save_info["game_info"]["game_id"]):
+            return self._restore(save_info)
+
+    def _restore(self, save_info: dict) -> dict:
         # logger.debug(f'In do_restore for { save_info }')
         game_info = save_info["game_info"]
         rcf = self._read_rcf(game_info)
         assert rcf
 
-        # first make the backup (unless restoring from an undo already)
-        if not save_info["is_undo"]:
-            logger.info('Generating undo files')
-            undoInfo = self._create_savedir(game_info, is_undo=True)
-            self._copy_all_to_saveinfo(undoInfo, rcf)
+        progress = self._start_progress("restore", game_info, rcf)
+        try:
+            plan, report = self._plan_restore(save_info, rcf)
+            progress.files_total = sum(len(todo) for todo in plan.values())
+            progress.bytes_total = sum(
+                f[2] for todo in plan.values() for f in todo)
+
+            # first make the backup (unless restoring from an undo already), only of the files we are about to replace
+            if not save_info["is_undo"]:
+                logger.info('Generating undo files')
+                with self._get_catalog().changing():
+                    undoInfo = self._create_savedir(game_info, is_undo=True)
+                    self._copy_all_to_saveinfo(undoInfo, rcf, only={
+                        dest_dir: [f[0] for f in todo] for dest_dir, todo in plan.items()})
+
+            # then restore from our old snapshot, once we start changing the game files we must not stop part way
+            progress.cancellable = False
+            progress.files_done = progress.bytes_done = 0
+            logger.info(f'Attempting restore of { save_info }')
+            self._write_restore(plan, report)
+        except Cancelled:
+            logger.warning(
+                f'Restore of { game_info["game_id"] } cancelled, no files were changed')
+            return None
+        finally:
+            progress.finish()
 
-        # then restore from our old snapshot
-        logger.info(f'Attempting restore of { save_info }')
-        self._copy_all_from_saveinfo(save_info, rcf)
+        logger.info(
+            f'Restore wrote { report["files_written"] } files ({ report["bytes_written"] } bytes), skipped '
+            f'{ report["files_skipped"] } unchanged files ({ report["bytes_skipped"] } bytes)')
 
         # we now might have too many undos, so possibly delete one
-        await self._cull_old_saves()
+        self._cull_old_saves()
+        return report
+
+    """
+    The files of a snapshot, and the hashes they should have, as a list of verify.Check
+    """
+
+    def _get_verify_checks(self, save_info: dict) -> list[verify.Check]:
+        mirror_basename = self._saveinfo_to_dir(save_info)
+        manifest = save_info.get("manifest")
+        rcf_sha1 = {}
+        if manifest is None:
+            # an old snapshot without a manifest.  If steam's remotecache hasn't changed since the snapshot was taken,
+            # the sha1s valve recorded in it are those of the snapshot's files
+            fingerprint = save_info.get("rcf_fingerprint")
+            if fingerprint and fingerprint == self._get_rcf_fingerprint(save_info["game_info"]):
+                rcf_sha1 = {e.path: e.sha for c in self._read_remotecaches(save_info["game_info"])
+                            for e in c.entries}
+
+        checks = []
+        for suffix in self._get_game_roots(save_info["game_info"]).values():
+            src_dir = mirror_basename + suffix
+            if manifest is not None:
+                for k, e in manifest.get(suffix, {}).items():
+                    spath = os.path.join(src_dir, k)
+                    if len(e) > 3:
+                        spath = [self.chunk_store.object_path(c) for c in e[3]]
+                    elif save_info.get("format") == "archive":
+                        spath = archive.Member(src_dir + ".sbar", k)
+                    elif not os.path.exists(spath):
+                        spath = self.store.object_path(e[0])
+                    checks.append(verify.Check(
+                        f'{ save_info["filename"] }{ suffix }/{ k }', spath, e[1], "sha256", e[0]))
+            else:
+                names = set(rcf_sha1)
+                for dirpath, dirnames, filenames in os.walk(src_dir):
+                    names.update(os.path.relpath(os.path.join(dirpath, f), src_dir)
+                                 for f in filenames)
+                for k in sorted(names):
+                    spath = os.path.join(src_dir, k)
+                    size = os.path.getsize(
+                        spath) if os.path.exists(spath) else 0
+                    checks.append(verify.Check(
+                        f'{ save_info["filename"] }{ suffix }/{ k }', spath, size, "sha1", rcf_sha1.get(k)))
+        return checks
+
+    """
+    Check that the files of a snapshot still have the contents we saved, returns a report dict: files_ok, bytes_ok,
+    corrupt and missing (lists of filenames) and unverified (the number of files of old snapshots we have no hash for).
 
+    A background verify reads at most scrub_bytes_per_sec (and doesn't change our progress), so it can run while the
+    user does other things.  Setting stop (a threading.Event) makes a background verify give up (returning None) after
+    the file it is on.
     """
-    Given a list of game_infos, return a list of game_infos which are supported for backups
+    async def do_verify(self, save_info: dict, background: bool = False, stop: threading.Event = None) -> dict:
+        return await self._run_blocking(self._do_verify, save_info, background, stop)
+
+    def _do_verify(self, save_info: dict, background: bool = False, stop: threading.Event = None) -> dict:
+        self.governor.begin_job(background)
+        checks = self._get_verify_checks(save_info)
+        if background:
+            def on_done(c, result):
+                if stop is not None and stop.is_set():
+                    raise Cancelled()
+                self.governor.account(c.size)
+            try:
+                report = verify.run(checks, self.verify_threads, verify.Throttle(
+                    self.scrub_bytes_per_sec), on_done=on_done)
+            except Cancelled:
+                logger.info(f'Stopped verifying { save_info["filename"] }')
+                return None
+        else:
+            progress = self._set_progress(Progress("verify", save_info["game_info"]["game_id"], len(checks),
+                                                   sum(c.size for c in checks)))
+            try:
+                report = verify.run(checks, self.verify_threads,
+                                    on_done=lambda c, result: self._add_progress(c.size))
+            except Cancelled:
+                logger.warning(f'Verify of { save_info["filename"] } cancelled')
+                return None
+            finally:
+                progress.finish()
+
+        report["filename"] = save_info["filename"]
+        if report["corrupt"] or report["missing"]:
+            logger.error(
+                f'Snapshot { save_info["filename"] } is damaged, corrupt: { report["corrupt"] } missing: { report["missing"] }')
+        else:
+            logger.info(
+                f'Verified { report["files_ok"] } files ({ report["bytes_ok"] } bytes) of { save_info["filename"] }')
+        return report
+
+    """
+    Given a list of game_infos (None for all installed games), return a list of game_infos which are supported for
+    backups
     """
-    async def find_supported(self, game_infos: list) -> list[dict]:
+    async def find_supported(self, game_infos: list = None) -> list[dict]:
+        if game_infos is None:
+            game_infos = self.find_all_game_info()
         # if we get any sort of exception while scanning a particular game info, keep trying the others
         def try_rcf(info):
             try:
@@ -751,9 +1520,54 @@ class Engine:
                 return None
 
         # logger.debug(f'find supported { game_infos }')
-        supported = list(filter(try_rcf, game_infos))
+        game_infos = list(game_infos)
+        if self.concurrent_scan:
+            found = await self._map_by_device(try_rcf, game_infos)
+            supported = [info for info, rcf in zip(game_infos, found) if rcf]
+        else:
+            supported = await self._run_blocking(lambda: list(filter(try_rcf, game_infos)))
+        await self._run_blocking(self.roots_cache.save)
+        logger.debug(f'Steam file cache { self.vdf_cache.stats() }')
         return supported
 
+    """
+    Run fn(game_info) for each game on worker threads and return the results in the same order
+
+    Games are grouped by the storage device they are installed on, each device gets its own pool of threads (so a slow
+    SD card can't tie up the threads needed for the internal drive).
+    """
+    async def _map_by_device(self, fn, game_infos: list[dict]) -> list:
+        loop = asyncio.get_running_loop()
+        # stat each install root once, on our io thread (a sleeping SD card can take a while to answer)
+        devs = await self._run_blocking(self._get_devices, {info["install_root"] for info in game_infos})
+        futures = [loop.run_in_executor(self._device_executor(devs[info["install_root"]], info), fn, info)
+                   for info in game_infos]
+        return await asyncio.gather(*futures)
+
+    """
+    Map each directory to the st_dev of the device it is on (None if we can't stat it, fn will complain about it)
+    """
+    def _get_devices(self, dirs: set[str]) -> dict:
+        devs = {}
+        for d in dirs:
+            try:
+                devs[d] = os.stat(d).st_dev
+            except OSError:
+                devs[d] = None
+        return devs
+
+    """
+    The scanning thread pool for a device, made on first use and kept (threads are only started as they are needed)
+    """
+    def _device_executor(self, dev: int, game_info: dict) -> ThreadPoolExecutor:
+        executor = self._device_executors.get(dev)
+        if not executor:
+            workers = self.scan_threads_removable if self._is_on_mmc(
+                game_info) else self.scan_threads
+            executor = self._device_executors[dev] = ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix=f'scan_dev{ dev }')
+        return executor
+
     """
     Given a list of directory names, return a list of directories that are actually mounted
     """
@@ -777,6 +1591,16 @@ class Engine:
     Returns an array of SaveInfo objects
     """
     async def get_saveinfos(self) -> list[dict]:
+        return await self._run_blocking(self._get_saveinfos)
+
+    def _get_saveinfos(self) -> list[dict]:
+        return self._get_catalog().all()
+
+    """
+    Read all the saveinfo json files (in the same order as get_saveinfos), used to build our catalog
+    """
+
+    def _load_all_saveinfos(self) -> list[dict]:
         dir = self._get_savesdir()
         files = filter(lambda f: f.endswith(".json"), os.listdir(dir))
 
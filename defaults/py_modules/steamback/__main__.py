@@ -6,12 +6,86 @@ import os
 import platform
 import platformdirs
 import asyncio
-from . import Engine, Config, test, util, gui
+import sys
+from . import Engine, Config, test, util, gui, bench, server, client
 
 """The command line arguments"""
 args = None
 
 
+"""Verify all our snapshots, returns False if any of them are damaged"""
+
+
+async def verify_all(e: Engine) -> bool:
+    ok = True
+    for si in await e.get_saveinfos():
+        r = await e.do_verify(si)
+        damaged = r["corrupt"] + r["missing"]
+        print(f'{ si["filename"] }: { "DAMAGED" if damaged else "ok" } ({ r["files_ok"] } files ok'
+              f'{ ", " + str(r["unverified"]) + " unverified" if r["unverified"] else "" })')
+        for name in r["corrupt"]:
+            print(f'  corrupt: { name }')
+        for name in r["missing"]:
+            print(f'  missing: { name }')
+        ok = ok and not damaged
+    return ok
+
+
+"""Print all our snapshots, newest first"""
+
+
+async def list_saves(e: Engine) -> bool:
+    for si in await e.get_saveinfos():
+        name = si["game_info"].get("game_name") or si["game_info"]["game_id"]
+        kind = "undo" if si["is_undo"] else "in-session" if si.get("in_session") else "snapshot"
+        print(f'{ si["filename"] }: { name } ({ kind }, { gui.saveinfo_ago_str(si) })')
+    return True
+
+
+"""Backup one game now, returns False if we couldn't"""
+
+
+async def backup_game(e: Engine, game_id: int) -> bool:
+    infos = [g for g in await e.find_supported() if g["game_id"] == game_id]
+    if not infos:
+        print(f'Game { game_id } is not installed, or not supported')
+        return False
+    si = await e.do_backup(infos[0])
+    print(f'Saved { si["filename"] }' if si else "Nothing has changed since the last snapshot")
+    return True
+
+
+"""Run fn(engine) with the engine of the daemon listening on socket_path, or (if there isn't one) make_engine()"""
+
+
+async def with_engine(make_engine, socket_path: str, fn) -> bool:
+    c = await client.try_connect(socket_path)
+    if c is None:
+        return await fn(make_engine())
+    try:
+        return await fn(c)
+    finally:
+        await c.close()
+
+
+"""Watch for games to backup until we are killed, and let clients use our engine"""
+
+
+async def run_daemon(e: Engine, watcher, socket_path: str):
+    s = server.Server(e, socket_path, watcher) if server.available() else None
+    if s:
+        try:
+            await s.start()
+        except OSError as ex:
+            e.config.logger.error(f'Can\'t listen on { socket_path }: { ex }')
+            return
+    try:
+        await watcher.run_forever()
+    finally:
+        if s:
+            await s.close()
+
+
 def main():
     """Perform command line steamback operations"""
     parser = argparse.ArgumentParser()
@@ -19,8 +93,21 @@ def main():
                         action="store_true")
     parser.add_argument("--test", "-t", help="Run integration code test",
                         action="store_true")
-    parser.add_argument("--daemon", "-D", help="Run as a daemon that just looks for games to backup",
+    parser.add_argument("--bench", "-b", help="Run micro benchmarks of steamback internals",
+                        action="store_true")
+    parser.add_argument("--verify", "-V", help="Check that all saved snapshots are still intact",
+                        action="store_true")
+    parser.add_argument("--list", "-l", help="List all saved snapshots",
                         action="store_true")
+    parser.add_argument("--backup", type=int, metavar="GAME_ID",
+                        help="Backup a game now")
+    parser.add_argument("--daemon", "-D", help="Run as a daemon that looks for games to backup (other steamback "
+                        "commands and the GUI will use its engine)", action="store_true")
+    parser.add_argument("--socket", help="The daemon's socket (default is in the application data directory)")
+    parser.add_argument("--session-snapshots", "-S", type=float, metavar="MINUTES",
+                        help="Also snapshot running games every MINUTES (if their saves changed)")
+    parser.add_argument("--poll-tk", help="Make the GUI poll Tk for input (as on Windows and the Mac), rather than "
+                        "sleeping until X has some for it", action="store_true")
     parser.add_argument("--steampath", "-s",
                         help="Ignores auto detection and force a specific Steam path")
 
@@ -31,6 +118,11 @@ def main():
     logger = logging.getLogger()
     logger.info('Steamback running...')
 
+    if args.bench:
+        # benchmarks use synthetic data, so they don't need a steam install
+        bench.run()
+        return
+
     # FIXME - I bet the following will need tweaking for Windows
     plat_sys = platform.system()
     if plat_sys == "Windows":
@@ -68,22 +160,38 @@ def main():
     logger.info(f'Storing application data in { app_dir }')
 
     config = Config(logger, app_dir, steam_dir)
-    e = Engine(config)
-    e.auto_set_account_id()
-    e.max_saves = 50  # On desktop UIs we can show many more saves than 10
+    socket_path = args.socket or server.default_socket_path(app_dir)
+    session_interval = args.session_snapshots * 60 if args.session_snapshots else None
+
+    """Our own engine, for when there's no daemon to use"""
+    def make_engine() -> Engine:
+        e = Engine(config)
+        e.auto_set_account_id()
+        e.max_saves = 50  # On desktop UIs we can show many more saves than 10
 
-    all_games = e.find_all_game_info()
-    # print(f'All installed games: ')
-    # for i in all_games:
-    #    print(f'  {i}')
+        all_games = e.find_all_game_info()
+        # print(f'All installed games: ')
+        # for i in all_games:
+        #    print(f'  {i}')
+        return e
 
     if args.test:
-        asyncio.run(test.testImpl(e))
+        asyncio.run(test.testImpl(make_engine()))
+    elif args.verify:
+        if not asyncio.run(with_engine(make_engine, socket_path, verify_all)):
+            sys.exit(1)
+    elif args.list:
+        asyncio.run(with_engine(make_engine, socket_path, list_saves))
+    elif args.backup is not None:
+        if not asyncio.run(with_engine(make_engine, socket_path, lambda e: backup_game(e, args.backup))):
+            sys.exit(1)
     elif args.daemon:
-        d = util.SteamWatcher(e)
-        asyncio.run(d.run_forever())
+        e = make_engine()
+        # if we can, backup whenever steam finishes a cloud sync, rather than polling for game exits
+        asyncio.run(run_daemon(e, util.make_watcher(e, session_interval), socket_path))
     else:
-        gui.run(e)
+        gui.run(make_engine, app_dir, socket_path,
+                session_interval, args.poll_tk)
 
 
 if __name__ == "__main__":
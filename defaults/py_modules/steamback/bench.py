@@ -0,0 +1,452 @@
+#!python3
+
+import asyncio
+import hashlib
+import logging
+import os
+import random
+import re
+import selectors
+import shutil
+import time
+import tempfile
+from pathlib import Path
+from . import vdf, scan, copier, archive, chunks, store, verify, procwatch, util, Engine, Config
+
+"""Micro benchmarks for steamback internals (run with python -m steamback --bench)
+
+These use synthetic data in a temp directory, so no Steam install is needed.
+"""
+
+
+"""Time fn() a few times and return the best run in msecs
+"""
+
+
+def _time_best(fn, repeat: int = 5) -> float:
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None or elapsed < best else best
+    return best
+
+
+def _report(name: str, msecs: float, baseline: float = None):
+    speedup = f' ({ baseline / msecs:.1f}x)' if baseline else ''
+    print(f'  { name:<40} { msecs:10.2f} ms{ speedup }')
+
+
+"""Write a fake remotecache.vdf with num_entries files in it
+"""
+
+
+def write_remotecache(path: str, num_entries: int):
+    with open(path, "w") as f:
+        f.write('"892970"\n{\n\t"ChangeNumber"\t\t"-6703994677807818784"\n\t"ostype"\t\t"-184"\n')
+        for i in range(num_entries):
+            # an occasional escaped quote to exercise the slow path
+            name = f'save \\"{ i }\\".db' if i % 100 == 0 else f'save{ i }.db'
+            f.write(f'\t"worlds/world{ i }/{ name }"\n\t{{\n'
+                    f'\t\t"root"\t\t"2"\n\t\t"size"\t\t"{ 1000 + i }"\n'
+                    f'\t\t"localtime"\t\t"1671427173"\n\t\t"time"\t\t"1671427172"\n'
+                    f'\t\t"remotetime"\t\t"1671427172"\n'
+                    f'\t\t"sha"\t\t"df59d8d7b2f0c7ddd25e966493d61c1b{ i:08x}"\n'
+                    f'\t\t"syncstate"\t\t"1"\n\t\t"persiststate"\t\t"0"\n'
+                    f'\t\t"platformstosync2"\t\t"-1"\n\t}}\n')
+        f.write('}\n')
+
+
+"""The remotecache reader used by steamback <= 1.1.2 (kept as a baseline)
+"""
+
+
+def _legacy_read_rcf(path: str) -> list[str]:
+    rcf = []
+    with open(path) as f:
+        lines = f.read().split("\n")[2:]
+        prevl = None
+        skipping = False
+        for l in lines:
+            s = l.strip()
+            if skipping:
+                if s == "}":
+                    skipping = False
+            elif s == "{":
+                if prevl:
+                    rcf.append((prevl[1:])[:-1])
+                    prevl = None
+                skipping = True
+            else:
+                prevl = s
+    return rcf
+
+
+"""The flat key/value reader used by steamback <= 1.1.2 (kept as a baseline)
+"""
+
+
+def _legacy_parse_vcf(path: str) -> dict:
+    kvMatch = re.compile(r'\s*"(.+)"\s+"(.+)"\s*')
+    d = {}
+    with open(path) as f:
+        for line in f:
+            m = kvMatch.fullmatch(line)
+            if m:
+                d[m.group(1)] = m.group(2)
+    return d
+
+
+def bench_vdf(tmp: str):
+    num_entries = 10000
+    path = os.path.join(tmp, "remotecache.vdf")
+    write_remotecache(path, num_entries)
+    print(f'remotecache.vdf with { num_entries } entries '
+          f'({ os.path.getsize(path) // 1024 } KiB):')
+
+    rc = vdf.read_remotecache(path)
+    assert len(rc.entries) == num_entries
+    assert rc.entries[100].path == 'worlds/world100/save "100".db'
+
+    baseline = _time_best(lambda: _legacy_read_rcf(path))
+    _report("legacy _read_rcf (filenames only)", baseline)
+    _report("vdf.read_remotecache (paths)",
+            _time_best(lambda: vdf.read_remotecache(path).paths), baseline)
+    _report("vdf.read_remotecache (typed records)",
+            _time_best(lambda: vdf.read_remotecache(path).entries), baseline)
+    baseline = _time_best(lambda: _legacy_parse_vcf(path))
+    _report("legacy _parse_vcf (flat)", baseline)
+    _report("vdf.load_file (hierarchical)",
+            _time_best(lambda: vdf.load_file(path)), baseline)
+
+
+"""Make a fake game install: a few save dirs with autoclouds, buried in lots of engine/asset files
+"""
+
+
+def write_game_tree(root: str, num_asset_dirs: int = 200, files_per_dir: int = 50):
+    for i in range(num_asset_dirs):
+        for parent in ["Game_Data/StreamingAssets", "Game/Content/Paks", f"levels/level{ i % 10 }"]:
+            d = os.path.join(root, parent, f"assets{ i }")
+            os.makedirs(d, exist_ok=True)
+            for j in range(files_per_dir):
+                open(os.path.join(d, f"asset{ j }.bin"), "w").close()
+
+    for saves in ["saves", "Game/Saved/SaveGames", "levels/level3/user/profile", "levels/level5/user"]:
+        d = os.path.join(root, saves)
+        os.makedirs(d, exist_ok=True)
+        open(os.path.join(d, "steam_autocloud.vdf"), "w").close()
+
+    # a symlinked dir, which rglob doesn't follow
+    os.symlink(os.path.join(root, "saves"), os.path.join(root, "saves_link"))
+
+
+def bench_scan(tmp: str):
+    root = os.path.join(tmp, "game")
+    write_game_tree(root)
+
+    def rglob():
+        return [str(f.parent) for f in Path(root).rglob("steam_autocloud.vdf")]
+
+    unpruned = scan.find_dirs_containing(root, "steam_autocloud.vdf", max_depth=100, skip_dirs=frozenset())
+    r = scan.find_dirs_containing(root, "steam_autocloud.vdf")
+    assert unpruned.dirs == rglob(), "unpruned scan must match rglob exactly"
+    assert r.dirs == rglob(), "pruned scan must find the same autoclouds"
+    print(f'autocloud scan of a { unpruned.dirs_visited } dir tree '
+          f'(pruned scan visits { r.dirs_visited }):')
+
+    baseline = _time_best(rglob)
+    _report("Path.rglob", baseline)
+    _report("scan.find_dirs_containing (unpruned)", _time_best(
+        lambda: scan.find_dirs_containing(root, "steam_autocloud.vdf", max_depth=100, skip_dirs=frozenset())), baseline)
+    _report("scan.find_dirs_containing", _time_best(
+        lambda: scan.find_dirs_containing(root, "steam_autocloud.vdf")), baseline)
+
+
+def bench_copy(tmp: str):
+    small = os.path.join(tmp, "small")
+    os.makedirs(small)
+    for i in range(500):
+        with open(os.path.join(small, f"save{ i }.dat"), "wb") as f:
+            f.write(os.urandom(4096))
+    big = os.path.join(tmp, "big.dat")
+    with open(big, "wb") as f:
+        for i in range(64):
+            f.write(os.urandom(1024 * 1024))
+
+    auto = copier.Copier()
+    auto.copy2(big, os.path.join(tmp, "probe"))
+    chosen = [k for k, v in auto.counts.items() if v][0]
+    print(f'file copies (the method picked for this filesystem is { chosen }):')
+
+    # every run copies to fresh files, overwriting existing ones is slower and would skew the results
+    runs = iter(range(1000000))
+
+    def copy_small(copy2):
+        dest = os.path.join(tmp, f"dest{ next(runs) }")
+        os.makedirs(dest)
+        for f in os.listdir(small):
+            copy2(os.path.join(small, f), os.path.join(dest, f))
+
+    def copy_big(copy2):
+        copy2(big, os.path.join(tmp, f"dest{ next(runs) }"))
+
+    for size, fn in [("500 x 4 KiB", copy_small), ("64 MiB", copy_big)]:
+        baseline = _time_best(lambda: fn(shutil.copy2), repeat=3)
+        _report(f'{ size } shutil.copy2', baseline)
+        for strategy in copier.STRATEGIES:
+            c = copier.Copier(strategy)
+            try:
+                msecs = _time_best(lambda: fn(c.copy2), repeat=3)
+            except OSError as e:
+                print(f'  { size + " " + strategy:<40} not supported here ({ e.strerror })')
+                continue
+            _report(f'{ size } { strategy }', msecs, baseline)
+
+
+"""Compare backing up and restoring full snapshots with incremental ones (where only one file changed)
+"""
+
+
+def bench_snapshots(tmp: str):
+    game_dir = os.path.join(tmp, "game_saves")
+    rcf = []
+    for i in range(2000):
+        k = f"maps/map{ i // 100 }/sector{ i }.dat"
+        os.makedirs(os.path.dirname(os.path.join(game_dir, k)), exist_ok=True)
+        with open(os.path.join(game_dir, k), "wb") as f:
+            f.write(os.urandom(8192))
+        rcf.append(k)
+
+    logger = logging.getLogger("steamback_bench")
+    logger.setLevel(logging.WARNING)
+    e = Engine(Config(logger, os.path.join(tmp, "app"), tmp))
+    game_info = {"install_root": tmp, "game_id": 1,
+                 "game_name": "bench", "save_games_roots": {game_dir: ""}}
+
+    def snapshot(incremental: bool, previous: dict, dirty: dict = None) -> tuple[dict, float]:
+        e.incremental_snapshots = incremental
+        # one file changes between snapshots
+        with open(os.path.join(game_dir, rcf[0]), "wb") as f:
+            f.write(os.urandom(8192))
+        si = e._create_savedir(game_info)
+        start = time.perf_counter()
+        e._copy_all_to_saveinfo(si, rcf, previous, dirty=dirty)
+        return si, (time.perf_counter() - start) * 1000
+
+    base, base_msecs = snapshot(False, None)
+    full, full_msecs = snapshot(False, base)
+    incremental, incremental_msecs = snapshot(True, full)
+    assert len(os.listdir(e._saveinfo_to_dir(incremental))) == 1  # only the changed file's dir
+    # as if a DirtyTracker watched the game write the file (so the others don't even need a stat)
+    _, tracked_msecs = snapshot(
+        True, incremental, dirty={game_dir: {rcf[0]}})
+
+    print(f'snapshots of { len(rcf) } files with 1 changed:')
+    _report("first snapshot", base_msecs)
+    _report("full snapshot (hardlinked)", full_msecs, base_msecs)
+    _report("incremental snapshot", incremental_msecs, base_msecs)
+    _report("incremental with dirty tracking", tracked_msecs, base_msecs)
+
+    e.differential_restore = False
+    baseline = _time_best(lambda: e._copy_all_from_saveinfo(full, rcf), repeat=3)
+    _report("restore full snapshot (write everything)", baseline)
+    _report("restore incremental (write everything)", _time_best(
+        lambda: e._copy_all_from_saveinfo(incremental, rcf), repeat=3), baseline)
+
+    # the game files now match the incremental snapshot, so a restore of the full snapshot changes one file
+    e.differential_restore = True
+    report = e._copy_all_from_saveinfo(full, rcf)
+    assert report["files_written"] == 1
+    _report("differential restore (nothing changed)", _time_best(
+        lambda: e._copy_all_from_saveinfo(full, rcf), repeat=3), baseline)
+
+
+"""Compare the size and speed of archive snapshots with directory ones, on compressible (world/json like) saves
+"""
+
+
+def bench_archive(tmp: str):
+    game_dir = os.path.join(tmp, "world_saves")
+    rcf = []
+    for i in range(200):
+        k = f"worlds/world{ i // 20 }/chunk{ i }.json"
+        os.makedirs(os.path.dirname(os.path.join(game_dir, k)), exist_ok=True)
+        with open(os.path.join(game_dir, k), "w") as f:
+            for j in range(1000):
+                f.write(f'{{"x": { j }, "y": { (i * j) % 97 }, "block": "stone", "light": { j % 15 }}}\n')
+        rcf.append(k)
+    total = sum(os.path.getsize(os.path.join(game_dir, k)) for k in rcf)
+
+    logger = logging.getLogger("steamback_bench")
+    logger.setLevel(logging.WARNING)
+    e = Engine(Config(logger, os.path.join(tmp, "app_archive"), tmp))
+    e.differential_restore = False
+    game_info = {"install_root": tmp, "game_id": 2,
+                 "game_name": "bench", "save_games_roots": {game_dir: ""}}
+
+    print(f'snapshots of { len(rcf) } compressible files ({ total // 1024 } KiB), codec { archive.CODECS[0] }:')
+    results = {}
+    for format in ["dir", "archive"]:
+        e.snapshot_format = format
+        sis = []
+
+        def backup():
+            si = e._create_savedir(game_info)
+            e._copy_all_to_saveinfo(si, rcf)
+            sis.append(si)
+
+        backup_msecs = _time_best(backup, repeat=3)
+        si = sis[-1]
+        path = e._saveinfo_to_dir(si)
+        size = os.path.getsize(
+            path + ".sbar") if format == "archive" else total
+        restore_msecs = _time_best(
+            lambda: e._copy_all_from_saveinfo(si, rcf), repeat=3)
+        results[format] = (backup_msecs, restore_msecs)
+        dir_backup, dir_restore = results["dir"]
+        print(f'  { format } snapshot size { size // 1024 } KiB')
+        # (dir backups after the first only hash and hardlink, because the object store already has the files)
+        _report(f'{ format } backup', backup_msecs, dir_backup)
+        _report(f'{ format } restore all', restore_msecs, dir_restore)
+
+    # random access: pull one file out of the middle of the archive
+    reader = archive.ArchiveReader(path + ".sbar")
+    dest = os.path.join(tmp, "one_file")
+    _report("archive extract one file", _time_best(
+        lambda: reader.extract(rcf[100], dest)))
+
+
+def bench_chunks(tmp: str):
+    rnd = random.Random(42)
+    data = bytearray(rnd.randbytes(8 * 1024 * 1024))
+    msecs = _time_best(lambda: chunks.split(data), repeat=3)
+    print(f'content defined chunking of { len(data) // (1024 * 1024) } MiB:')
+    _report(f'split ({ len(data) / 1024 / msecs:.0f} MB/s)', msecs)
+
+    # a save which is rewritten each time with a few small changes, some of which move the rest of the file
+    stored = {}
+    whole = 0
+    versions = 10
+    for v in range(versions):
+        for i in range(5):
+            pos = rnd.randrange(len(data))
+            if i % 2:
+                data[pos:pos] = rnd.randbytes(rnd.randrange(1, 100))
+            else:
+                data[pos:pos + 16] = rnd.randbytes(16)
+        whole += len(data)
+        for c in chunks.split(bytes(data)):
+            stored[hashlib.sha256(c).digest()] = len(c)
+    chunked = sum(stored.values())
+    print(f'  { versions } versions with 5 small edits each: whole files { whole // 1024 } KiB, '
+          f'chunks { chunked // 1024 } KiB ({ whole / chunked:.1f}x smaller)')
+
+
+def bench_verify(tmp: str):
+    rnd = random.Random(7)
+    checks = []
+    for i in range(16):
+        path = os.path.join(tmp, f"verify{ i }.sav")
+        data = rnd.randbytes(8 * 1024 * 1024)
+        with open(path, "wb") as f:
+            f.write(data)
+        checks.append(verify.Check(
+            path, path, len(data), "sha256", hashlib.sha256(data).hexdigest()))
+    total = sum(c.size for c in checks)
+
+    def read_all():
+        for c in checks:
+            assert store.hash_file(c.source) == c.expected
+
+    print(f'verify { len(checks) } files ({ total // (1024 * 1024) } MiB, from the page cache):')
+    baseline = _time_best(read_all, repeat=3)
+    _report("one thread, 1 MiB reads", baseline)
+    for threads in [1, 4]:
+        _report(f'{ threads } thread(s), mmap', _time_best(
+            lambda: verify.run(checks, threads), repeat=3), baseline)
+
+
+def bench_procwatch(tmp: str):
+    if not procwatch.available():
+        print('process watching: no /proc on this system')
+        return
+    print(f'find running games among { len([n for n in os.listdir("/proc") if n.isdigit()]) } processes:')
+    baseline = _time_best(
+        util.find_running_games) if util.psutil else None
+    if baseline is not None:
+        _report("psutil scan of all processes", baseline)
+    else:
+        print(f'  { "psutil scan of all processes":<40} psutil not installed')
+    _report("/proc scan, first time",
+            _time_best(lambda: procwatch.ProcWatcher().running_games()), baseline)
+    w = procwatch.ProcWatcher()
+    w.running_games()
+    w.running_games()
+    _report("/proc scan, later times", _time_best(w.running_games), baseline)
+
+
+class _CountingSelector(selectors.DefaultSelector):
+    """A normal selector which counts how often the event loop sleeps, like TkSelector.wakeups
+    """
+    wakeups = 0
+
+    def select(self, timeout=None):
+        if timeout != 0:
+            self.wakeups += 1
+        return super().select(timeout)
+
+
+"""Run an idle GUI window on loop for secs, returns (CPU secs used, wakeups/s).  counter is the loop's selector
+"""
+
+
+def _run_idle_gui(root, loop: asyncio.AbstractEventLoop, counter, secs: float) -> tuple:
+    from . import gui  # (needs sv_ttk, which the rest of the benchmarks don't)
+    gui.logger = gui.logger or logging.getLogger()  # (normally set by gui.run)
+    loop.call_later(secs, root.destroy)
+    cpu = time.process_time()
+    try:
+        loop.run_until_complete(gui.main_loop(root))
+    finally:
+        loop.close()
+    return time.process_time() - cpu, counter.wakeups / secs
+
+
+def bench_tk_idle(tmp: str, secs: float = 10.0):
+    from tkinter import Tk, TclError
+    from . import tkloop
+    try:
+        root = Tk()
+    except TclError as e:
+        print(f'idle GUI: no display ({ e })')
+        return
+    print(f'idle GUI window for { secs:.0f}s:')
+    counter = _CountingSelector()
+    loop = asyncio.SelectorEventLoop(counter)
+    loop.tk_selector = None
+    results = [("polling Tk (--poll-tk)", _run_idle_gui(root, loop, counter, secs))]
+    root = Tk()
+    loop = tkloop.new_event_loop(root)
+    if loop.tk_selector:
+        results.append(("tkloop (the default)", _run_idle_gui(root, loop, loop.tk_selector, secs)))
+    else:
+        root.destroy()
+        loop.close()
+        print("  tkloop can't find the X connection here, so it would poll too")
+    for name, (cpu, rate) in results:
+        print(f'  { name:<40} { cpu * 1000 / secs:10.2f} ms CPU/s { rate:8.1f} wakeups/s')
+
+
+def run():
+    with tempfile.TemporaryDirectory() as tmp:
+        bench_vdf(tmp)
+        bench_scan(tmp)
+        bench_copy(tmp)
+        bench_snapshots(tmp)
+        bench_archive(tmp)
+        bench_chunks(tmp)
+        bench_verify(tmp)
+        bench_procwatch(tmp)
+        bench_tk_idle(tmp)
@@ -0,0 +1,119 @@
+#!python3
+
+from collections import OrderedDict
+import json
+import logging
+import os
+import threading
+
+"""A bounded LRU cache of parsed files
+
+Each entry remembers the (st_mtime_ns, st_size) of the file when it was parsed, a lookup stats the file
+and only calls the loader again if either changed.  So once warm a lookup costs one stat() call.
+
+Cached values are shared between callers, so they must be treated as read-only.  Safe to use from multiple threads
+(though two threads missing on the same file at once may both load it).
+"""
+
+
+class FileCache:
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        # path -> ((st_mtime_ns, st_size), value), least recently used first
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    """Return loader(path), reusing the previous result if the file hasn't changed since then
+
+    Raises FileNotFoundError (or other OSErrors) if the file can't be stat'ed
+    """
+
+    def get(self, path: str, loader):
+        st = os.stat(path)
+        stamp = (st.st_mtime_ns, st.st_size)
+
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry and entry[0] == stamp:
+                self.hits += 1
+                self._entries.move_to_end(path)
+                return entry[1]
+            self.misses += 1
+
+        value = loader(path)  # not holding the lock, so other files can be loaded meanwhile
+        with self._lock:
+            self._entries[path] = (stamp, value)
+            self._entries.move_to_end(path)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    """Forget all cached files"""
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+"""The save_games_roots we have discovered for each game, persisted as JSON in app_data_dir
+
+Finding the roots is expensive (it scans the install and proton prefix trees), so we keep the result along with a key
+describing everything the search depended on.  An entry is only used if its key still matches.  Games we couldn't
+support are stored too (as None) so they aren't rescanned either.
+"""
+
+
+class RootsCache:
+    def __init__(self, path: str):
+        self.path = path
+        self._games = None  # loaded on first use, str(game_id) -> {"key": list, "roots": dict or None}
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    def _load(self) -> dict:
+        if self._games is None:
+            try:
+                with open(self.path) as f:
+                    self._games = json.load(f)["games"]
+            except FileNotFoundError:
+                self._games = {}
+            except Exception as e:
+                # a corrupted cache just means we need to rescan
+                logging.getLogger().warning(
+                    f'Ignoring unreadable { self.path }, { e }')
+                self._games = {}
+        return self._games
+
+    """Return (True, roots) if we have a result for this game with a matching key, otherwise (False, None)
+    """
+
+    def get(self, game_id: int, key: list) -> tuple[bool, dict]:
+        with self._lock:
+            entry = self._load().get(str(game_id))
+        if entry and entry["key"] == key:
+            return True, entry["roots"]
+        return False, None
+
+    def put(self, game_id: int, key: list, roots: dict):
+        with self._lock:
+            self._load()[str(game_id)] = {"key": key, "roots": roots}
+            self._dirty = True
+
+    """Write our entries to disk (if anything changed)"""
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp = self.path + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump({"version": 1, "games": self._games}, f)
+            os.replace(tmp, self.path)
+            self._dirty = False
@@ -0,0 +1,189 @@
+#!python3
+
+import contextlib
+import json
+import os
+import sqlite3
+import threading
+
+"""An index of our snapshots, so finding them doesn't need to read every saves2/*.json file
+
+The json files are still written (and are still the master copy), this is a sqlite database of their contents
+indexed by game and time.  We remember the mtime of the saves directory after each of our own changes (made inside
+changing()), if it differs the next time we look (someone else, i.e. an older steamback, added or removed snapshots) we
+reimport everything from the json files.
+"""
+
+# bump this whenever _schema changes, older catalogs are then simply rebuilt from the json files
+_version = 2
+
+_schema = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    filename TEXT PRIMARY KEY,
+    game_id INTEGER NOT NULL,
+    timestamp INTEGER NOT NULL,
+    is_undo INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    info TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS snapshots_by_game ON snapshots (is_undo, game_id, timestamp);
+CREATE INDEX IF NOT EXISTS snapshots_by_time ON snapshots (is_undo, timestamp);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class Catalog:
+    """load_all() must return the saveinfos from all the json files, it is used to (re)build the catalog
+    """
+
+    def __init__(self, path: str, saves_dir: str, load_all):
+        self.saves_dir = saves_dir
+        self.load_all = load_all
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        if self._db.execute("PRAGMA user_version").fetchone()[0] != _version:
+            self._db.executescript(
+                f"DROP TABLE IF EXISTS snapshots; DROP TABLE IF EXISTS meta; PRAGMA user_version = { _version };")
+        self._db.executescript(_schema)
+        self._changing = 0  # how many of our own changes to the saves directory are in progress
+        self.reimports = 0  # how many times we've reloaded all the json files
+
+    def close(self):
+        self._db.close()
+
+    def _dir_stamp(self) -> str:
+        return str(os.stat(self.saves_dir).st_mtime_ns)
+
+    def _get_meta(self, key: str) -> str:
+        row = self._db.execute(
+            "SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value: str):
+        self._db.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    """Reimport all the json files if the saves directory was changed by someone other than us
+    """
+
+    def _sync(self):
+        if self._changing:
+            return  # the directory is changing under us, any difference is (probably) ours
+        stamp = self._dir_stamp()
+        if self._get_meta("dir_mtime") == stamp:
+            return
+        self.reimports += 1
+        infos = self.load_all()
+        with self._db:
+            self._db.execute("DELETE FROM snapshots")
+            self._db.executemany("INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?, ?, ?, ?)",
+                                 map(self._to_row, infos))
+            self._set_meta("dir_mtime", stamp)
+
+    @staticmethod
+    def _to_row(si: dict) -> tuple:
+        # snapshots from before we recorded sizes count as 0 bytes
+        return (si["filename"], si["game_info"]["game_id"], si["timestamp"], int(si["is_undo"]), si.get("size", 0),
+                json.dumps(si))
+
+    def _query(self, sql: str, args: tuple = ()) -> list[dict]:
+        with self._lock:
+            self._sync()
+            return [json.loads(r[0]) for r in self._db.execute(sql, args)]
+
+    """Wrap anything which changes the saves directory (i.e. making or deleting a snapshot) in this, so our own changes
+    don't look like someone else's.  Changes others make while we are inside go unnoticed until they make another.
+    """
+    @contextlib.contextmanager
+    def changing(self):
+        with self._lock:
+            self._sync()  # catch up with anyone else's changes first
+            self._changing += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._changing -= 1
+                with self._db:
+                    self._set_meta("dir_mtime", self._dir_stamp())
+
+    """Add (or update) a snapshot, call (inside changing()) after its json file has been written
+    """
+
+    def put(self, si: dict):
+        with self._lock:
+            with self._db:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?, ?, ?, ?)", self._to_row(si))
+
+    """Forget a snapshot, call (inside changing()) after its files have been deleted
+    """
+
+    def remove(self, filename: str):
+        with self._lock:
+            with self._db:
+                self._db.execute(
+                    "DELETE FROM snapshots WHERE filename = ?", (filename,))
+
+    """All snapshots, undos first then the saves, each newest first
+    """
+
+    def all(self) -> list[dict]:
+        return self._query("SELECT info FROM snapshots ORDER BY is_undo DESC, timestamp DESC")
+
+    def newest_for_game(self, game_id: int) -> dict:
+        r = self._query("SELECT info FROM snapshots WHERE is_undo = 0 AND game_id = ? ORDER BY timestamp DESC LIMIT 1",
+                        (game_id,))
+        return r[0] if r else None
+
+    """The saves (not undos) for a game, newest first
+    """
+
+    def list_for_game(self, game_id: int) -> list[dict]:
+        return self._query("SELECT info FROM snapshots WHERE is_undo = 0 AND game_id = ? ORDER BY timestamp DESC",
+                           (game_id,))
+
+    """The oldest n saves (or undos), oldest first
+    """
+
+    def oldest(self, n: int, is_undo: bool = False) -> list[dict]:
+        return self._query("SELECT info FROM snapshots WHERE is_undo = ? ORDER BY timestamp ASC LIMIT ?",
+                           (int(is_undo), n))
+
+    """(filename, game_id, timestamp, size) for each save (not undo), oldest first.  Cheaper than oldest() when only
+    deciding what to delete, because the json is not loaded
+    """
+
+    def save_sizes(self) -> list[tuple]:
+        with self._lock:
+            self._sync()
+            return self._db.execute(
+                "SELECT filename, game_id, timestamp, size FROM snapshots WHERE is_undo = 0 ORDER BY timestamp ASC").fetchall()
+
+    """The snapshots with the given filenames (in no particular order, unknown filenames are ignored)
+    """
+
+    def get_many(self, filenames: list[str]) -> list[dict]:
+        r = []
+        for i in range(0, len(filenames), 500):  # stay well below sqlite's limit on the number of parameters
+            batch = filenames[i:i + 500]
+            r.extend(self._query(f'SELECT info FROM snapshots WHERE filename IN ({ ", ".join("?" * len(batch)) })',
+                                 tuple(batch)))
+        return r
+
+    def count(self, is_undo: bool = False) -> int:
+        return self._scalar("SELECT COUNT(*) FROM snapshots WHERE is_undo = ?", (int(is_undo),))
+
+    """The total size of the files in all our snapshots (before deduplication)
+    """
+
+    def total_size(self) -> int:
+        return self._scalar("SELECT COALESCE(SUM(size), 0) FROM snapshots")
+
+    def _scalar(self, sql: str, args: tuple = ()):
+        with self._lock:
+            self._sync()
+            return self._db.execute(sql, args).fetchone()[0]
@@ -0,0 +1,81 @@
+#!python3
+
+from typing import NamedTuple, BinaryIO, Iterator
+import hashlib
+
+"""Content defined chunking, so a large save file which only changed in a few places shares most of its chunks
+with the previous version
+
+Chunk boundaries come from a rolling 'gear' hash over the last few bytes: h = ((h << 1) + gear[byte]) & mask, cutting
+where all the bits of h are set.  Because the boundaries depend only on the nearby contents (not on file offsets), an
+insert or delete only changes the chunks around it.  Our gear values are single bits, which makes the hash of the
+last BITS bytes just their gear bits, so we can find the cut points with bytes.translate and bytes.find (both run at C
+speed) rather than a python loop over every byte.
+"""
+
+BITS = 15  # so on random data we cut on average every 2^15 = 32 KiB (past MIN_SIZE)
+MIN_SIZE = 8 * 1024
+MAX_SIZE = 128 * 1024
+_READ_SIZE = 4 * 1024 * 1024
+
+# one pseudo random bit per byte value, from a fixed hash so it never changes between versions
+_gear_bits = int.from_bytes(hashlib.sha256(b"steamback gear").digest(), "big")
+_GEAR = bytes.maketrans(bytes(range(256)), bytes(
+    (_gear_bits >> i) & 1 for i in range(256)))
+_RUN = b"\x01" * BITS
+
+
+class Chunked(NamedTuple):
+    chunks: list[str]  # the sha256s of the chunks which make up a file
+
+
+"""Return where the next chunk starting at pos ends, gears is data translated with _GEAR
+"""
+
+
+def _next_cut(gears: bytes, pos: int, end: int) -> int:
+    limit = min(pos + MAX_SIZE, end)
+    if limit - pos <= MIN_SIZE:
+        return limit
+    # the hash at a cut point covers the BITS bytes before it, and a chunk must be at least MIN_SIZE long
+    i = gears.find(_RUN, pos + MIN_SIZE - BITS, limit)
+    return limit if i < 0 else i + BITS
+
+
+"""Split bytes into chunks
+"""
+
+
+def split(data: bytes) -> list[bytes]:
+    gears = data.translate(_GEAR)
+    r = []
+    pos = 0
+    while pos < len(data):
+        cut = _next_cut(gears, pos, len(data))
+        r.append(data[pos:cut])
+        pos = cut
+    return r
+
+
+"""Read a file as a series of chunks, without holding more than a few MB of it in memory
+"""
+
+
+def iter_chunks(f: BinaryIO) -> Iterator[bytes]:
+    buf = b""
+    gears = b""
+    pos = 0
+    eof = False
+    while True:
+        while not eof and len(buf) - pos < MAX_SIZE:
+            # refill (dropping what we've already returned)
+            more = f.read(_READ_SIZE)
+            eof = not more
+            buf = buf[pos:] + more
+            gears = gears[pos:] + more.translate(_GEAR)
+            pos = 0
+        if pos >= len(buf):
+            return
+        cut = _next_cut(gears, pos, len(buf))
+        yield buf[pos:cut]
+        pos = cut
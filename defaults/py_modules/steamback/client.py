@@ -0,0 +1,185 @@
+#!python3
+
+import asyncio
+import itertools
+import json
+import logging
+import traceback
+from . import server
+from .util import CheckResult
+
+"""Talk to a steamback daemon (see server.py), so we can use its warm Engine instead of building our own
+
+Client has the same async methods as Engine for the things the GUI and command line need, so either can be used.
+"""
+
+
+class RemoteError(Exception):
+    """An error returned by the daemon (code is the JSON-RPC error code)
+    """
+
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+
+
+class Client:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._reader = reader
+        self._writer = writer
+        self._ids = itertools.count(1)
+        self._pending = {}  # request id -> the future for its result
+        self._callbacks = {}  # topic -> list of fn(params)
+        self._read_task = asyncio.create_task(self._read_loop())
+
+    """Connect to the daemon listening at path, raises OSError if there isn't one
+    """
+    @classmethod
+    async def connect(cls, path: str) -> "Client":
+        reader, writer = await asyncio.open_unix_connection(path, limit=server.LINE_LIMIT)
+        return cls(reader, writer)
+
+    async def close(self):
+        self._read_task.cancel()
+        self._writer.close()
+
+    async def _read_loop(self):
+        try:
+            while True:
+                line = await self._reader.readline()
+                if not line:
+                    break
+                msg = json.loads(line)
+                if "id" in msg:
+                    f = self._pending.pop(msg["id"], None)
+                    if f and not f.done():
+                        if "error" in msg:
+                            f.set_exception(RemoteError(
+                                msg["error"]["code"], msg["error"]["message"]))
+                        else:
+                            f.set_result(msg.get("result"))
+                else:
+                    for fn in self._callbacks.get(msg.get("method"), []):
+                        # a broken subscriber mustn't cost everyone else the connection
+                        try:
+                            fn(msg.get("params"))
+                        except Exception:
+                            logging.getLogger().error(
+                                f'Error handling { msg.get("method") } notification, exception { traceback.format_exc() }')
+        except (ConnectionError, ValueError) as e:
+            logging.getLogger().warning(f'Lost connection to steamback daemon: { e }')
+        finally:
+            for f in self._pending.values():
+                if not f.done():
+                    f.set_exception(ConnectionError(
+                        "Lost connection to steamback daemon"))
+            self._pending = {}
+
+    """Call a method in the daemon and return its result, raises RemoteError if it fails
+    """
+    async def call(self, method: str, *params):
+        if self._read_task.done():
+            raise ConnectionError("Lost connection to steamback daemon")
+        id = next(self._ids)
+        f = asyncio.get_running_loop().create_future()
+        self._pending[id] = f
+        self._writer.write(json.dumps(
+            {"jsonrpc": "2.0", "id": id, "method": method, "params": list(params)}).encode() + b"\n")
+        await self._writer.drain()
+        return await f
+
+    """Call fn(params) for each notification of topic (see server.TOPICS) the daemon sends us
+    """
+    async def subscribe(self, topic: str, fn):
+        self._callbacks.setdefault(topic, []).append(fn)
+        if len(self._callbacks[topic]) == 1:
+            await self.call("subscribe", topic)
+
+    async def do_backup(self, game_info: dict, dry_run: bool = False, in_session: bool = False) -> dict:
+        return await self.call("do_backup", game_info, dry_run, in_session)
+
+    async def do_restore(self, save_info: dict) -> dict:
+        return await self.call("do_restore", save_info)
+
+    """Like Engine.do_verify, but without stop (we can't send the daemon a threading.Event)
+    """
+    async def do_verify(self, save_info: dict, background: bool = False) -> dict:
+        return await self.call("do_verify", save_info, background)
+
+    async def get_saveinfos(self) -> list[dict]:
+        return await self.call("get_saveinfos")
+
+    async def find_all_game_info(self) -> list[dict]:
+        return await self.call("find_all_game_info")
+
+    async def find_supported(self, game_infos: list = None) -> list[dict]:
+        return await self.call("find_supported", game_infos)
+
+    async def find_mounted(self, dirs: list) -> list[dict]:
+        return await self.call("find_mounted", dirs)
+
+    async def get_progress(self) -> dict:
+        return await self.call("get_progress")
+
+    async def cancel(self) -> bool:
+        return await self.call("cancel")
+
+    async def get_io_state(self) -> dict:
+        return await self.call("get_io_state")
+
+    async def get_status(self) -> dict:
+        return await self.call("get_status")
+
+
+"""Connect to the daemon at path, or return None if it isn't running
+"""
+
+
+async def try_connect(path: str) -> Client:
+    if not server.available():
+        return None
+    try:
+        return await Client.connect(path)
+    except OSError:
+        return None
+
+
+"""Stands in for a util.SteamWatcher when the daemon is doing the watching (and the backups), for the GUI
+"""
+
+
+class RemoteWatcher:
+    def __init__(self, client: Client):
+        self.client = client
+        self._status = {}
+        self._backed_up = []
+        self._changed = asyncio.Event()  # set when the daemon tells us something
+
+    async def start(self):
+        await self.client.subscribe("backup", self._on_backup)
+
+    def _on_backup(self, params: dict):
+        if params["saveinfo"] is not None:
+            self._backed_up.append(params["saveinfo"])
+        self._changed.set()
+
+    """Like SteamWatcher.check_once(), returns the backups the daemon finished since we last looked
+    """
+    async def check_once(self) -> CheckResult:
+        self._changed.clear()
+        was_running = self._status.get("game_running", False)
+        self._status = await self.client.get_status()
+        backed_up, self._backed_up = self._backed_up, []
+        return CheckResult(game_started=self._status["game_running"] and not was_running, backed_up=backed_up)
+
+    """The daemon's status as of the last check_once()
+    """
+
+    def status(self) -> dict:
+        return self._status
+
+    async def wait(self, timeout: float = 5):
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
@@ -0,0 +1,146 @@
+#!python3
+
+import errno
+import fcntl
+import logging
+import os
+import shutil
+import threading
+
+"""Copy files using the fastest method the source and destination filesystems support
+
+In order of preference:
+    reflink - a copy on write clone (btrfs, XFS...), nearly instant and uses no extra space
+    copy_file_range - the kernel copies the data (and may do it server side on NFS etc)
+    sendfile - the kernel copies the data
+    copyfile - plain reads and writes
+
+The first copy between a pair of devices works out which methods work, later copies between them go straight to
+that method.  A method which copies less than the whole file (some filesystems return 0 from copy_file_range for data
+which is there) counts as not working.  Like shutil.copy2 the file metadata (permissions and times) are copied too.
+"""
+
+FICLONE = 0x40049409  # _IOW(0x94, 9, int) from linux/fs.h
+
+STRATEGIES = ["reflink", "copy_file_range", "sendfile", "copyfile"]
+
+# errors which mean 'this method isn't supported here' (as opposed to a real I/O problem)
+# (anything else, e.g. EBADF or EPERM, is a real problem which a plain copy would only hide)
+_unsupported = {errno.EXDEV, errno.EOPNOTSUPP, errno.ENOSYS, errno.EINVAL}
+
+_CHUNK = 64 * 1024 * 1024
+_BUFSIZE = 1024 * 1024
+
+
+# each method returns how many bytes it copied
+
+
+def _reflink(src_fd: int, dst_fd: int, size: int) -> int:
+    try:
+        fcntl.ioctl(dst_fd, FICLONE, src_fd)
+    except OSError as e:
+        if e.errno == errno.ENOTTY:  # how some filesystems (i.e. FUSE ones) say they don't know FICLONE
+            raise OSError(errno.EOPNOTSUPP, e.strerror) from e
+        raise
+    return size
+
+
+def _copy_file_range(src_fd: int, dst_fd: int, size: int) -> int:
+    copied = 0
+    while copied < size:
+        n = os.copy_file_range(src_fd, dst_fd, min(_CHUNK, size - copied))
+        if n == 0:
+            break  # the file got shorter while we were copying (or the filesystem doesn't really support this)
+        copied += n
+    return copied
+
+
+def _sendfile(src_fd: int, dst_fd: int, size: int) -> int:
+    copied = 0
+    while copied < size:
+        n = os.sendfile(dst_fd, src_fd, copied, min(_CHUNK, size - copied))
+        if n == 0:
+            break
+        copied += n
+    return copied
+
+
+_funcs = {
+    "reflink": _reflink,
+    "copy_file_range": _copy_file_range if hasattr(os, "copy_file_range") else None,
+    "sendfile": _sendfile if hasattr(os, "sendfile") else None,
+}
+
+
+class Copier:
+    """If strategy is set we always use that method (used for benchmarking), otherwise we pick the best per device pair
+    """
+
+    def __init__(self, strategy: str = None):
+        assert strategy is None or strategy in STRATEGIES
+        self.strategy = strategy
+        self._best = {}  # (src st_dev, dest st_dev) -> index in STRATEGIES of the first method that might work
+        self._lock = threading.Lock()
+        self.counts = dict.fromkeys(STRATEGIES, 0)  # how many files each method has copied
+
+    """Copy src to the file dst, along with its metadata (a replacement for shutil.copy2 when dst is not a directory)
+    """
+
+    def copy2(self, src: str, dst: str):
+        method = self._copy_data(src, dst)
+        shutil.copystat(src, dst)
+        with self._lock:
+            self.counts[method] += 1
+
+    def _copy_data(self, src: str, dst: str) -> str:
+        if self.strategy == "copyfile":
+            shutil.copyfile(src, dst)
+            return "copyfile"
+
+        with open(src, "rb") as fsrc:
+            st = os.fstat(fsrc.fileno())
+            with open(dst, "wb") as fdst:
+                if self.strategy:
+                    if _funcs[self.strategy](fsrc.fileno(), fdst.fileno(), st.st_size) < st.st_size:
+                        raise OSError(errno.EIO, f'{ self.strategy } copied less than all of', src)
+                    return self.strategy
+
+                key = (st.st_dev, os.fstat(fdst.fileno()).st_dev)
+                start = self._best.get(key, 0)
+                shrank = False  # the source got shorter while we copied it, so we've learnt nothing about the methods
+                for i in range(start, len(STRATEGIES) - 1):
+                    fn = _funcs[STRATEGIES[i]]
+                    if not fn:
+                        continue
+                    try:
+                        copied = fn(fsrc.fileno(), fdst.fileno(), st.st_size)
+                        if copied >= st.st_size:
+                            self._remember(key, i)
+                            return STRATEGIES[i]
+                        if os.fstat(fsrc.fileno()).st_size > copied:
+                            # the data is there, this method just didn't copy it, so never use it for these devices
+                            logging.getLogger().warning(
+                                f'{ STRATEGIES[i] } only copied { copied } of { st.st_size } bytes of { src }')
+                            self._remember(key, i + 1)
+                        else:
+                            shrank = True
+                    except OSError as e:
+                        if e.errno not in _unsupported:
+                            raise
+                    # rewind, then try the next method
+                    fsrc.seek(0)
+                    fdst.seek(0)
+                    fdst.truncate()
+
+                # a plain read/write copy (not shutil.copyfile, on linux that uses sendfile too)
+                shutil.copyfileobj(fsrc, fdst, _BUFSIZE)
+        if not shrank:
+            self._remember(key, len(STRATEGIES) - 1)
+        return "copyfile"
+
+    def _remember(self, key: tuple, index: int):
+        if self._best.get(key) != index:
+            logging.getLogger().debug(
+                f'Copying from dev { key[0] } to { key[1] } using { STRATEGIES[index] }')
+            with self._lock:
+                self._best[key] = index
@@ -0,0 +1,156 @@
+#!python3
+
+import os
+import select
+import threading
+from . import inotify
+
+"""Track which save files a game writes while it is running, so the backup when it exits only needs to look at those
+
+We watch the directories holding the files of the game's previous snapshot, and the directories between them and
+their game root (with inotify, on a background thread).  Any file written, renamed, deleted or touched in them becomes
+dirty.  A directory created (or moved in) while the game runs is watched too, and every file in it becomes dirty (it
+might be replacing a directory of known files), as does every known file under a directory which is removed or moved
+away.  Files which aren't dirty still have the contents the previous snapshot has for them, so the backup can just
+refer to those.  If anything makes us unsure (events lost to a queue overflow, a game root removed or moved, too many
+watches) the tracker gives up and the backup looks at everything, as it would without us.
+"""
+
+_MASK = (inotify.IN_CLOSE_WRITE | inotify.IN_MODIFY | inotify.IN_ATTRIB | inotify.IN_CREATE | inotify.IN_DELETE |
+         inotify.IN_MOVED_FROM | inotify.IN_MOVED_TO | inotify.IN_MOVE_SELF | inotify.IN_ONLYDIR)
+
+
+"""reldir and all the directories above it (up to '', the root)
+"""
+
+
+def _with_parents(reldir: str) -> set[str]:
+    r = {""}
+    while reldir:
+        r.add(reldir)
+        reldir = os.path.dirname(reldir)
+    return r
+
+
+class DirtyTracker:
+    """known is a dict of game root directory -> the manifest of the previous snapshot for it ({filename: [sha256, size,
+    mtime_ns, ...]}), only these files are tracked
+    """
+
+    def __init__(self, known: dict):
+        self.known = known
+        self.dirty = {root: set() for root in known}
+        self.reliable = True
+        self._lock = threading.Lock()
+        self._inotify = inotify.Inotify()
+        self._wds = {}  # watch descriptor -> (root, directory relative to root)
+        for root, files in known.items():
+            reldirs = set()
+            for k in files:
+                reldirs |= _with_parents(os.path.dirname(k))
+            for reldir in reldirs:
+                self._add_watch(root, reldir)
+        self._stop_r, self._stop_w = os.pipe()
+        self._thread = threading.Thread(
+            target=self._run, name="steamback_dirty", daemon=True)
+        self._thread.start()
+
+        # the game might have written some files before we started watching
+        for root, files in known.items():
+            for k, e in files.items():
+                try:
+                    st = os.stat(os.path.join(root, k))
+                    changed = st.st_size != e[1] or st.st_mtime_ns != e[2]
+                except OSError:
+                    changed = True
+                if changed:
+                    self._mark(root, k)
+
+    def _add_watch(self, root: str, reldir: str):
+        try:
+            wd = self._inotify.add_watch(os.path.join(root, reldir), _MASK)
+            self._wds[wd] = (root, reldir)
+        except OSError:
+            self.reliable = False  # a directory is already gone, or we are out of watches
+
+    def _mark(self, root: str, k: str):
+        with self._lock:
+            self.dirty[root].add(k)
+
+    """A directory appeared (or went away), watch whatever is in it now and mark all its files (and any known files
+    which were under it) dirty
+    """
+
+    def _dir_changed(self, root: str, reldir: str, appeared: bool):
+        prefix = reldir + os.sep
+        for k in self.known[root]:
+            if k.startswith(prefix):
+                self._mark(root, k)
+        if not appeared:
+            return
+        # watch first, so anything written after we look is caught by the watches
+        for dirpath, dirnames, filenames in os.walk(os.path.join(root, reldir)):
+            rel = os.path.relpath(dirpath, root)
+            self._add_watch(root, rel)
+            for name in filenames:
+                self._mark(root, os.path.join(rel, name))
+
+    def _handle(self, events: list[inotify.Event]):
+        for ev in events:
+            if ev.mask & inotify.IN_Q_OVERFLOW:
+                self.reliable = False
+                continue
+            if ev.mask & (inotify.IN_IGNORED | inotify.IN_MOVE_SELF):
+                # below a root its parent's event told us about it, but we can't see above a root
+                where = self._wds.pop(ev.wd, None) if ev.mask & inotify.IN_IGNORED else self._wds.get(ev.wd)
+                if where is None or where[1] == "":
+                    self.reliable = False
+                continue
+            where = self._wds.get(ev.wd)
+            if where and ev.name:
+                root, reldir = where
+                k = os.path.join(reldir, ev.name) if reldir else ev.name
+                if ev.mask & inotify.IN_ISDIR:
+                    if ev.mask & (inotify.IN_CREATE | inotify.IN_MOVED_TO | inotify.IN_DELETE | inotify.IN_MOVED_FROM):
+                        self._dir_changed(
+                            root, k, bool(ev.mask & (inotify.IN_CREATE | inotify.IN_MOVED_TO)))
+                else:
+                    self._mark(root, k)
+
+    def _run(self):
+        while True:
+            readable = select.select(
+                [self._inotify.fileno(), self._stop_r], [], [])[0]
+            if self._stop_r in readable:
+                return
+            self._handle(self._inotify.read())
+
+    """True if any file is dirty so far, None if we can't be sure
+    """
+
+    def has_dirty(self) -> bool:
+        if not self.reliable:
+            return None
+        with self._lock:
+            return any(self.dirty.values())
+
+    """The dirty files so far (a dict of game root directory -> set of filenames), including new files which weren't in
+    known
+    """
+
+    def dirty_files(self) -> dict:
+        with self._lock:
+            return {root: set(files) for root, files in self.dirty.items()}
+
+    """Stop tracking, returns the dirty files (a dict of game root directory -> set of filenames) or None if we can't
+    be sure which files changed
+    """
+
+    def finish(self) -> dict:
+        os.write(self._stop_w, b"x")
+        self._thread.join()
+        self._handle(self._inotify.read())  # anything which arrived while we were stopping
+        self._inotify.close()
+        os.close(self._stop_r)
+        os.close(self._stop_w)
+        return self.dirty if self.reliable else None
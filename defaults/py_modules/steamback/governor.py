@@ -0,0 +1,211 @@
+#!python3
+
+import collections
+import ctypes
+import ctypes.util
+import logging
+import platform
+import sys
+import threading
+import time
+
+"""Keep our background disk work (backups, culling and scrubbing) from getting in the way of the games
+
+Background jobs report each file they handle to an IoGovernor, which sleeps as needed to keep them under a byte and
+file rate (token buckets).  While a game is running the limits are lower (or the work pauses completely) and the
+worker threads drop to the idle I/O priority class, so the kernel only gives them the disk when the game doesn't
+want it (if the disk's I/O scheduler supports priorities, i.e. bfq).
+"""
+
+_IOPRIO_CLASS_SHIFT = 13
+_IOPRIO_CLASS_BE = 2  # the default ("best effort")
+_IOPRIO_CLASS_IDLE = 3
+_IOPRIO_WHO_PROCESS = 1  # with a who of 0 this means the calling thread
+
+_ioprio_set_nr = {"x86_64": 251, "aarch64": 30, "i386": 289, "i686": 289}.get(
+    platform.machine())
+_libc = None
+
+
+"""Set the I/O priority class of the calling thread, returns False if we can't
+"""
+
+
+def set_thread_ioprio(idle: bool) -> bool:
+    global _libc
+    if not sys.platform.startswith("linux") or _ioprio_set_nr is None:
+        return False
+    try:
+        if _libc is None:
+            _libc = ctypes.CDLL(ctypes.util.find_library(
+                "c") or "libc.so.6", use_errno=True)
+        prio = (_IOPRIO_CLASS_IDLE << _IOPRIO_CLASS_SHIFT) if idle else (
+            _IOPRIO_CLASS_BE << _IOPRIO_CLASS_SHIFT) | 4
+        return _libc.syscall(_ioprio_set_nr, _IOPRIO_WHO_PROCESS, 0, prio) == 0
+    except (OSError, AttributeError):
+        return False
+
+
+class TokenBucket:
+    """Allows rate units per sec on average, in bursts of up to burst units
+    """
+
+    def __init__(self, rate: float, burst: float = None):
+        self.rate = rate
+        self.burst = burst if burst is not None else rate
+        self.tokens = self.burst
+        self.stamp = time.monotonic()
+
+    """Take n units, returns how many secs to sleep before using them (0 if they are available now)
+    """
+
+    def take(self, n: float) -> float:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens +
+                          (now - self.stamp) * self.rate)
+        self.stamp = now
+        self.tokens -= n
+        return -self.tokens / self.rate if self.tokens < 0 else 0
+
+
+class IoGovernor:
+    def __init__(self):
+        # the limits for background work, None for unlimited
+        self.bytes_per_sec: float = None
+        self.files_per_sec: float = None
+        # the limits while a game is running
+        self.game_bytes_per_sec: float = 8 * 1024 * 1024
+        self.game_files_per_sec: float = 200
+        # deleting old snapshots has its own limits (so culling doesn't use up the file rate the backups need)
+        self.deletes_per_sec: float = None
+        self.game_deletes_per_sec: float = 20
+        self.pause_during_games = False  # if True stop background work completely while a game runs
+        self.idle_ioprio = True  # use the idle I/O priority class while a game runs
+
+        self.game_running = False
+        self._lock = threading.Lock()
+        self._resumed = threading.Condition(self._lock)
+        self._buckets = {}  # (bytes limit, files limit) -> (bytes bucket, files bucket)
+        self._delete_bucket = None  # the TokenBucket for the current deletes limit
+        self._local = threading.local()  # .governed and .idle for the job running on each thread
+        self._recent = collections.deque()  # (time, bytes) for each file in the last _WINDOW secs
+        self.throttled_secs = 0.0  # total time we've made background work wait
+        self.total_bytes = 0
+        self.total_files = 0
+        self.total_deletes = 0
+
+    _WINDOW = 5.0
+
+    """Tell us whether any game is running
+    """
+
+    def set_game_running(self, running: bool):
+        with self._lock:
+            if running != self.game_running:
+                logging.getLogger().info(
+                    f'Background I/O { "throttled, a game is running" if running else "back to full speed" }')
+            self.game_running = running
+            self._resumed.notify_all()
+
+    """Call at the start of each job on a worker thread, only governed (background) jobs are throttled
+    """
+
+    def begin_job(self, governed: bool):
+        self._local.governed = governed
+        self._set_idle(governed and self.game_running and self.idle_ioprio)
+
+    def _set_idle(self, idle: bool):
+        if getattr(self._local, "idle", False) != idle:
+            set_thread_ioprio(idle)
+            self._local.idle = idle
+
+    def _limits(self) -> tuple:
+        if self.game_running:
+            return self.game_bytes_per_sec, self.game_files_per_sec
+        return self.bytes_per_sec, self.files_per_sec
+
+    """Account for a file of num_bytes handled by the current job, sleeping if it is going too fast.  check (if
+    given) is called while we wait, it can raise to stop waiting (i.e. when the job is cancelled).
+    """
+
+    def account(self, num_bytes: int, files: int = 1, check=None):
+        now = time.monotonic()
+        with self._lock:
+            self.total_bytes += num_bytes
+            self.total_files += files
+            self._recent.append((now, num_bytes, files))
+            while self._recent[0][0] < now - self._WINDOW:
+                self._recent.popleft()
+
+        if not getattr(self._local, "governed", False):
+            return
+        waited = 0.0
+        with self._lock:
+            while self.game_running and self.pause_during_games:
+                self._resumed.wait(1.0)
+                waited += 1.0  # (roughly)
+                if check:
+                    self._lock.release()
+                    try:
+                        check()
+                    finally:
+                        self._lock.acquire()
+            self._set_idle(self.game_running and self.idle_ioprio)
+            bytes_limit, files_limit = self._limits()
+            delay = 0.0
+            if bytes_limit or files_limit:
+                key = (bytes_limit, files_limit)
+                if key not in self._buckets:
+                    self._buckets = {key: (TokenBucket(bytes_limit) if bytes_limit else None,
+                                           TokenBucket(files_limit) if files_limit else None)}
+                byte_bucket, file_bucket = self._buckets[key]
+                if byte_bucket:
+                    delay = max(delay, byte_bucket.take(num_bytes))
+                if file_bucket:
+                    delay = max(delay, file_bucket.take(files))
+        if delay > 0:
+            time.sleep(delay)
+        with self._lock:
+            self.throttled_secs += waited + delay
+
+    """Account for deleting a snapshot in the current job, sleeping if it is deleting them too fast.  These don't count
+    towards the byte and file limits.
+    """
+
+    def account_delete(self):
+        delay = 0.0
+        with self._lock:
+            self.total_deletes += 1
+            if not getattr(self._local, "governed", False):
+                return
+            limit = self.game_deletes_per_sec if self.game_running else self.deletes_per_sec
+            if limit:
+                if not self._delete_bucket or self._delete_bucket.rate != limit:
+                    self._delete_bucket = TokenBucket(limit)
+                delay = self._delete_bucket.take(1)
+        if delay > 0:
+            time.sleep(delay)
+            with self._lock:
+                self.throttled_secs += delay
+
+    """The current limits and measured throughput, as a dict
+    """
+
+    def state(self) -> dict:
+        with self._lock:
+            now = time.monotonic()
+            recent = [r for r in self._recent if r[0] >= now - self._WINDOW]
+            bytes_limit, files_limit = self._limits()
+            return {
+                "game_running": self.game_running,
+                "paused": self.game_running and self.pause_during_games,
+                "bytes_per_sec_limit": bytes_limit,
+                "files_per_sec_limit": files_limit,
+                "idle_ioprio": self.game_running and self.idle_ioprio,
+                "bytes_per_sec": sum(r[1] for r in recent) / self._WINDOW,
+                "files_per_sec": sum(r[2] for r in recent) / self._WINDOW,
+                "throttled_secs": self.throttled_secs,
+                "total_bytes": self.total_bytes,
+                "total_files": self.total_files,
+                "total_deletes": self.total_deletes
+            }
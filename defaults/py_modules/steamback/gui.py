@@ -9,7 +9,8 @@ import timeago
 import os
 from async_tkinter_loop import async_handler
 import asyncio
-from . import Engine, util
+import logging
+from . import Engine, util, client, tkloop
 
 logger = None
 
@@ -32,6 +33,15 @@ async def main_loop(root: Tk) -> None:
     :param root: tkinter root object
     :return: nothing
     """
+    selector = getattr(asyncio.get_running_loop(), "tk_selector", None)
+    if selector:
+        # our event loop runs Tk's events as they arrive (see tkloop), we just wait for the window to close
+        await selector.wait_closed()
+        logger.debug(
+            f'Event loop woke up { selector.wakeup_rate():.2f} times/s')
+        return
+
+    # otherwise poll
     try:
         while True:
             try:
@@ -61,10 +71,17 @@ status_watching_str = "Status: Watching Steam for game exit..."
 
 
 class GUI:
-    def __init__(self, root: Tk, e: Engine):
+    """e is our own Engine (with watcher a util.SteamWatcher) or a client.Client of the daemon's (with watcher a
+    client.RemoteWatcher)
+    """
+
+    def __init__(self, root: Tk, e: "Engine | client.Client", watcher: "util.SteamWatcher | client.RemoteWatcher",
+                 app_data_dir: str):
         self.root = root
         self.engine = e
-        self.watcher = util.SteamWatcher(e)
+        self.watcher = watcher
+        self.app_data_dir = app_data_dir
+        self.showing_backups = False  # if the status bar is showing the progress of the backup queue
 
         # A dictionary mapping from saveinfo filename to saveinfo dictionary object
         self.saves = None
@@ -81,7 +98,7 @@ class GUI:
 
         def on_close():
             # Here I write the X Y position of the window to a file "myapp.conf"
-            with open(os.path.join(self.engine.config.app_data_dir, "window.conf"), "w") as conf:
+            with open(os.path.join(self.app_data_dir, "window.conf"), "w") as conf:
                 conf.write(root.geometry())
 
             root.destroy()
@@ -90,7 +107,7 @@ class GUI:
 
         # Here I read the X and Y positon of the window from when I last closed it.
         try:
-            with open(os.path.join(self.engine.config.app_data_dir, "window.conf"), "r") as conf:
+            with open(os.path.join(self.app_data_dir, "window.conf"), "r") as conf:
                 root.geometry(conf.read())
         except Exception:
             pass  # Ignore any errors (file might be missing etc)
@@ -253,9 +270,7 @@ class GUI:
         self.set_status(new_text)
 
     async def find_supported(self):
-        all_games = self.engine.find_all_game_info()
-
-        supported = await self.engine.find_supported(all_games)
+        supported = await self.engine.find_supported()
         tree = self.supported_games
         # put all children into the args of this function call
         tree.delete(*tree.get_children())
@@ -298,16 +313,27 @@ class GUI:
         if result.game_started:
             self.set_status(status_watching_str)
 
+        # backups run in the background, show how they are getting on
+        status = self.watcher.status()
+        if status["backing_up"]:
+            throttled = " (slowed down while a game runs)" if status["game_running"] else ""
+            self.set_status(f'Status: { status["summary"] }{ throttled }')
+            self.showing_backups = True
+        elif self.showing_backups and not backups:
+            self.set_status(status_watching_str)  # they finished, but there was nothing new to save
+            self.showing_backups = False
+
         if (len(backups) > 0):
             si = backups[0]  # only print for first one (the common case)
             new_text = f'Save-game snapshot taken for { si["game_info"]["game_name"] }...'
             await self.find_savegames()
             self.set_status(new_text)
+            self.showing_backups = False
 
         # Our run is exiting, but queue one for the future
         quitting = False
         if not quitting:
-            await asyncio.sleep(5)
+            await self.watcher.wait()
             asyncio.create_task(self.watch_steam())
 
     def set_status(self, new_text):
@@ -344,9 +370,28 @@ class GUI:
 """
 
 
-def run(e: Engine):
+"""Use the engine of the steamback daemon listening on socket_path if there is one, otherwise our own from
+make_engine().  session_interval is passed on to our SteamWatcher (secs between in-session snapshots, None for none).
+"""
+
+
+async def connect(make_engine, socket_path: str, session_interval: float) -> tuple:
+    c = await client.try_connect(socket_path) if socket_path else None
+    if c:
+        logger.info(f'Using the steamback daemon at { socket_path }')
+        watcher = client.RemoteWatcher(c)
+        await watcher.start()
+        return c, watcher
+    e = make_engine()
+    watcher = util.SteamWatcher(e)
+    watcher.session_interval = session_interval
+    return e, watcher
+
+
+def run(make_engine, app_data_dir: str, socket_path: str = None, session_interval: float = None,
+        poll_tk: bool = False):
     global logger
-    logger = e.config.logger
+    logger = logging.getLogger()
 
     root = Tk()
 
@@ -356,8 +401,12 @@ def run(e: Engine):
     # style.theme_use('clam')  # put the theme name here, that you want to use
     sv_ttk.set_theme("dark")
 
-    g = GUI(root, e)
+    # unless asked to poll, only wake up when Tk has something to do (tkloop falls back to polling where it can't)
+    loop = asyncio.new_event_loop() if poll_tk else tkloop.new_event_loop(root)
+    asyncio.set_event_loop(loop)
+    e, watcher = loop.run_until_complete(
+        connect(make_engine, socket_path, session_interval))
+    g = GUI(root, e, watcher, app_data_dir)
     # async_mainloop(root)
 
-    asyncio.get_event_loop_policy().get_event_loop(
-    ).run_until_complete(g.async_main_loop())
+    loop.run_until_complete(g.async_main_loop())
@@ -0,0 +1,108 @@
+#!python3
+
+from typing import NamedTuple
+import ctypes
+import ctypes.util
+import os
+import struct
+import sys
+
+"""A minimal linux inotify binding (using ctypes, so we don't need any extra packages)
+"""
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000  # the kernel's queue overflowed, some events were lost
+IN_IGNORED = 0x00008000  # the watch was removed (explicitly, or because its directory was deleted)
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+_IN_NONBLOCK = os.O_NONBLOCK
+_IN_CLOEXEC = os.O_CLOEXEC
+
+_header = struct.Struct("iIII")  # struct inotify_event without its name
+
+_libc = None
+
+
+def _get_libc():
+    global _libc
+    if _libc is None:
+        _libc = ctypes.CDLL(ctypes.util.find_library(
+            "c") or "libc.so.6", use_errno=True)
+    return _libc
+
+
+"""True if this system supports inotify
+"""
+
+
+def available() -> bool:
+    if not sys.platform.startswith("linux"):
+        return False
+    try:
+        return hasattr(_get_libc(), "inotify_init1")
+    except OSError:
+        return False
+
+
+class Event(NamedTuple):
+    wd: int  # the watch descriptor (from add_watch) of the directory this happened in
+    mask: int
+    cookie: int
+    name: str  # the name of the file within the directory (or "" for the directory itself)
+
+
+class Inotify:
+    def __init__(self):
+        libc = _get_libc()
+        self.fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self.fd < 0:
+            e = ctypes.get_errno()
+            raise OSError(e, os.strerror(e))
+
+    def fileno(self) -> int:
+        return self.fd
+
+    """Watch a file or directory for the events in mask, returns a watch descriptor
+    """
+
+    def add_watch(self, path: str, mask: int) -> int:
+        wd = _get_libc().inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            e = ctypes.get_errno()
+            raise OSError(e, os.strerror(e), path)
+        return wd
+
+    def rm_watch(self, wd: int):
+        _get_libc().inotify_rm_watch(self.fd, wd)
+
+    """Return the events which have happened since the last read (without waiting)
+    """
+
+    def read(self) -> list[Event]:
+        try:
+            buf = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        pos = 0
+        while pos < len(buf):
+            wd, mask, cookie, length = _header.unpack_from(buf, pos)
+            pos += _header.size
+            name = buf[pos:pos + length].rstrip(b"\0")
+            pos += length
+            events.append(Event(wd, mask, cookie, os.fsdecode(name)))
+        return events
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
@@ -0,0 +1,103 @@
+#!python3
+
+import os
+import logging
+
+"""Keeps track of the appmanifest files in each steam library, so rescans only parse what changed
+
+For each library we remember the mtime of its steamapps directory (which changes whenever steam adds or removes a
+manifest) and the (st_mtime_ns, st_size) of each manifest.  If the directory is unchanged we don't even need to list
+it, only stat the manifests we already know about.
+"""
+
+
+class _Library:
+    def __init__(self):
+        self.dir_mtime = None
+        self.names = []  # manifest filenames, in listdir order
+        self.manifests = {}  # filename -> ((st_mtime_ns, st_size), game_info or None if not a valid manifest)
+
+
+class LibraryIndex:
+    def __init__(self):
+        self._libraries = {}  # steam_dir -> _Library
+        self.parsed = 0  # how many manifests we've had to parse (for debugging)
+
+    """Scan the libraries and update games (a dict from game id to game_info) in place
+
+    parse_acf(path) returns the AppState dict of a manifest.  Returns the list of all game_infos found, in library order.
+    game_info dicts are reused for unchanged manifests, so anything discovered about them (i.e. save_games_roots) is kept.
+    """
+
+    def update(self, steam_dirs: list[str], games: dict, parse_acf) -> list[dict]:
+        r = []
+        for steam_dir in steam_dirs:
+            r.extend(self._scan_library(steam_dir, parse_acf))
+
+        # forget libraries which are no longer listed
+        for steam_dir in list(self._libraries):
+            if steam_dir not in steam_dirs:
+                del self._libraries[steam_dir]
+
+        found = {}
+        for info in r:
+            found[info["game_id"]] = info
+        for id in list(games):
+            if id not in found:
+                del games[id]
+        for id, info in found.items():
+            if games.get(id) is not info:
+                games[id] = info
+        return r
+
+    def _scan_library(self, steam_dir: str, parse_acf) -> list[dict]:
+        app_dir = os.path.join(steam_dir, "steamapps")
+        lib = self._libraries.get(steam_dir)
+        if not lib:
+            lib = self._libraries[steam_dir] = _Library()
+
+        try:
+            dir_mtime = os.stat(app_dir).st_mtime_ns
+            if dir_mtime != lib.dir_mtime:
+                lib.names = [f for f in os.listdir(app_dir) if f.startswith(
+                    "appmanifest_") and f.endswith(".acf")]
+                lib.dir_mtime = dir_mtime
+        except Exception as e:
+            logging.getLogger().warning(
+                f'Skipping invalid library directory { app_dir } due to { e }')
+            del self._libraries[steam_dir]
+            return []
+
+        r = []
+        manifests = {}
+        for f in lib.names:
+            path = os.path.join(app_dir, f)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue  # removed since we listed the directory
+            stamp = (st.st_mtime_ns, st.st_size)
+
+            old = lib.manifests.get(f)
+            info = old[1] if old and old[0] == stamp else self._parse(
+                steam_dir, path, parse_acf)
+            manifests[f] = (stamp, info)
+            if info:
+                r.append(info)
+
+        lib.manifests = manifests  # drops any manifests which were removed
+        return r
+
+    def _parse(self, steam_dir: str, path: str, parse_acf) -> dict:
+        self.parsed += 1
+        vcf = parse_acf(path)
+        id = vcf.get("appid", None)
+        name = vcf.get("name", None)
+        if id and name:
+            return {
+                # On a real steamdeck there may be multiple install_roots (main vs sdcard etc) (but only one per game)
+                "install_root": steam_dir,
+                "game_id": int(id),
+                "game_name": name,
+            }
+        return None
@@ -0,0 +1,145 @@
+#!python3
+
+import asyncio
+import os
+import re
+import select
+import sys
+
+"""Find running steam games on linux by reading /proc directly, and find out as soon as one exits
+
+Each game is started by steam's reaper process, with a command line like:
+home.../.steam/debian-installation/ubuntu12_32/reaper SteamLaunch AppId=1318690 ...
+
+We only read the command line of processes we haven't seen before (remembering which pids aren't games), so after
+the first scan each check is little more than a listdir of /proc.  For each game we open a pidfd, which becomes
+readable when the reaper exits, so wait() can return the moment a game stops rather than on the next poll.
+
+A process we catch between fork and exec still has its parent's command line, so a new process is checked again on
+the following scan before we decide it isn't a game.  Pids are remembered until they disappear from /proc, linux
+hands out pids in order (up to pid_max) before reusing them, so a pid being reused between two of our checks isn't
+something we worry about.
+"""
+
+_appMatch = re.compile('AppId=(.+)')
+
+
+"""Return the game id from a process command line, or None if the process is not a game
+"""
+
+
+def game_id_from_cmdline(line: list[str]) -> int:
+    if len(line) >= 3 and line[1] == "SteamLaunch":
+        match = _appMatch.fullmatch(line[2])
+        if match:
+            return int(match.group(1))
+    return None
+
+
+"""True if this system has a /proc we can use (i.e. linux)
+"""
+
+
+def available() -> bool:
+    return sys.platform.startswith("linux") and os.path.isdir("/proc/self")
+
+
+def _read_cmdline(pid: int) -> list[str]:
+    try:
+        with open(f'/proc/{ pid }/cmdline', "rb") as f:
+            return f.read().decode(errors="replace").split("\0")
+    except OSError:
+        return []  # already gone, or not ours to look at
+
+
+def _pidfd_open(pid: int) -> int:
+    try:
+        return os.pidfd_open(pid)
+    except (AttributeError, OSError):
+        return None  # python < 3.9, kernel < 5.3, or the process already exited
+
+
+def _has_exited(fd: int) -> bool:
+    return bool(select.select([fd], [], [], 0)[0])
+
+
+class ProcWatcher:
+    def __init__(self):
+        self._games = {}  # pid -> game id (or None if not a game) for every process we've looked at
+        self._pidfds = {}  # pid -> pidfd of each running game, if the kernel supports them
+        self._new = set()  # the pids we first saw on the last scan, which we check once more
+        self.cmdlines_read = 0  # how many command lines we've had to read (for benchmarking)
+
+    """Return the game ids of the running steam games (without duplicates)
+    """
+
+    def running_games(self) -> list[int]:
+        pids = set()
+        for name in os.listdir("/proc"):
+            if name.isdigit():
+                pids.add(int(name))
+
+        # forget the processes which are gone
+        for pid in list(self._games):
+            if pid not in pids:
+                self._forget(pid)
+
+        recheck = {pid for pid in self._new if pid in self._games and self._games[pid] is None}
+        self._new = pids - self._games.keys()
+        for pid in self._new | recheck:
+            self.cmdlines_read += 1
+            game_id = game_id_from_cmdline(_read_cmdline(pid))
+            self._games[pid] = game_id
+            if game_id is not None:
+                fd = _pidfd_open(pid)
+                if fd is not None:
+                    self._pidfds[pid] = fd
+
+        # an exited reaper stays in /proc (as a zombie) until steam reaps it, but it is no longer running the game
+        for pid, fd in list(self._pidfds.items()):
+            if _has_exited(fd):
+                os.close(self._pidfds.pop(pid))
+                self._games[pid] = None
+
+        return list({g for g in self._games.values() if g is not None})
+
+    def _forget(self, pid: int):
+        self._games.pop(pid, None)
+        fd = self._pidfds.pop(pid, None)
+        if fd is not None:
+            os.close(fd)
+
+    """Sleep for up to timeout secs, returning early if any of the games we found in running_games() exits
+    """
+    async def wait(self, timeout: float):
+        fds = list(self._pidfds.values())
+        if not fds:
+            await asyncio.sleep(timeout)
+            return
+        loop = asyncio.get_running_loop()
+        exited = asyncio.Event()
+        for fd in fds:
+            loop.add_reader(fd, exited.set)
+        try:
+            await asyncio.wait_for(exited.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            for fd in fds:
+                loop.remove_reader(fd)
+
+    """Call on_change(game_ids) with the set of running games now and whenever it changes, until cancelled.  Exits are
+    seen as soon as they happen, new games within interval secs.
+    """
+    async def follow(self, on_change, interval: float = 5.0):
+        running = None
+        while True:
+            now = set(self.running_games())
+            if now != running:
+                running = now
+                on_change(now)
+            await self.wait(interval)
+
+    def close(self):
+        for pid in list(self._pidfds):
+            self._forget(pid)
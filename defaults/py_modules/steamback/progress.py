@@ -0,0 +1,67 @@
+#!python3
+
+import time
+
+"""Progress reporting (and cancellation) for long running backups and restores
+
+The engine does its copying on a worker thread and updates a Progress object as it goes, the UI polls it (via
+Engine.get_progress) and can ask for the operation to stop (via Engine.cancel).
+"""
+
+
+class Cancelled(Exception):
+    pass
+
+
+class Progress:
+    def __init__(self, op: str, game_id: int, files_total: int, bytes_total: int):
+        self.op = op  # "backup" or "restore"
+        self.game_id = game_id
+        self.files_total = files_total
+        self.bytes_total = bytes_total  # an estimate, from the sizes in remotecache.vdf
+        self.files_done = 0
+        self.bytes_done = 0
+        self.started = time.time()
+        self.ended = None
+        self.cancellable = True
+        self.cancelled = False
+        self.finished = False
+
+    """Record that another file was copied, raises Cancelled if someone asked us to stop
+    """
+
+    def add(self, num_bytes: int):
+        self.files_done += 1
+        self.bytes_done += num_bytes
+        self.check()
+
+    def check(self):
+        if self.cancelled and self.cancellable:
+            raise Cancelled(f'{ self.op } of { self.game_id } cancelled')
+
+    """Ask for the operation to stop, returns False if it is too late for that
+    """
+
+    def cancel(self) -> bool:
+        if not self.cancellable or self.finished:
+            return False
+        self.cancelled = True
+        return True
+
+    def finish(self):
+        self.finished = True
+        self.ended = time.time()
+
+    def to_dict(self) -> dict:
+        return {
+            "op": self.op,
+            "game_id": self.game_id,
+            "files_done": self.files_done,
+            "files_total": self.files_total,
+            "bytes_done": self.bytes_done,
+            "bytes_total": max(self.bytes_total, self.bytes_done),  # in case the estimate was stale
+            "elapsed": (self.ended or time.time()) - self.started,
+            "cancellable": self.cancellable,
+            "cancelled": self.cancelled,
+            "finished": self.finished
+        }
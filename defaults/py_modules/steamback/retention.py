@@ -0,0 +1,54 @@
+#!python3
+
+from typing import NamedTuple
+
+"""Decide which snapshots of a game to keep
+
+Besides the newest keep_last snapshots we can keep 'grandfather-father-son' style history: the newest snapshot from
+each of the last N hours, days and weeks.  So a game played every day can have a long history without needing
+hundreds of snapshots.
+
+Snapshots taken while a game was running (tagged in_session) are only insurance against a crash before the game
+exits, so they don't count towards any of those and only the newest few are kept.
+"""
+
+HOUR = 60 * 60 * 1000  # our timestamps are in msecs
+DAY = 24 * HOUR
+WEEK = 7 * DAY
+
+
+class Policy(NamedTuple):
+    keep_last: int = 10  # always keep this many of the newest snapshots
+    hourly: int = 0  # keep the newest snapshot from each of the last n hours (that have any snapshots)
+    daily: int = 0
+    weekly: int = 0
+    in_session: int = 3  # keep this many of the newest in-session snapshots
+
+
+"""Given the saveinfos for one game (newest first), return the ones the policy says to delete (oldest first)
+"""
+
+
+def select_to_delete(saves: list[dict], policy: Policy) -> list[dict]:
+    keep = set()
+    in_session = [si for si in saves if si.get("in_session")]
+    for si in in_session[:policy.in_session]:
+        keep.add(si["filename"])
+
+    regular = [si for si in saves if not si.get("in_session")]
+    for i, si in enumerate(regular):
+        if i < policy.keep_last:
+            keep.add(si["filename"])
+
+    for count, period in [(policy.hourly, HOUR), (policy.daily, DAY), (policy.weekly, WEEK)]:
+        buckets = set()
+        for si in regular:
+            if len(buckets) >= count:
+                break
+            bucket = si["timestamp"] // period
+            if bucket not in buckets:
+                # the newest snapshot in this bucket (because saves are sorted newest first)
+                buckets.add(bucket)
+                keep.add(si["filename"])
+
+    return [si for si in reversed(saves) if si["filename"] not in keep]
@@ -0,0 +1,94 @@
+#!python3
+
+from typing import NamedTuple
+import logging
+import os
+import time
+
+"""A bounded directory scanner, used to find the steam_autocloud.vdf markers valve leaves in save directories
+
+Game installs and proton prefixes can contain hundreds of thousands of asset files, so rather than visiting everything
+(as Path.rglob does) we prune directories that never contain saves, limit the depth and give up once we've spent
+too long.  Like rglob we don't follow symlinked directories (unless asked) and silently skip unreadable directories.
+"""
+
+# Directory names (compared case insensitively) which are full of engine/asset files and never hold saves
+SKIP_DIRS = frozenset(map(str.casefold, [
+    # Unity
+    "Managed", "Mono", "MonoBleedingEdge", "StreamingAssets", "il2cpp_data",
+    # Unreal
+    "Paks", "Binaries", "Intermediate", "DerivedDataCache",
+    # misc engines and steam
+    "shadercache", "__pycache__", ".git", "__MACOSX",
+    # the parts of a proton prefix windows (not games) uses
+    "Temp", "INetCache",
+]))
+# (not "Content", "Microsoft" or "Application Data": plenty of games keep their saves under directories with those names)
+
+
+class ScanResult(NamedTuple):
+    dirs: list[str]  # the directories which contained the file, in the same order rglob would find them
+    dirs_visited: int
+    truncated: bool  # True if we ran out of time or skipped part of a tree because it was too large
+
+
+"""Find all directories under root which contain a file called filename
+
+max_depth is how many levels below root we will look, max_dirs_per_subtree bounds how many directories we visit under each
+child of root (so one huge asset tree can't starve the others) and deadline is a time.monotonic() value we must finish by.
+"""
+
+
+def find_dirs_containing(root: str, filename: str,
+                         max_depth: int = 10,
+                         skip_dirs: frozenset[str] = SKIP_DIRS,
+                         max_dirs_per_subtree: int = 20000,
+                         deadline: float = None,
+                         follow_symlinks: bool = False) -> ScanResult:
+    found = []
+    visited = 0
+    truncated = False
+    subtree_counts = {}
+
+    # a stack of (path, depth, subtree), subtree is the child of root we are inside of.  Children get pushed in
+    # reverse so we pop them in scandir order, which gives the same depth first order as rglob.
+    stack = [(root, 0, None)]
+    while stack:
+        path, depth, subtree = stack.pop()
+
+        if deadline is not None and time.monotonic() > deadline:
+            logging.getLogger().warning(
+                f'Ran out of time scanning { root } after { visited } directories')
+            truncated = True
+            break
+
+        if subtree is not None:
+            count = subtree_counts.get(subtree, 0) + 1
+            subtree_counts[subtree] = count
+            if count > max_dirs_per_subtree:
+                if count == max_dirs_per_subtree + 1:
+                    logging.getLogger().warning(
+                        f'Giving up on scanning { subtree }, it is too large')
+                truncated = True
+                continue
+
+        visited += 1
+        children = []
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=follow_symlinks):
+                            if depth < max_depth and entry.name.casefold() not in skip_dirs:
+                                children.append(entry.path)
+                        elif entry.name == filename:
+                            found.append(path)
+                    except OSError:
+                        pass
+        except OSError:
+            continue  # unreadable or vanished, rglob ignores these too
+
+        for c in reversed(children):
+            stack.append((c, depth + 1, subtree or c))
+
+    return ScanResult(found, visited, truncated)
@@ -0,0 +1,155 @@
+#!python3
+
+import asyncio
+import logging
+import time
+
+"""Runs backups in the background, so whoever asks for one (i.e. a watcher noticing a game exit) doesn't wait for it
+
+Requests go into a queue, a request for a game which is already queued is merged with the queued one.  Up to workers
+backups of different games run at once, backups of the same game always run one after the other.
+"""
+
+
+class BackupScheduler:
+    """engine is the Engine to backup with, on_done(game_info, saveinfo or None) is called after each backup
+    """
+
+    def __init__(self, engine, workers: int = 2, on_done=None):
+        self.engine = engine
+        self.workers = workers
+        self.on_done = on_done
+        self._queue = {}  # game_id -> (game_info, time it was queued, in_session), in the order they were queued
+        self._running = set()  # the game_ids being backed up
+        self._wakeup = None  # an asyncio.Event set when there may be something for a worker to do
+        self._tasks = []
+        self._finished = []  # the saveinfos of backups made since the last take_finished()
+        self._finished_event = None  # set when _finished isn't empty
+        self.submitted = 0
+        self.coalesced = 0  # requests merged with one already queued
+        self.completed = 0
+        self.failed = 0
+        self.last_wait = None  # secs the last backup spent in the queue
+        self.last_run = None  # secs the last backup took
+        self._total_wait = 0.0
+        self._total_run = 0.0
+
+    """Queue a backup of a game (unless one is already queued), in_session is passed on to Engine.do_backup
+    """
+
+    def submit(self, game_info: dict, in_session: bool = False):
+        self.submitted += 1
+        game_id = game_info["game_id"]
+        if game_id in self._queue:
+            self.coalesced += 1
+            logging.getLogger().debug(
+                f'Backup of { game_id } already queued')
+            queued_info, queued, queued_in_session = self._queue[game_id]
+            # a regular backup covers an in-session one
+            self._queue[game_id] = (
+                queued_info, queued, queued_in_session and in_session)
+        else:
+            self._queue[game_id] = (game_info, time.monotonic(), in_session)
+        self._start()
+        self._wakeup.set()
+
+    def _start(self):
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        while len(self._tasks) < self.workers:
+            self._tasks.append(asyncio.create_task(self._worker()))
+
+    """The next job no other worker is doing the same game for (or None)
+    """
+
+    def _take(self) -> tuple:
+        for game_id, job in self._queue.items():
+            if game_id not in self._running:
+                del self._queue[game_id]
+                self._running.add(game_id)
+                return job
+        return None
+
+    async def _worker(self):
+        while True:
+            job = self._take()
+            if job is None:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            game_info, queued, in_session = job
+            game_id = game_info["game_id"]
+            started = time.monotonic()
+            saveinfo = None
+            try:
+                saveinfo = await self.engine.do_backup(game_info, in_session=in_session)
+                self.completed += 1
+            except Exception as e:
+                self.failed += 1
+                logging.getLogger().error(f'Backup of { game_id } failed: { e }')
+            finally:
+                self._running.discard(game_id)
+                self._wakeup.set()  # another worker might have been waiting for this game
+
+            self.last_wait = started - queued
+            self.last_run = time.monotonic() - started
+            self._total_wait += self.last_wait
+            self._total_run += self.last_run
+            logging.getLogger().info(
+                f'Backup of { game_id } waited { self.last_wait:.2f} s, ran { self.last_run:.2f} s, '
+                f'{ len(self._queue) } still queued')
+            if saveinfo is not None:
+                self._finished.append(saveinfo)
+                if self._finished_event:
+                    self._finished_event.set()
+            if self.on_done:
+                self.on_done(game_info, saveinfo)
+
+    """Return the saveinfos of the backups made since we were last called
+    """
+
+    def take_finished(self) -> list[dict]:
+        r, self._finished = self._finished, []
+        return r
+
+    """Wait until there is a finished backup for take_finished() to return
+    """
+    async def wait_finished(self):
+        if self._finished_event is None:
+            self._finished_event = asyncio.Event()
+        if not self._finished:
+            self._finished_event.clear()
+            await self._finished_event.wait()
+
+    def is_idle(self) -> bool:
+        return not self._queue and not self._running
+
+    """Wait until everything queued has been backed up
+    """
+    async def join(self):
+        while not self.is_idle():
+            await asyncio.sleep(0.05)
+
+    def stats(self) -> dict:
+        done = self.completed + self.failed
+        return {
+            "queued": len(self._queue),
+            "running": len(self._running),
+            "submitted": self.submitted,
+            "coalesced": self.coalesced,
+            "completed": self.completed,
+            "failed": self.failed,
+            "last_wait": self.last_wait,
+            "last_run": self.last_run,
+            "avg_wait": self._total_wait / done if done else None,
+            "avg_run": self._total_run / done if done else None
+        }
+
+    """A one line summary, for status bars
+    """
+
+    def status_str(self) -> str:
+        s = f'{ len(self._running) } backing up, { len(self._queue) } queued'
+        if self.last_run is not None:
+            s += f', last took { self.last_run:.1f} s (waited { self.last_wait:.1f} s)'
+        return s
@@ -0,0 +1,255 @@
+#!python3
+
+import asyncio
+import errno
+import functools
+import inspect
+import json
+import logging
+import os
+import socket
+
+"""Share one long running Engine (with warm caches) with the GUI, the command line and the decky plugin
+
+We listen on a unix domain socket which only our user can connect to.  Each message is one line of JSON-RPC 2.0.
+Besides answering requests we send notifications (requests without an id) to the connections which subscribed to
+them:
+  progress - the engine's get_progress() dict, whenever it changes
+  backup - {game_info, saveinfo} after each backup the watcher finishes (saveinfo is None if nothing had changed)
+"""
+
+LINE_LIMIT = 64 * 1024 * 1024  # our biggest messages are lists of saveinfos (with their manifests)
+
+# JSON-RPC error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+SERVER_ERROR = -32000
+
+TOPICS = ("progress", "backup")
+
+
+"""True if this platform has unix domain sockets
+"""
+
+
+def available() -> bool:
+    return hasattr(socket, "AF_UNIX") and hasattr(asyncio, "start_unix_server")
+
+
+def default_socket_path(app_data_dir: str) -> str:
+    return os.path.join(app_data_dir, "steamback.sock")
+
+
+def _error(id, code: int, message: str) -> dict:
+    return {"jsonrpc": "2.0", "id": id, "error": {"code": code, "message": message}}
+
+
+"""True if something is accepting connections on the unix socket at path
+"""
+
+
+async def is_listening(path: str) -> bool:
+    try:
+        reader, writer = await asyncio.open_unix_connection(path)
+    except OSError:
+        return False
+    writer.close()
+    return True
+
+
+class Server:
+    """engine is the Engine to share, watcher (a util.SteamWatcher or RemoteCacheWatcher) is optional, with it clients can
+    see how backups are going and hear when they finish
+    """
+
+    def __init__(self, engine, path: str, watcher=None):
+        self.engine = engine
+        self.path = path
+        self.watcher = watcher
+        self.progress_interval = 0.25  # secs between looking for progress changes (while anyone is subscribed)
+        self._server = None
+        self._subscribers = {topic: set() for topic in TOPICS}  # topic -> the StreamWriters of subscribed connections
+        self._progress_task = None
+        self._tasks = set()  # the requests being handled
+        self._connections = {}  # StreamWriter -> the task handling its connection
+
+        if watcher:
+            chained = watcher.scheduler.on_done
+
+            def on_done(game_info: dict, saveinfo: dict):
+                if chained:
+                    chained(game_info, saveinfo)
+                self._notify("backup", {"game_info": game_info, "saveinfo": saveinfo})
+            watcher.scheduler.on_done = on_done
+
+        # the methods clients can call, see the functions of the same name in Engine (and main.Plugin)
+        self.methods = {
+            "do_backup": self.engine.do_backup,
+            "do_restore": self.engine.do_restore,
+            "do_verify": self.engine.do_verify,
+            "get_saveinfos": self.engine.get_saveinfos,
+            "find_all_game_info": self.find_all_game_info,
+            "find_supported": self.engine.find_supported,
+            "find_mounted": self.engine.find_mounted,
+            "get_progress": self.get_progress,
+            "cancel": self.cancel,
+            "get_io_state": self.get_io_state,
+            "set_game_running": self.set_game_running,
+            "get_status": self.get_status
+        }
+
+    async def find_all_game_info(self) -> list[dict]:
+        # (reads every appmanifest which changed, so keep it off the event loop)
+        return await asyncio.get_running_loop().run_in_executor(None, self.engine.find_all_game_info)
+
+    async def get_progress(self) -> dict:
+        return self.engine.get_progress()
+
+    async def cancel(self) -> bool:
+        return self.engine.cancel()
+
+    async def get_io_state(self) -> dict:
+        return self.engine.get_io_state()
+
+    async def set_game_running(self, running: bool):
+        self.engine.governor.set_game_running(running)
+
+    """What the watcher is doing (if we have one), a dict as returned by SteamWatcher.status()
+    """
+    async def get_status(self) -> dict:
+        if self.watcher:
+            return self.watcher.status()
+        return {"game_running": self.engine.governor.game_running, "backing_up": False, "summary": None, "stats": None}
+
+    """Start listening, raises OSError (EADDRINUSE) if another steamback is already listening on our path
+    """
+    async def start(self):
+        if os.path.exists(self.path):
+            if await is_listening(self.path):
+                raise OSError(errno.EADDRINUSE,
+                              "Steamback is already running", self.path)
+            os.unlink(self.path)  # left behind by a steamback which crashed
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        old_umask = os.umask(0o177)  # so only our user can connect
+        try:
+            self._server = await asyncio.start_unix_server(self._handle, self.path, limit=LINE_LIMIT)
+        finally:
+            os.umask(old_umask)
+        logging.getLogger().info(f'Listening for clients on { self.path }')
+
+    async def close(self):
+        if self._server:
+            self._server.close()
+            # hang up on our clients, so their handlers finish (rather than being cancelled)
+            for writer in self._connections:
+                writer.close()
+            await asyncio.gather(*self._connections.values(), return_exceptions=True)
+            await self._server.wait_closed()
+            self._server = None
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._connections[writer] = asyncio.current_task()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                # handle each request in its own task, so a client can ask for progress while its backup runs
+                task = asyncio.create_task(self._respond(line, writer))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+        except (ConnectionError, ValueError) as e:  # (ValueError if a line is over LINE_LIMIT)
+            logging.getLogger().warning(f'Dropping client: { e }')
+        finally:
+            for subscribers in self._subscribers.values():
+                subscribers.discard(writer)
+            del self._connections[writer]
+            writer.close()
+
+    async def _respond(self, line: bytes, writer: asyncio.StreamWriter):
+        response = await self._dispatch(line, writer)
+        if response is not None and not writer.is_closing():
+            self._send(writer, response)
+
+    """Handle one request, returns the response (None for notifications)
+    """
+    async def _dispatch(self, line: bytes, writer: asyncio.StreamWriter) -> dict:
+        try:
+            request = json.loads(line)
+        except ValueError:
+            return _error(None, PARSE_ERROR, "Parse error")
+        if not isinstance(request, dict) or not isinstance(request.get("method"), str):
+            return _error(request.get("id") if isinstance(request, dict) else None, INVALID_REQUEST, "Invalid request")
+
+        id = request.get("id")
+        method = request["method"]
+        params = request.get("params", [])
+        if method in ("subscribe", "unsubscribe"):
+            # these need to know which connection is asking
+            fn = functools.partial(
+                self._subscribe if method == "subscribe" else self._unsubscribe, writer)
+        else:
+            fn = self.methods.get(method)
+        if fn is None:
+            return _error(id, METHOD_NOT_FOUND, f'No method { method }') if id is not None else None
+        if not isinstance(params, (list, dict)):
+            return _error(id, INVALID_PARAMS, "params must be a list or an object")
+        try:
+            args, kwargs = (params, {}) if isinstance(
+                params, list) else ([], params)
+            inspect.signature(fn).bind(*args, **kwargs)
+        except TypeError as e:
+            return _error(id, INVALID_PARAMS, str(e)) if id is not None else None
+
+        try:
+            result = await fn(*args, **kwargs)
+        except Exception as e:
+            logging.getLogger().error(f'{ method } failed: { e }')
+            return _error(id, SERVER_ERROR, str(e)) if id is not None else None
+        return {"jsonrpc": "2.0", "id": id, "result": result} if id is not None else None
+
+    async def _subscribe(self, writer: asyncio.StreamWriter, topic: str) -> bool:
+        if topic not in self._subscribers:
+            raise ValueError(f'No topic { topic }')
+        self._subscribers[topic].add(writer)
+        if topic == "progress" and self._progress_task is None:
+            self._progress_task = asyncio.create_task(self._watch_progress())
+        return True
+
+    async def _unsubscribe(self, writer: asyncio.StreamWriter, topic: str) -> bool:
+        self._subscribers.get(topic, set()).discard(writer)
+        return True
+
+    def _send(self, writer: asyncio.StreamWriter, msg: dict):
+        try:
+            writer.write(json.dumps(msg).encode() + b"\n")
+        except (ConnectionError, RuntimeError):
+            pass  # the client went away, _handle will clean up
+
+    def _notify(self, topic: str, params):
+        msg = {"jsonrpc": "2.0", "method": topic, "params": params}
+        for writer in list(self._subscribers[topic]):
+            if not writer.is_closing():
+                self._send(writer, msg)
+
+    """Send progress notifications while anyone wants them (Progress is updated from worker threads, so we poll it)
+    """
+    async def _watch_progress(self):
+        last = None
+        try:
+            while self._subscribers["progress"]:
+                p = self.engine.get_progress()
+                # elapsed changes all the time, only tell clients about real changes
+                current = p and {k: v for k, v in p.items() if k != "elapsed"}
+                if current != last:
+                    last = current
+                    self._notify("progress", p)
+                await asyncio.sleep(self.progress_interval)
+        finally:
+            self._progress_task = None
@@ -0,0 +1,136 @@
+#!python3
+
+import hashlib
+import mmap
+import os
+import shutil
+import threading
+
+"""A content addressed store for the files in our snapshots
+
+Each distinct file content is stored once, as objects/<first 2 hex digits>/<rest of sha256>.  Snapshot directories
+contain hardlinks to these objects, so a file which didn't change between snapshots takes no extra space (and older
+code that just copies files out of the snapshot directory still works).  Once no snapshot links to an object its
+link count drops to 1 and Engine remove()s it (unless an incremental snapshot still lists it in its manifest).
+
+Objects are shared, so nothing may ever write to a file inside a snapshot (restores copy them out).
+"""
+
+_HASH_BLOCK = 1024 * 1024
+_MMAP_MIN = 4 * 1024 * 1024  # files at least this big are hashed through mmap
+
+"""Return the hex digest of a file, algo is any hashlib algorithm name
+
+If mapped, big files are mapped rather than read, so hashlib works straight from the page cache without copying
+every block into a python bytes object (it releases the GIL while it does, so several threads can hash at once).
+Only safe for files nobody will truncate while we hash them (like our objects), for others we'd get a SIGBUS.
+"""
+
+
+def hash_file(path: str, algo: str = "sha256", mapped: bool = False) -> str:
+    h = hashlib.new(algo)
+    with open(path, "rb") as f:
+        if mapped and os.fstat(f.fileno()).st_size >= _MMAP_MIN:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                h.update(m)
+        else:
+            while True:
+                b = f.read(_HASH_BLOCK)
+                if not b:
+                    break
+                h.update(b)
+    return h.hexdigest()
+
+
+class ObjectStore:
+    """copy2 is the function used to copy files into (or out of) the store, it must preserve metadata like shutil.copy2
+    """
+
+    def __init__(self, root: str, copy2=shutil.copy2):
+        self.root = root
+        self.copy2 = copy2
+
+    def object_path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest[2:])
+
+    """Hardlink an existing object to dest, returns False if we don't have that object
+    """
+
+    def link(self, digest: str, dest: str) -> bool:
+        try:
+            os.link(self.object_path(digest), dest)
+            return True
+        except FileNotFoundError:
+            return False
+
+    """Store a copy of src (if we don't already have its contents) and hardlink it to dest.  Returns the digest of what
+    dest now contains (src might be changing as we read it, i.e. a running game's save).
+
+    If the filesystem can't do hardlinks dest is just a regular copy.
+    """
+
+    def add(self, src: str, dest: str) -> str:
+        digest = hash_file(src)
+        try:
+            if not self.link(digest, dest):
+                obj = self.object_path(digest)
+                os.makedirs(os.path.dirname(obj), exist_ok=True)
+                tmp = f'{ obj }.{ os.getpid() }.{ threading.get_ident() }.tmp'
+                self.copy2(src, tmp)
+                # the object is named by what we copied, not by what we hashed first
+                copied = hash_file(tmp, mapped=True)
+                if copied != digest:
+                    digest = copied
+                    obj = self.object_path(digest)
+                    os.makedirs(os.path.dirname(obj), exist_ok=True)
+                os.replace(tmp, obj)  # so a crash can never leave a partial object
+                os.link(obj, dest)
+        except OSError:
+            # we might have raced with remove() or be on a filesystem without hardlinks, either way a copy will do
+            self.copy2(src, dest)
+            digest = hash_file(dest)
+        return digest
+
+    def has(self, digest: str) -> bool:
+        return os.path.exists(self.object_path(digest))
+
+    """Store data as an object (if we don't already have it), returns its digest
+    """
+
+    def add_bytes(self, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        obj = self.object_path(digest)
+        if not os.path.exists(obj):
+            os.makedirs(os.path.dirname(obj), exist_ok=True)
+            tmp = f'{ obj }.{ os.getpid() }.{ threading.get_ident() }.tmp'
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, obj)
+        return digest
+
+    """Those of digests whose objects we have but which no snapshot directory hardlinks any more (they may still be
+    referenced by an incremental or chunked snapshot's manifest, so check those before remove()ing them)
+    """
+
+    def unlinked(self, digests) -> set[str]:
+        r = set()
+        for digest in digests:
+            try:
+                if os.stat(self.object_path(digest)).st_nlink <= 1:
+                    r.add(digest)
+            except OSError:
+                pass  # already gone
+        return r
+
+    """Delete the objects for digests, returns the number removed
+    """
+
+    def remove(self, digests) -> int:
+        removed = 0
+        for digest in digests:
+            try:
+                os.remove(self.object_path(digest))
+                removed += 1
+            except OSError:
+                pass
+        return removed
@@ -0,0 +1,195 @@
+#!python3
+
+import asyncio
+import ctypes
+import ctypes.util
+import logging
+import os
+import selectors
+import stat
+import time
+import _tkinter
+from tkinter import Tk, TclError
+
+"""Run tkinter on an asyncio event loop without polling it
+
+Tk gets its input from its connection to the X server, so we add that socket to the event loop's selector and only
+run Tk when there is something to read.  Tk also has work which doesn't arrive on the socket: redraws queued by our
+own code (Tcl idle callbacks) and Tcl timers.  We run any pending Tk work each time the loop is about to block, and for
+a moment after each input we wake up regularly, so timer driven things (i.e. scrollbar auto-repeat) keep going.
+
+Where we can't find the X socket (Windows, the Mac, or a Tk we don't understand) new_event_loop() returns a normal
+event loop and gui.main_loop polls as it always did (python -m steamback --poll-tk asks for that everywhere).
+bench.bench_tk_idle compares the idle CPU use and wakeups of the two.
+"""
+
+_DRAIN = _tkinter.ALL_EVENTS | _tkinter.DONT_WAIT
+
+INTERACTIVE_SECS = 1.0  # after any Tk input, keep waking up for this long
+INTERACTIVE_TICK = 0.05  # (this often)
+
+
+"""The path of a shared library already loaded into our process whose file name starts with prefix, or None
+"""
+
+
+def _loaded_library(prefix: str) -> str:
+    try:
+        with open("/proc/self/maps") as maps:
+            for line in maps:
+                path = line.split(maxsplit=5)[-1].strip()
+                if os.path.basename(path).startswith(prefix):
+                    return path
+    except OSError:
+        pass
+    return None
+
+
+"""The name of the X display in a screen or display name, i.e. "host:0" for "host:0.1"
+"""
+
+
+def _display_name(name: str) -> str:
+    host, _, number = name.rpartition(":")
+    return f'{ host }:{ number.split(".")[0] }'
+
+
+"""Return the fd of root's connection to the X server, or None if it doesn't have one (or we can't find it)
+
+Tk has no call which returns the Display, the Tk_Display() macro in tk.h reads it from the first field of the public
+Tk_FakeWin struct (which every Tk window starts with).  We do the same, then only trust what we read if Xlib agrees
+it is the display Tk says it is on and its connection is a socket.
+"""
+
+
+def x11_fd(root: Tk) -> int:
+    try:
+        if root.tk.call("tk", "windowingsystem") != "x11":
+            return None
+        # use the libraries tkinter is actually using (there might be other versions installed)
+        libtk = ctypes.CDLL(_loaded_library("libtk") or ctypes.util.find_library(
+            f'tk{ root.tk.call("info", "tclversion") }') or "libtk.so")
+        libx11 = ctypes.CDLL(_loaded_library(
+            "libX11.so") or ctypes.util.find_library("X11") or "libX11.so.6")
+        libtk.Tk_MainWindow.restype = ctypes.c_void_p
+        libtk.Tk_MainWindow.argtypes = [ctypes.c_void_p]
+        libx11.XConnectionNumber.argtypes = [ctypes.c_void_p]
+        libx11.XDisplayString.restype = ctypes.c_char_p
+        libx11.XDisplayString.argtypes = [ctypes.c_void_p]
+
+        tkwin = libtk.Tk_MainWindow(root.tk.interpaddr())
+        if not tkwin:
+            return None
+        display = ctypes.c_void_p.from_address(
+            tkwin).value  # Tk_Display(): the first field of every Tk window
+        if not display:
+            return None
+        name = libx11.XDisplayString(display)
+        if not name or _display_name(name.decode(errors="replace")) != _display_name(root.winfo_screen()):
+            logging.getLogger().warning(
+                'Tk\'s window struct isn\'t what we expected, polling Tk instead')
+            return None
+        fd = libx11.XConnectionNumber(display)
+        return fd if fd >= 0 and stat.S_ISSOCK(os.fstat(fd).st_mode) else None
+    except (OSError, AttributeError, TclError) as e:
+        logging.getLogger().debug(f'Can\'t find the X connection: { e }')
+        return None
+
+
+class TkSelector(selectors.BaseSelector):
+    """A selector which also runs root's Tk events whenever the event loop would otherwise sleep, fd is root's X
+    connection
+    """
+
+    def __init__(self, root: Tk, fd: int):
+        self.root = root
+        self.fd = fd
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(fd, selectors.EVENT_READ)
+        self._interactive_until = 0.0
+        self._closed = None  # the future wait_closed() is waiting on
+        self.window_closed = False
+        self.wakeups = 0  # how many times we've slept and woken up again (for measuring how idle we are)
+        self.started = time.monotonic()
+
+    def register(self, fileobj, events, data=None):
+        return self._selector.register(fileobj, events, data)
+
+    def unregister(self, fileobj):
+        return self._selector.unregister(fileobj)
+
+    def modify(self, fileobj, events, data=None):
+        return self._selector.modify(fileobj, events, data)
+
+    def get_map(self):
+        return self._selector.get_map()
+
+    def close(self):
+        self._selector.close()
+
+    """Run all of Tk's pending events, returns True if there were any (or the window has just been closed)
+    """
+
+    def pump(self) -> bool:
+        if self.window_closed:
+            return False
+        handled = False
+        try:
+            while self.root.tk.dooneevent(_DRAIN):
+                handled = True
+            self.root.winfo_exists()  # will throw TclError if the main window is destroyed
+        except TclError:
+            self.window_closed = True
+            if self._closed and not self._closed.done():
+                self._closed.set_result(None)
+            return True  # don't sleep, wait_closed() can now finish
+        if handled:
+            self._interactive_until = time.monotonic() + INTERACTIVE_SECS
+        return handled
+
+    def select(self, timeout=None):
+        if self.pump():
+            timeout = 0  # Tk's callbacks might have given the event loop something to do
+        elif time.monotonic() < self._interactive_until:
+            timeout = INTERACTIVE_TICK if timeout is None else min(
+                timeout, INTERACTIVE_TICK)
+        ready = self._selector.select(timeout)
+        if timeout != 0:
+            self.wakeups += 1
+        r = []
+        for key, events in ready:
+            if key.fd == self.fd:
+                self.pump()  # (the event loop doesn't know about this fd)
+            else:
+                r.append((key, events))
+        return r
+
+    """Wait until the main window has been destroyed
+    """
+    async def wait_closed(self):
+        if not self.window_closed:
+            self._closed = asyncio.get_running_loop().create_future()
+            await self._closed
+
+    """Wakeups per second since we started
+    """
+
+    def wakeup_rate(self) -> float:
+        return self.wakeups / max(time.monotonic() - self.started, 1e-6)
+
+
+"""Make an event loop which runs root's Tk events as they arrive (with a TkSelector as its tk_selector), or a normal
+one (with tk_selector None) if we can't
+"""
+
+
+def new_event_loop(root: Tk) -> asyncio.AbstractEventLoop:
+    fd = x11_fd(root)
+    if fd is None:
+        loop = asyncio.new_event_loop()
+        loop.tk_selector = None
+        return loop
+    selector = TkSelector(root, fd)
+    loop = asyncio.SelectorEventLoop(selector)
+    loop.tk_selector = selector
+    return loop
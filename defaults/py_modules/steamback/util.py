@@ -1,9 +1,17 @@
-import psutil
-import re
 import asyncio
+import logging
+import os
+import threading
+import time
 
 from typing import NamedTuple
-from . import Engine
+from . import Engine, procwatch, inotify
+from .scheduler import BackupScheduler
+
+try:
+    import psutil  # only needed where we can't read /proc ourselves
+except ImportError:
+    psutil = None
 
 """Create a game info object: contains game_id and install_root
 """
@@ -29,23 +37,18 @@ def make_game_info(p: Engine, game_id: int) -> dict:
 
 Look for processes with names like this to find running steam games.  Remove any duplicates.
 home.../.steam/debian-installation/ubuntu12_32/reaper SteamLaunch AppId=1318690 ...
+
+This checks every process on the system each time, on linux SteamWatcher uses a procwatch.ProcWatcher instead.
 """
 
 
 def find_running_games() -> list[int]:
     # also available in environ['SteamGameId']
-    appMatch = re.compile('AppId=(.+)')
     # steam username is in environ['SteamAppUser']
 
     """Get the game id from a process, or None if process is not a game"""
-    def get_game_id(p: psutil.Process) -> int:
-        line = p.cmdline()
-        if len(line) >= 3 and line[1] == "SteamLaunch":
-            # environ = p.environ()
-            match = appMatch.fullmatch(line[2])
-            if match:
-                return int(match.group(1))
-        return None
+    def get_game_id(p: "psutil.Process") -> int:
+        return procwatch.game_id_from_cmdline(p.cmdline())
 
     r = []
     for proc in psutil.process_iter():
@@ -53,14 +56,143 @@ def find_running_games() -> list[int]:
             id = get_game_id(proc)
             if id:
                 r.append(id)
-        except psutil.AccessDenied:
-            pass  # Windows won't let us see some processes
-    return r
+        except (psutil.AccessDenied, psutil.NoSuchProcess):
+            pass  # Windows won't let us see some processes (and any process might exit while we look)
+    return list(set(r))
+
+
+"""True if any steam game is running
+"""
+
+
+def any_game_running(procs: procwatch.ProcWatcher = None) -> bool:
+    if procs:
+        return bool(procs.running_games())
+    return bool(psutil and find_running_games())
+
+
+"""Run coro in a task which is kept in tasks until it finishes, so it isn't garbage collected and any exception it
+raises is logged (as what failed) rather than lost
+"""
+
+
+def start_task(tasks: set, coro, what: str) -> asyncio.Task:
+    task = asyncio.create_task(coro)
+    tasks.add(task)
+
+    def done(t: asyncio.Task):
+        tasks.discard(t)
+        if not t.cancelled() and t.exception() is not None:
+            logging.getLogger().error(f'{ what } failed: { repr(t.exception()) }')
+    task.add_done_callback(done)
+    return task
+
+
+"""Verifies our snapshots in the background, one at a time, every interval secs
+
+Each snapshot is verified by its own task (see start()), so whoever drives us can keep watching for games while it
+runs, and stop() it as soon as one starts.
+"""
+
+
+class Scrubber:
+    def __init__(self, engine: Engine):
+        self.engine = engine
+        self.interval = 24 * 60 * 60  # secs between verifying all our snapshots, None to never scrub
+        self._queue = []  # the snapshots we still need to verify this time around
+        self._next = time.time() + 60  # give steam a chance to settle before our first scrub
+        self._task = None  # the task verifying a snapshot, if one is
+        self._stop = None  # the threading.Event which stops it
+
+    """True while a snapshot is being verified
+    """
+
+    def is_running(self) -> bool:
+        return self._task is not None
+
+    """Secs until step() has something to do, or None if never (or not until the running step finishes)
+    """
+
+    def time_until_due(self) -> float:
+        if self.interval is None or self._task:
+            return None
+        if self._queue:
+            return 0
+        return max(0, self._next - time.time())
+
+    """Don't scrub for at least secs (i.e. because a game is running)
+    """
+
+    def postpone(self, secs: float):
+        self._next = max(self._next, time.time() + secs)
+        self._queue = []
+
+    """Verify the next snapshot, if it is time for a scrub
+    """
+    async def step(self, stop: threading.Event = None):
+        if self.interval is None or (not self._queue and time.time() < self._next):
+            return
+        if not self._queue:
+            self._queue = [si["filename"] for si in await self.engine.get_saveinfos()]
+            self._next = time.time() + self.interval
+        if self._queue:
+            filename = self._queue.pop()
+            # it might have been culled since we made the queue
+            current = [si for si in await self.engine.get_saveinfos() if si["filename"] == filename]
+            if current:
+                report = await self.engine.do_verify(current[0], background=True, stop=stop)
+                if report is None and stop is not None and stop.is_set():
+                    self._queue.append(filename)  # interrupted, do it again next time
+
+    """Start verifying the next snapshot in its own task, if it is time to (and we aren't already), returns the task
+    or None.  on_finished() is called when it is done.
+    """
+
+    def start(self, on_finished=None) -> asyncio.Task:
+        if self.time_until_due() != 0:
+            return None
+        self._stop = threading.Event()
+        self._task = asyncio.create_task(self.step(self._stop))
+
+        def finished(task: asyncio.Task):
+            if self._task is task:
+                self._task = self._stop = None
+            if not task.cancelled() and task.exception():
+                logging.getLogger().error(f'Scrub failed: { task.exception() }')
+            if on_finished:
+                on_finished()
+        self._task.add_done_callback(finished)
+        return self._task
+
+    """Stop any verify in progress (it gives up after the file it is reading) and don't scrub again for at least
+    postpone_secs
+    """
+
+    def stop(self, postpone_secs: float = 0):
+        if self._task:
+            self._stop.set()
+            self._task = self._stop = None
+        if postpone_secs:
+            self.postpone(postpone_secs)
+
+
+"""What a watcher is doing: game_running, backing_up (True if any backups are queued or running), summary (a one
+line description of the backup queue) and stats (see BackupScheduler.stats)
+"""
+
+
+def watcher_status(engine: Engine, scheduler: BackupScheduler) -> dict:
+    return {
+        "game_running": engine.governor.game_running,
+        "backing_up": not scheduler.is_idle(),
+        "summary": scheduler.status_str(),
+        "stats": scheduler.stats()
+    }
 
 
 class CheckResult(NamedTuple):
     game_started: bool  # true if there is a game just started
-    backed_up: list[dict]  # the games we just backed up (probably only 0 or 1)
+    backed_up: list[dict]  # the backups which finished since the last check (probably only 0 or 1)
 
 
 """Watch steam and allow async polling for game exit
@@ -71,11 +203,21 @@ class SteamWatcher:
     def __init__(self, engine: Engine):
         self.was_running = set()
         self.engine = engine
+        # on linux we track processes ourselves (much cheaper, and we hear about game exits immediately)
+        self.procs = procwatch.ProcWatcher() if procwatch.available() else None
+        self.scrubber = Scrubber(engine)
+        self.scheduler = BackupScheduler(engine)
+        # if set, also snapshot running games every this many secs (if their saves changed), in case they crash
+        self.session_interval: float = None
+        self._session_snapshots = {}  # game_id -> time.monotonic() of its last in-session snapshot (or start)
+        self._watching = set()  # the watch_game() tasks in progress
 
-    """Look for any game exits and return the saveinfo for any backups performed
+    """Look for any game exits (queueing backups of them) and return the saveinfos of any backups finished
     """
     async def check_once(self) -> CheckResult:
-        running = set(find_running_games())
+        running = set(self.procs.running_games()
+                      if self.procs else find_running_games())
+        self.engine.governor.set_game_running(bool(running))
 
         # set of games that just started
         started = running - self.was_running
@@ -83,20 +225,244 @@ class SteamWatcher:
         # set of games that just stopped
         stopped = self.was_running - running
 
-        backups = []
+        if running:
+            self.scrubber.stop()  # so it doesn't compete with the game for the disk
+
+        for game_id in started:
+            # (in a task, so a restore or scan using the engine's io thread can't hold up noticing games stop)
+            start_task(self._watching, self.engine.watch_game(make_game_info(self.engine, game_id)),
+                       f'Tracking the saves of { game_id }')
+            self._session_snapshots[game_id] = time.monotonic()
+
+        if self.session_interval is not None:
+            now = time.monotonic()
+            for game_id in running:
+                if now - self._session_snapshots.get(game_id, now) >= self.session_interval:
+                    self._session_snapshots[game_id] = now
+                    self.scheduler.submit(make_game_info(
+                        self.engine, game_id), in_session=True)
+
         for game_id in stopped:
-            info = make_game_info(self.engine, game_id)
-            b = await self.engine.do_backup(info)
-            if b is not None:
-                backups.append(b)
+            self._session_snapshots.pop(game_id, None)
+            self.scheduler.submit(make_game_info(self.engine, game_id))
 
         # get ready for next time
         self.was_running = running
-        return CheckResult(game_started=len(started) > 0, backed_up=backups)
+        return CheckResult(game_started=len(started) > 0, backed_up=self.scheduler.take_finished())
+
+    def status(self) -> dict:
+        return watcher_status(self.engine, self.scheduler)
+
+    """Start verifying the next snapshot (if it is time for a scrub), in the background and only while no game is
+    running, check_once() stops it if one starts
+    """
+
+    def scrub_once(self):
+        if not self.was_running and self.scheduler.is_idle():
+            self.scrubber.start()
+
+    """Sleep until it is time to call check_once() again: after timeout secs, as soon as a running game exits or a
+    backup finishes
+    """
+    async def wait(self, timeout: float = 5):
+        sleep = asyncio.create_task(self.procs.wait(
+            timeout) if self.procs else asyncio.sleep(timeout))
+        finished = asyncio.create_task(self.scheduler.wait_finished())
+        try:
+            await asyncio.wait({sleep, finished}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            sleep.cancel()
+            finished.cancel()
 
     async def run_forever(self):
-        self.engine.logger.info(
+        self.engine.config.logger.info(
             "Watching Steam for game exit, press Ctrl-C to quit...")
         while True:
-            await asyncio.sleep(5)
+            await self.wait()
             await self.check_once()
+            self.scrub_once()
+
+
+"""Backup games when steam rewrites their remotecache.vdf (which it does at the end of every cloud sync), using inotify
+
+Unlike SteamWatcher nothing is polled, and we also catch games which were played without us seeing their process
+(i.e. while we weren't running, or on another machine).  Steam writes a remotecache in bursts, so we wait until a
+game's has been quiet for debounce secs before backing it up.
+"""
+
+
+class RemoteCacheWatcher:
+    def __init__(self, engine: Engine, debounce: float = 5.0):
+        self.engine = engine
+        self.debounce = debounce
+        self.inotify = inotify.Inotify()
+        self.scrubber = Scrubber(engine)
+        self.scheduler = BackupScheduler(engine)
+        self.procs = procwatch.ProcWatcher() if procwatch.available() else None
+        self._dirs = {}  # watch descriptor -> (game_id (None for an account dir), path)
+        self._pending = {}  # game_id -> the time.monotonic() we'll back it up at
+        self._wakeup = None  # the asyncio.Event run_forever() waits on
+        self.scrub_poll = 5.0  # secs between checking for a game starting, while we scrub (without procs)
+        self._running = None  # the running game ids, while run_forever() is following procs
+        self._watching = set()  # the watch_game() tasks in progress
+        self.watch_all()
+
+    """Watch the userdata dir of every account, and every game dir in them
+    """
+
+    def watch_all(self):
+        for account_id in self.engine.account_ids:
+            account_dir = os.path.join(
+                self.engine.get_steam_root(), "userdata", str(account_id))
+            self._watch(account_dir, None, inotify.IN_CREATE |
+                        inotify.IN_MOVED_TO | inotify.IN_ONLYDIR)
+            try:
+                names = os.listdir(account_dir)
+            except OSError:
+                continue
+            for name in names:
+                if name.isdigit():
+                    self._watch_game(account_dir, int(name))
+
+    def _watch_game(self, account_dir: str, game_id: int):
+        self._watch(os.path.join(account_dir, str(game_id)), game_id,
+                    inotify.IN_CLOSE_WRITE | inotify.IN_MOVED_TO | inotify.IN_ONLYDIR)
+
+    def _watch(self, path: str, game_id: int, mask: int):
+        try:
+            self._dirs[self.inotify.add_watch(path, mask)] = (game_id, path)
+        except OSError as e:
+            self.engine.config.logger.warning(f'Unable to watch { path }: { e }')
+
+    """Note the games whose remotecache changed
+    """
+
+    def handle_events(self, events: list[inotify.Event]):
+        now = time.monotonic()
+        for ev in events:
+            if ev.mask & inotify.IN_Q_OVERFLOW:
+                # we missed some events, so check all the games (unchanged ones are quickly skipped by do_backup)
+                for game_id, path in self._dirs.values():
+                    if game_id is not None:
+                        self._pending[game_id] = now + self.debounce
+                continue
+            if ev.mask & inotify.IN_IGNORED:
+                self._dirs.pop(ev.wd, None)  # the directory was deleted
+                continue
+            game_id, path = self._dirs.get(ev.wd, (None, None))
+            if path is None:
+                continue
+            if game_id is None:
+                # a new game dir in an account (its remotecache might already be there)
+                if ev.mask & inotify.IN_ISDIR and ev.name.isdigit():
+                    game_id = int(ev.name)
+                    self._watch_game(path, game_id)
+                    if os.path.exists(os.path.join(path, ev.name, "remotecache.vdf")):
+                        self._pending[game_id] = now + self.debounce
+            elif ev.name == "remotecache.vdf":
+                self._pending[game_id] = now + self.debounce
+
+    """Queue backups of the games whose remotecache has been quiet for long enough
+    """
+
+    def backup_due(self):
+        now = time.monotonic()
+        due = [g for g, t in self._pending.items() if t <= now]
+        if due and self._running is None:
+            self.engine.governor.set_game_running(self._game_running())
+        for game_id in due:
+            del self._pending[game_id]
+            if self.engine.all_games is not None and game_id not in self.engine.all_games:
+                continue  # not an installed game (i.e. steam's own settings)
+            self.scheduler.submit(make_game_info(self.engine, game_id))
+
+    """Handle any new events, returns the saveinfos of any backups finished since the last check
+    """
+    async def check_once(self) -> list[dict]:
+        self.handle_events(self.inotify.read())
+        self.backup_due()
+        if self.scrubber.is_running() or (self.scrubber.time_until_due() == 0 and self.scheduler.is_idle()):
+            if self._game_running():
+                self.scrubber.stop(5 * 60)
+            else:
+                self.scrubber.start(on_finished=self._wake)
+        return self.scheduler.take_finished()
+
+    def _wake(self):
+        if self._wakeup:
+            self._wakeup.set()
+
+    def _game_running(self) -> bool:
+        if self._running is not None:
+            return bool(self._running)
+        return any_game_running(self.procs)
+
+    """Called by procs.follow() as games start and exit
+    """
+
+    def _games_changed(self, running: set[int]):
+        started = running - (self._running or set())
+        self._running = running
+        self.engine.governor.set_game_running(bool(running))
+        if running and self.scrubber.is_running():
+            self.scrubber.stop(5 * 60)
+        # track which save files each game writes, so its backup after the next sync is quicker
+        for game_id in started:
+            start_task(self._watching, self.engine.watch_game(make_game_info(self.engine, game_id)),
+                       f'Tracking the saves of { game_id }')
+
+    def status(self) -> dict:
+        return watcher_status(self.engine, self.scheduler)
+
+    """Secs until check_once() has something to do (even if no events arrive), or None if never
+    """
+
+    def _timeout(self) -> float:
+        timeouts = [max(0, t - time.monotonic())
+                    for t in self._pending.values()]
+        scrub = self.scrubber.time_until_due()
+        if scrub is not None:
+            timeouts.append(scrub)
+        if self.scrubber.is_running() and self._running is None:
+            timeouts.append(self.scrub_poll)  # so we notice a game starting
+        return min(timeouts) if timeouts else None
+
+    async def run_forever(self):
+        self.engine.config.logger.info(
+            "Watching Steam's cloud syncs for changed saves, press Ctrl-C to quit...")
+        loop = asyncio.get_running_loop()
+        ready = self._wakeup = asyncio.Event()
+        loop.add_reader(self.inotify.fileno(), ready.set)
+        # keep the governor's game_running current (and stop scrubbing when a game starts) between cloud syncs
+        games = asyncio.create_task(self.procs.follow(
+            self._games_changed)) if self.procs else None
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(ready.wait(), self._timeout())
+                except asyncio.TimeoutError:
+                    pass
+                ready.clear()
+                await self.check_once()
+        finally:
+            loop.remove_reader(self.inotify.fileno())
+            if games:
+                games.cancel()
+                self._running = None
+
+
+"""The watcher for a daemon: a RemoteCacheWatcher if we can use inotify, otherwise (or if in-session snapshots every
+session_interval secs are wanted, they need to know which games are running) a SteamWatcher
+"""
+
+
+def make_watcher(engine: Engine, session_interval: float = None) -> "SteamWatcher | RemoteCacheWatcher":
+    if inotify.available() and session_interval is None:
+        try:
+            return RemoteCacheWatcher(engine)
+        except OSError as e:
+            # i.e. we've used up fs.inotify.max_user_instances
+            engine.config.logger.warning(f'Unable to use inotify ({ e }), polling for game exits instead')
+    w = SteamWatcher(engine)
+    w.session_interval = session_interval
+    return w
@@ -0,0 +1,413 @@
+#!python3
+
+from typing import NamedTuple, Iterator, TextIO
+import io
+import os
+import re
+
+"""A small streaming parser for the valve 'KeyValues' text format (used by .vdf and .acf files)
+
+Files are tokenized incrementally in fixed size blocks, so even huge files are never read into a single string.
+The hierarchy of the file is preserved (blocks become nested dicts).  Remotecache files (which we read the most) have
+a faster path of their own for the layout steam always writes.
+"""
+
+# How many chars we read from the file for each tokenizer refill
+_BLOCK_SIZE = 64 * 1024
+
+# remotecache.vdf files up to this size are read whole (see _scan_remotecache), bigger ones are streamed
+_FAST_LIMIT = 64 * 1024 * 1024
+
+# Token kinds returned by _iter_tokens, tokens are (kind, a, b) tuples
+STRING = 0  # a is the string
+LEAF = 1  # a complete block which only contains "key" "value" pairs: a is the key of the block, b its dict
+OPEN = 2
+CLOSE = 3
+
+_open = (OPEN, "{", None)
+_close = (CLOSE, "}", None)
+
+# Every match is one token.  Comments and [$PLATFORM] conditionals match with all groups empty.  Then we try for a
+# whole leaf block without any escapes (by far the most common thing in Valve's files, this lets the regex engine do
+# nearly all the work).  Otherwise we capture a quoted string (with backslash escapes), a brace, a bare word or a
+# lone " that starts an unterminated string.  The leaf key group keeps its opening quote, so it is never empty.
+_tokenMatch = re.compile(r'''\s*(?:
+    //[^\n]*
+    |\[[^\]\s]*\]
+    |("[^"\\]*)"\s*\{((?:\s*"[^"\\]*")*)\s*\}
+    |("[^"\\]*(?:\\.[^"\\]*)*"|[{}]|[^\s{}"\[]+|\S)
+)''', re.S | re.X)
+_badToken = ("", "", '"')
+_escapeMatch = re.compile(r'\\(.)', re.S)
+_quotedSplit = re.compile(r'"((?:[^"\\]|\\.)*)"', re.S)
+_escapes = {"n": "\n", "t": "\t", "\\": "\\", '"': '"'}
+
+
+class VdfError(ValueError):
+    pass
+
+
+class RcfEntry(NamedTuple):
+    path: str  # filename relative to the save root, always using / as a separator
+    size: int
+    sha: str
+    time: int  # secs since 1970
+    syncstate: int
+    root: int  # which of valve's save roots this file lives in
+
+
+_RCF_FIELDS = ("size", "sha", "time", "syncstate", "root")  # the fields of an RcfEntry after path
+
+
+class RemoteCache:
+    """A remotecache.vdf: change_number (None if the file didn't contain one), paths (the files steam syncs, in the
+    order of the file) and entries (the RcfEntry of each of those files).
+
+    Usually we only need the paths, so when read_remotecache() can it just keeps the text of the file and the records
+    are parsed the first time entries is used (which raises VdfError if they turn out to be malformed).
+    """
+
+    def __init__(self, change_number: int, paths: list[str], entries: list[RcfEntry] = None, text: str = None):
+        self.change_number = change_number
+        self.paths = paths
+        self._entries = entries
+        self._text = text
+
+    @property
+    def entries(self) -> list[RcfEntry]:
+        if self._entries is None:
+            entries = _parse_records(self._text)
+            if entries is None:
+                entries = _read_remotecache_tokens(
+                    io.StringIO(self._text), "remotecache.vdf").entries
+            self._entries = entries
+            self._text = None
+        return self._entries
+
+
+def _unescape(s: str) -> str:
+    if "\\" not in s:
+        return s
+    return _escapeMatch.sub(lambda m: _escapes.get(m.group(1), m.group(0)), s)
+
+
+"""Convert the contents of a leaf block (i.e. "k1" "v1" "k2" "v2") to a dict
+"""
+
+
+def _leaf_to_dict(body: str) -> dict:
+    strings = body.split('"')[1::2]
+    if len(strings) % 2:
+        raise VdfError(f'Missing value for key { strings[-1] }')
+    pairs = iter(strings)
+    return dict(zip(pairs, pairs))
+
+
+"""Tokenize a block of text, returns None if it ends inside a quoted string
+"""
+
+
+def _tokens(text: str) -> list[tuple]:
+    toks = _tokenMatch.findall(text)
+    if _badToken in toks:
+        return None
+
+    r = []
+    for leaf, body, tok in toks:
+        if leaf:
+            r.append((LEAF, leaf[1:], _leaf_to_dict(body)))
+        elif not tok:
+            pass  # a comment
+        elif tok[0] == '"':
+            r.append((STRING, _unescape(tok[1:-1]), None))
+        elif tok == "{":
+            r.append(_open)
+        elif tok == "}":
+            r.append(_close)
+        else:
+            r.append((STRING, tok, None))  # a bare word
+    return r
+
+
+"""Yield the tokens of a file, reading it incrementally
+
+We tokenize up to the last complete line in our buffer, a leaf block that gets cut there just
+comes out as individual tokens.
+"""
+
+
+def _iter_tokens(f: TextIO) -> Iterator[tuple]:
+    buf = ""
+    eof = False
+    while not eof:
+        chunk = f.read(_BLOCK_SIZE)
+        eof = not chunk
+        buf += chunk
+        cut = len(buf) if eof else buf.rfind("\n") + 1
+        if cut == 0:
+            continue  # not even one full line yet
+
+        toks = _tokens(buf[:cut])
+        if toks is None:
+            # a quoted string continues past the end of our block, so try again with more data
+            if eof:
+                raise VdfError('Unterminated string')
+            continue
+
+        buf = buf[cut:]
+        yield from toks
+
+
+"""Parse tokens up to the closing brace of the current block (or the end of file if is_root)
+
+If on_block is provided, nested blocks are passed to it rather than being stored in the result.
+"""
+
+
+def _parse_block(tokens: Iterator[tuple], is_root: bool = False, on_block=None) -> dict:
+    d = {}
+    key = None  # a key which is still waiting for its value
+    for kind, a, b in tokens:
+        if kind == STRING:
+            if key is None:
+                key = a
+            else:
+                d[key] = a
+                key = None
+            continue
+
+        if kind == LEAF:
+            if key is not None:
+                # the leaf's key was really the value for our key, which leaves the block without a key
+                raise VdfError('Expected a key but found {')
+            key = a
+            child = b
+        elif kind == OPEN:
+            if key is None:
+                raise VdfError('Expected a key but found {')
+            child = _parse_block(tokens)
+        else:
+            if key is not None:
+                raise VdfError(f'Missing value for key { key }')
+            if is_root:
+                raise VdfError('Unexpected }')
+            return d
+
+        if on_block:
+            on_block(key, child)
+        else:
+            d[key] = child
+        key = None
+
+    if key is not None:
+        raise VdfError(f'Missing value for key { key }')
+    if not is_root:
+        raise VdfError('Missing }')
+    return d
+
+
+"""Parse a vdf stream into nested dicts of strings
+"""
+
+
+def load(f: TextIO) -> dict:
+    return _parse_block(_iter_tokens(f), is_root=True)
+
+
+"""Parse a vdf file into nested dicts of strings
+"""
+
+
+def load_file(path: str) -> dict:
+    with open(path, encoding="utf-8", errors="replace") as f:
+        return load(f)
+
+
+"""Return the (only) top level block of a vdf file, i.e. the contents of "AppState" { ... }
+Valve is not consistent about the capitalization of these names, so we don't check the key.
+"""
+
+
+def root_block(d: dict) -> dict:
+    for v in d.values():
+        if isinstance(v, dict):
+            return v
+    return {}
+
+
+def _int(d: dict, key: str) -> int:
+    try:
+        return int(d.get(key, 0))
+    except ValueError:
+        return 0
+
+
+def _to_entry(path: str, d: dict) -> RcfEntry:
+    try:
+        return RcfEntry(path, int(d.get("size", 0)), d.get("sha", ""), int(d.get("time", 0)),
+                        int(d.get("syncstate", 0)), int(d.get("root", 0)))
+    except ValueError:
+        # some field was not a number, so convert them one by one
+        return RcfEntry(path, _int(d, "size"), d.get("sha", ""), _int(d, "time"),
+                        _int(d, "syncstate"), _int(d, "root"))
+
+
+"""Read a remotecache.vdf file, streaming the per-file records
+
+    "gameid"
+    {
+        "ChangeNumber"		"-6703994677807818784"
+        "ostype"		"-184"
+        "my games/XCOM2/XComGame/SaveData/profile.bin"
+        {
+            "root"		"2"
+            "size"		"15741"
+            ...
+        }
+    }
+"""
+
+
+def read_remotecache(path: str) -> RemoteCache:
+    with open(path, encoding="utf-8", errors="replace") as f:
+        if os.fstat(f.fileno()).st_size <= _FAST_LIMIT:
+            text = f.read()
+            r = _scan_remotecache(text)
+            if r is not None:
+                return r
+            f = io.StringIO(text)
+        return _read_remotecache_tokens(f, path)
+
+
+"""The quoted strings of a piece of a vdf file, or None unless it is nothing but quoted strings (and whitespace)
+"""
+
+
+def _quoted_strings(text: str) -> list[str]:
+    if "\\" in text:
+        parts = _quotedSplit.split(text)  # (slower, but escapes are rare)
+        strings = [_unescape(s) for s in parts[1::2]]
+    else:
+        parts = text.split('"')
+        strings = parts[1::2]
+    if len(parts) % 2 == 0 or "".join(parts[0::2]).strip():
+        return None
+    return strings
+
+
+"""Split the text of a remotecache into its records, returns (top, records) or None if it isn't laid out the way steam
+writes them.  top is the top level's own "key" "value" strings and records is a list of (key, piece, brace), the
+record's body is piece[brace + 1:].
+
+Every file record is a leaf block, so splitting the text at each } gives us one record per piece: the strings before
+its { (perhaps some of the top level's pairs, then the record's key) and its body.  Anything unusual (comments,
+conditionals, braces in strings, bare words) makes us return None, so the caller can use the tokenizer instead.
+"""
+
+
+def _split_records(text: str) -> list[tuple]:
+    pieces = text.split("}")
+    if len(pieces) < 2 or "//" in text or "[$" in text:
+        return None
+    # the first piece also has the top level block's key and opening brace
+    name, brace, pieces[0] = pieces[0].partition("{")
+    if not brace or len(_quoted_strings(name) or []) != 1 or pieces[-1].strip():
+        return None
+
+    top = []
+    records = []
+    last = len(pieces) - 2  # the piece which ends with the top level's closing brace
+    for piece in pieces[:last]:
+        # (this is _quoted_strings inlined, with a shortcut for the usual case, because it is our inner loop)
+        brace = piece.rfind("{")
+        head = piece[:brace]
+        if "\\" in head:
+            strings = _quoted_strings(head)
+        else:
+            parts = head.split('"')
+            if len(parts) == 3 and parts[0].isspace() and parts[2].isspace():
+                strings = [parts[1]]
+            elif len(parts) % 2 and not "".join(parts[0::2]).strip():
+                strings = parts[1::2]
+            else:
+                strings = None
+        if brace < 0 or strings is None or not len(strings) % 2:
+            return None
+        if len(strings) > 1:
+            top.extend(strings[:-1])
+        records.append((strings[-1], piece, brace))
+    strings = _quoted_strings(pieces[last])  # the end of the top level
+    if strings is None:
+        return None
+    top.extend(strings)
+    return top, records
+
+
+"""Read a remotecache from a string without parsing its records yet, or None if it isn't laid out the way steam
+writes them
+
+This (and parsing the records later, see _parse_records) works on the text with str methods rather than going
+through the tokenizer, which is several times faster.  Steam can have thousands of files in a remotecache, and we
+read every game's when looking for supported games.
+"""
+
+
+def _scan_remotecache(text: str) -> RemoteCache:
+    split = _split_records(text)
+    if split is None or len(split[0]) % 2:
+        return None
+    top, records = split
+    pairs = iter(top)
+    return RemoteCache(_change_number(dict(zip(pairs, pairs))), [r[0] for r in records], text=text)
+
+
+"""Parse the records of a remotecache (that _scan_remotecache accepted), or return None if any isn't as we expect
+"""
+
+
+def _parse_records(text: str) -> list[RcfEntry]:
+    entries = []
+    keys = None  # the keys of the last record, steam writes them in the same order every time
+    for key, piece, brace in _split_records(text)[1]:
+        parts = piece[brace + 1:].split('"')
+        if "\\" in piece or len(parts) % 4 != 1 or "".join(parts[0::2]).strip():
+            fields = _quoted_strings(piece[brace + 1:])
+            if fields is None or len(fields) % 2:
+                return None
+            pairs = iter(fields)
+            entries.append(_to_entry(key, dict(zip(pairs, pairs))))
+            continue
+        if parts[1::4] != keys:
+            keys = parts[1::4]
+            at = [keys.index(k) if k in keys else None for k in _RCF_FIELDS]
+        values = parts[3::4]
+        try:
+            entries.append(RcfEntry(key, int(values[at[0]]), values[at[1]], int(
+                values[at[2]]), int(values[at[3]]), int(values[at[4]])))
+        except (TypeError, ValueError):
+            # a missing field (index None) or one which isn't a number
+            entries.append(_to_entry(key, dict(zip(keys, values))))
+    return entries
+
+
+def _change_number(top: dict) -> int:
+    try:
+        return int(top["ChangeNumber"])
+    except (KeyError, ValueError):
+        return None
+
+
+def _read_remotecache_tokens(f: TextIO, path: str) -> RemoteCache:
+    entries = []
+    tokens = _iter_tokens(f)
+    first = next(tokens, None)
+    if first is None:
+        return RemoteCache(None, [], entries)  # empty file
+    if first[0] == LEAF:
+        top = first[2]  # no files, only fields like ChangeNumber
+    elif first[0] == STRING and next(tokens, _close) == _open:
+        top = _parse_block(tokens, on_block=lambda k,
+                           d: entries.append(_to_entry(k, d)))
+    else:
+        raise VdfError(f'{ path } is not a remotecache file')
+    return RemoteCache(_change_number(top), [e.path for e in entries], entries)
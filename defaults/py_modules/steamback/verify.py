@@ -0,0 +1,128 @@
+#!python3
+
+from typing import NamedTuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import hashlib
+import os
+import threading
+import time
+from . import archive, store
+
+"""Check that the files of a snapshot still have the contents we saved
+
+Each file is hashed (on a pool of threads, hashlib releases the GIL for big buffers) and compared with the hash we
+recorded when it was saved.  A Throttle can limit how fast we read, so a background scrub doesn't get in the way of
+the game (or the backups).
+"""
+
+
+class Throttle:
+    """Limit reads to about bytes_per_sec, shared between all the threads of a check
+    """
+
+    def __init__(self, bytes_per_sec: int):
+        self.bytes_per_sec = bytes_per_sec
+        self._lock = threading.Lock()
+        self._next = time.monotonic()  # when the reads we've allowed so far should have finished
+
+    """Wait until we are allowed to read num_bytes more
+    """
+
+    def consume(self, num_bytes: int):
+        with self._lock:
+            now = time.monotonic()
+            start = max(self._next, now)
+            self._next = start + num_bytes / self.bytes_per_sec
+            wait = start - now
+        if wait > 0:
+            time.sleep(wait)
+
+
+class Check(NamedTuple):
+    name: str  # what we call the file in the report
+    source: object  # the path of the saved copy, an archive.Member or a list of chunk paths
+    size: int
+    algo: str  # a hashlib algorithm name
+    expected: str  # the hex digest the file should have, or None if we can only check it exists
+
+
+def _hash_blocks(blocks, algo: str, throttle: Throttle) -> str:
+    h = hashlib.new(algo)
+    for b in blocks:
+        if throttle:
+            throttle.consume(len(b))
+        h.update(b)
+    return h.hexdigest()
+
+
+def _read_chunks(paths: list[str]):
+    for p in paths:
+        with open(p, "rb") as f:
+            yield f.read()
+
+
+"""Return the digest of the saved copy, raises OSError if it (or any part of it) is missing
+"""
+
+
+def _hash_source(c: Check, readers: dict, throttle: Throttle) -> str:
+    if isinstance(c.source, archive.Member):
+        reader = readers.get(c.source.archive)
+        if reader is None:
+            reader = readers[c.source.archive] = archive.ArchiveReader(
+                c.source.archive)
+        if c.source.name not in reader.files:
+            raise FileNotFoundError(c.name)
+        return _hash_blocks(reader.iter_blocks(c.source.name), c.algo, throttle)
+    if isinstance(c.source, list):
+        return _hash_blocks(_read_chunks(c.source), c.algo, throttle)
+    if throttle:
+        throttle.consume(os.path.getsize(c.source))
+    return store.hash_file(c.source, c.algo, mapped=True)
+
+
+def _check_one(c: Check, readers: dict, throttle: Throttle) -> str:
+    try:
+        if c.expected is None:
+            if isinstance(c.source, str) and not os.path.exists(c.source):
+                return "missing"
+            return "unverified"
+        return "ok" if _hash_source(c, readers, throttle) == c.expected else "corrupt"
+    except OSError:
+        return "missing"
+    except archive.ArchiveError:
+        return "corrupt"  # an archive we can't decompress (or index)
+
+
+"""Check a list of files with threads workers, returns a report dict
+
+on_done(check, result) is called (on the calling thread) as each file finishes, if it raises the check stops.
+"""
+
+
+def run(checks: list[Check], threads: int = 4, throttle: Throttle = None, on_done=None) -> dict:
+    report = {"files_ok": 0, "bytes_ok": 0,
+              "corrupt": [], "missing": [], "unverified": 0}
+    readers = {}  # archive path -> ArchiveReader, they are safe to share between threads
+    pool = ThreadPoolExecutor(max_workers=threads,
+                              thread_name_prefix="steamback_verify")
+    try:
+        futures = {pool.submit(_check_one, c, readers, throttle): c
+                   for c in checks}
+        for f in as_completed(futures):
+            c = futures[f]
+            result = f.result()
+            if result == "ok":
+                report["files_ok"] += 1
+                report["bytes_ok"] += c.size
+            elif result == "unverified":
+                report["unverified"] += 1
+            else:
+                report[result].append(c.name)
+            if on_done:
+                on_done(c, result)
+    finally:
+        pool.shutdown(cancel_futures=True)
+    report["corrupt"].sort()
+    report["missing"].sort()
+    return report
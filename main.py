@@ -5,7 +5,9 @@ import os
 import shutil
 import logging
 import re
+import asyncio
 import steamback
+from steamback import server, procwatch, util
 from pathlib import Path
 
 # The decky plugin module is located at decky-loader/plugin
@@ -17,6 +19,10 @@ logger = decky_plugin.logger
 
 
 pinstance = None
+pserver = None
+pgames = None  # the task following which games are running (see games_changed)
+prunning = set()  # the game ids running as of pgames' last check
+pwatching = set()  # the watch_game() tasks in progress
 
 
 def get_engine() -> object:
@@ -33,6 +39,34 @@ def get_engine() -> object:
     return pinstance
 
 
+"""Called by our ProcWatcher as games start and exit
+"""
+
+
+def games_changed(running: set[int]):
+    global prunning
+    e = get_engine()
+    e.governor.set_game_running(bool(running))
+    started = running - prunning
+    if started:
+        util.start_task(pwatching, watch_games(e, started),
+                        f'Tracking the saves of { started }')
+    prunning = running
+
+
+"""Track which save files each of game_ids writes, so the backup when it exits only needs to look at those
+"""
+
+
+async def watch_games(e, game_ids: set[int]):
+    if e.all_games is None:
+        await asyncio.get_running_loop().run_in_executor(None, e.find_all_game_info)
+    for game_id in game_ids:
+        info = e.all_games.get(game_id)
+        if info:
+            await e.watch_game(info)
+
+
 class Plugin:
 
     async def set_account_id(self, id_num: int):
@@ -56,6 +90,13 @@ class Plugin:
     async def do_restore(self, save_info: dict):
         return await get_engine().do_restore(save_info)
 
+    """
+    Check that a snapshot's files are still intact, returns a dict with files_ok, bytes_ok, corrupt, missing and
+    unverified
+    """
+    async def do_verify(self, save_info: dict) -> dict:
+        return await get_engine().do_verify(save_info)
+
     """
     Given a list of game_infos, return a list of game_infos which are supported for backups
     """
@@ -76,13 +117,63 @@ class Plugin:
     async def get_saveinfos(self) -> list[dict]:
         return await get_engine().get_saveinfos()
 
+    """
+    Return the progress of the current (or last) backup or restore, or None
+
+    A dict with op, game_id, files_done, files_total, bytes_done, bytes_total, elapsed, cancellable, cancelled
+    and finished
+    """
+    async def get_progress(self) -> dict:
+        return get_engine().get_progress()
+
+    """
+    Cancel the current backup or restore, returns True if it will be cancelled
+    """
+    async def cancel(self) -> bool:
+        return get_engine().cancel()
+
+    """
+    Return how our background disk work is being throttled, a dict with game_running, paused, bytes_per_sec_limit,
+    files_per_sec_limit, idle_ioprio, bytes_per_sec and files_per_sec (measured over the last few secs),
+    throttled_secs, total_bytes, total_files and total_deletes
+    """
+    async def get_io_state(self) -> dict:
+        return get_engine().get_io_state()
+
+    """
+    Tell steamback whether a game is running, so it can keep its disk use out of the game's way
+    """
+    async def set_game_running(self, running: bool):
+        get_engine().governor.set_game_running(running)
+
     # Asyncio-compatible long-running code, executed in a task when the plugin is loaded
     async def _main(self):
         logger.info("Steamback running!")
 
+        # the frontend doesn't tell us when games run, so watch for them ourselves
+        global pgames
+        if procwatch.available():
+            pgames = asyncio.create_task(
+                procwatch.ProcWatcher().follow(games_changed))
+
+        # let the desktop GUI and command line use our engine too (i.e. steamback --socket .../steamback.sock)
+        global pserver
+        if server.available():
+            pserver = server.Server(get_engine(), server.default_socket_path(
+                os.environ["DECKY_PLUGIN_RUNTIME_DIR"]))
+            try:
+                await pserver.start()
+            except OSError as e:
+                logger.warning(f'Not sharing our engine: { e }')
+                pserver = None
+
     # Function called first during the unload process, utilize this to handle your plugin being removed
     async def _unload(self):
         logger.info("Steamback exiting!")
+        if pgames:
+            pgames.cancel()
+        if pserver:
+            await pserver.close()
 
 
 """
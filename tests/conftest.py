@@ -0,0 +1,90 @@
+import asyncio
+import hashlib
+import logging
+import os
+import sys
+
+import pytest
+
+# the steamback package lives in py_modules (so decky can find it)
+sys.path.insert(0, os.path.join(os.path.dirname(
+    os.path.abspath(__file__)), "..", "py_modules"))
+
+ACCOUNT_ID = 1234
+
+# game_id -> the save files (relative to the game's saves directory) our fake steam install starts with
+GAMES = {
+    100: {"a.sav": b"hello", os.path.join("sub", "b.sav"): b"world" * 100},
+    200: {"slot1.sav": b"x" * 5000, "slot2.sav": b"y"},
+}
+
+
+"""Make a minimal Steam install in root with a linux game for each of games (game_id -> files), each with a
+steam_autocloud.vdf and a remotecache.vdf, returns the steam dir
+"""
+
+
+def make_steam(root, games: dict) -> str:
+    steam = root / "steam"
+    apps = steam / "steamapps"
+    apps.mkdir(parents=True)
+    ids = "".join(f'\t\t\t"{ game_id }"\t\t"1"\n' for game_id in games)
+    (apps / "libraryfolders.vdf").write_text(
+        f'"libraryfolders"\n{{\n\t"0"\n\t{{\n\t\t"path"\t\t"{ steam }"\n\t\t"apps"\n\t\t{{\n{ ids }\t\t}}\n\t}}\n}}\n')
+    for game_id, files in games.items():
+        (apps / f'appmanifest_{ game_id }.acf').write_text(
+            f'"AppState"\n{{\n\t"appid"\t\t"{ game_id }"\n\t"name"\t\t"Game{ game_id }"\n'
+            f'\t"installdir"\t\t"game{ game_id }"\n}}\n')
+        saves = apps / "common" / f'game{ game_id }' / "saves"
+        saves.mkdir(parents=True)
+        (saves / "steam_autocloud.vdf").write_text('"x" { }')
+        write_saves(steam, game_id, files)
+    return str(steam)
+
+
+"""Our fake game's saves directory
+"""
+
+
+def saves_dir(steam, game_id: int):
+    return os.path.join(steam, "steamapps", "common", f'game{ game_id }', "saves")
+
+
+"""(Over)write some of a fake game's save files, and its remotecache.vdf as steam would after a cloud sync
+"""
+
+
+def write_saves(steam, game_id: int, files: dict, change_number: int = 1):
+    saves = saves_dir(steam, game_id)
+    for name, data in files.items():
+        path = os.path.join(saves, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+    ud = os.path.join(steam, "userdata", str(ACCOUNT_ID), str(game_id))
+    os.makedirs(ud, exist_ok=True)
+    with open(os.path.join(ud, "remotecache.vdf"), "w") as f:
+        f.write(f'"{ game_id }"\n{{\n\t"ChangeNumber"\t\t"{ change_number }"\n')
+        for root, dirs, names in os.walk(saves):
+            for name in names:
+                if name != "steam_autocloud.vdf":
+                    with open(os.path.join(root, name), "rb") as sf:
+                        data = sf.read()
+                    rel = os.path.relpath(os.path.join(root, name), saves)
+                    f.write(f'\t"saves/{ rel }"\n\t{{\n\t\t"root"\t\t"0"\n\t\t"size"\t\t"{ len(data) }"\n'
+                            f'\t\t"sha"\t\t"{ hashlib.sha1(data).hexdigest() }"\n\t\t"syncstate"\t\t"1"\n\t}}\n')
+        f.write("}\n")
+
+
+"""An Engine for a fake steam install with the GAMES above, which has already found their saves
+"""
+
+
+@pytest.fixture
+def engine(tmp_path):
+    from steamback import Engine, Config
+    steam = make_steam(tmp_path, GAMES)
+    e = Engine(Config(logging.getLogger(), str(tmp_path / "app"), steam))
+    e.auto_set_account_id()
+    asyncio.run(e.find_supported(e.find_all_game_info()))
+    return e
@@ -0,0 +1,85 @@
+import asyncio
+import os
+
+import pytest
+
+from conftest import GAMES, saves_dir
+from steamback import archive
+
+
+def make_archive(tmp_path, files: dict) -> str:
+    path = str(tmp_path / "test.sbar")
+    with archive.ArchiveWriter(path) as w:
+        for name, (data, mode) in files.items():
+            src = tmp_path / name
+            src.write_bytes(data)
+            os.chmod(src, mode)
+            os.utime(src, ns=(1_000_000_123, 1_000_000_123))
+            w.add_file(name, str(src))
+    return path
+
+
+def test_round_trip(tmp_path):
+    files = {"a": (os.urandom(3 * archive._BLOCK + 17), 0o600), "b": (b"b" * 100000, 0o755), "empty": (b"", 0o644)}
+    r = archive.ArchiveReader(make_archive(tmp_path, files))
+    assert sorted(r.names()) == sorted(files)
+    for name in ["b", "empty", "a"]:  # in any order
+        dest = tmp_path / "out"
+        r.extract(name, str(dest))
+        assert dest.read_bytes() == files[name][0]
+        st = os.stat(dest)
+        assert st.st_mode & 0o7777 == files[name][1]
+        assert st.st_mtime_ns == 1_000_000_123
+        os.remove(dest)
+
+
+def test_not_an_archive(tmp_path):
+    path = tmp_path / "x.sbar"
+    path.write_bytes(b"PK\3\4 not ours")
+    with pytest.raises(archive.ArchiveError):
+        archive.ArchiveReader(str(path))
+
+
+def test_truncated(tmp_path):
+    path = make_archive(tmp_path, {"a": (b"hello" * 1000, 0o644)})
+    with open(path, "r+b") as f:
+        f.truncate(os.path.getsize(path) - 10)
+    with pytest.raises(archive.ArchiveError):
+        archive.ArchiveReader(path)
+
+
+def test_corrupt_member(tmp_path):
+    path = make_archive(tmp_path, {"a": (b"hello" * 1000, 0o644), "b": (b"fine", 0o644)})
+    r = archive.ArchiveReader(path)
+    with open(path, "r+b") as f:
+        f.seek(r.files["a"][0])
+        f.write(b"\0\0\0\0")
+    with pytest.raises(archive.ArchiveError):
+        b"".join(r.iter_blocks("a"))
+    assert b"".join(r.iter_blocks("b")) == b"fine"  # the other files are still readable
+
+
+def test_engine_archive_snapshots(engine):
+    engine.snapshot_format = "archive"
+    si = asyncio.run(engine.do_backup(engine.all_games[100]))
+    assert si["format"] == "archive"
+    sbar = engine._saveinfo_to_dir(si) + ".sbar"
+    assert os.path.isfile(sbar)
+
+    saves = saves_dir(engine.get_steam_root(), 100)
+    for name in GAMES[100]:
+        os.remove(os.path.join(saves, name))
+    report = asyncio.run(engine.do_restore(si))
+    assert report["files_written"] == 2
+    for name, data in GAMES[100].items():
+        with open(os.path.join(saves, name), "rb") as f:
+            assert f.read() == data
+
+    assert asyncio.run(engine.do_verify(si))["files_ok"] == 2
+    r = archive.ArchiveReader(sbar)
+    with open(sbar, "r+b") as f:
+        f.seek(r.files[os.path.join("saves", "a.sav")][0])
+        f.write(b"\0\0")
+    report = asyncio.run(engine.do_verify(si))
+    assert report["corrupt"] == [f'{ si["filename"] }/{ os.path.join("saves", "a.sav") }']
+    assert report["files_ok"] == 1
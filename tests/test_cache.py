@@ -0,0 +1,78 @@
+import asyncio
+import logging
+import os
+
+from steamback import Engine, Config
+from steamback.cache import FileCache, RootsCache
+
+
+def new_engine(engine, monkeypatch) -> tuple[Engine, list]:
+    e = Engine(Config(logging.getLogger(), engine.config.app_data_dir, engine.get_steam_root()))
+    e.auto_set_account_id()
+    searched = []
+    find = e._find_save_games_roots
+
+    def counting_find(game_info, rcf):
+        searched.append(game_info["game_id"])
+        return find(game_info, rcf)
+    monkeypatch.setattr(e, "_find_save_games_roots", counting_find)
+    return e, searched
+
+
+def supported(e: Engine) -> list[int]:
+    return sorted(g["game_id"] for g in asyncio.run(e.find_supported(e.find_all_game_info())))
+
+
+def test_roots_are_reused_by_the_next_engine(engine, monkeypatch):
+    e, searched = new_engine(engine, monkeypatch)
+    assert supported(e) == [100, 200]
+    assert searched == []
+    assert e.all_games[100]["save_games_roots"] == engine.all_games[100]["save_games_roots"]
+
+
+def test_a_changed_appmanifest_searches_again(engine, monkeypatch):
+    acf = os.path.join(engine.get_steam_root(), "steamapps", "appmanifest_100.acf")
+    with open(acf) as f:
+        text = f.read()
+    st = os.stat(acf)
+    with open(acf, "w") as f:
+        f.write(text.replace('"name"', '"buildid"\t\t"2"\n\t"name"'))  # an update
+    os.utime(acf, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    e, searched = new_engine(engine, monkeypatch)
+    assert supported(e) == [100, 200]
+    assert searched == [100]
+
+
+def test_file_cache_reloads_changed_files(tmp_path):
+    path = tmp_path / "f"
+    path.write_text("one")
+    loads = []
+    c = FileCache()
+
+    def loader(p):
+        loads.append(p)
+        with open(p) as f:
+            return f.read()
+    assert c.get(str(path), loader) == "one"
+    assert c.get(str(path), loader) == "one"
+    assert len(loads) == 1
+    path.write_text("two")  # the same size, so only the mtime tells them apart
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1))
+    assert c.get(str(path), loader) == "two"
+    assert c.stats() == {"entries": 1, "hits": 1, "misses": 2}
+
+
+def test_roots_cache_persists(tmp_path):
+    path = str(tmp_path / "app" / "roots.json")
+    c = RootsCache(path)
+    c.put(100, ["key", 1], {"/games/100": ""})
+    c.put(200, ["key", 2], None)  # not supported
+    c.save()
+    c = RootsCache(path)
+    assert c.get(100, ["key", 1]) == (True, {"/games/100": ""})
+    assert c.get(200, ["key", 2]) == (True, None)
+    assert c.get(100, ["key", 2]) == (False, None)
+    with open(path, "w") as f:
+        f.write("{ truncated")
+    assert RootsCache(path).get(100, ["key", 1]) == (False, None)
@@ -0,0 +1,70 @@
+import json
+import os
+
+from steamback.catalog import Catalog
+
+
+def make_catalog(tmp_path):
+    saves = tmp_path / "saves2"
+    saves.mkdir()
+
+    def load_all():
+        return [json.loads(p.read_text()) for p in saves.glob("*.json")]
+    return Catalog(str(tmp_path / "catalog.sqlite"), str(saves), load_all), saves
+
+
+def saveinfo(game_id: int, ts: int, is_undo: bool = False) -> dict:
+    return {"game_info": {"game_id": game_id}, "timestamp": ts, "is_undo": is_undo,
+            "filename": f'{ "undo" if is_undo else "save" }_{ game_id }_{ ts }', "size": 10}
+
+
+def write_snapshot(catalog, saves, si):
+    # what Engine does: the json file, the snapshot directory, then the final json
+    with catalog.changing():
+        (saves / (si["filename"] + ".json")).write_text(json.dumps(si))
+        catalog.put(si)
+        (saves / si["filename"]).mkdir()
+        (saves / (si["filename"] + ".json")).write_text(json.dumps(si))
+        catalog.put(si)
+
+
+def test_own_writes_dont_reimport(tmp_path):
+    catalog, saves = make_catalog(tmp_path)
+    assert catalog.all() == []
+    first = catalog.reimports
+    for ts in range(5):
+        write_snapshot(catalog, saves, saveinfo(100, ts))
+        assert len(catalog.list_for_game(100)) == ts + 1
+    assert catalog.reimports == first
+
+    with catalog.changing():
+        os.remove(saves / "save_100_0.json")
+        os.rmdir(saves / "save_100_0")
+        catalog.remove("save_100_0")
+    assert catalog.count() == 4
+    assert catalog.reimports == first
+
+
+def test_foreign_writes_reimport(tmp_path):
+    catalog, saves = make_catalog(tmp_path)
+    write_snapshot(catalog, saves, saveinfo(100, 1))
+    before = catalog.reimports
+
+    # another process adds a snapshot without telling us
+    si = saveinfo(200, 2)
+    (saves / (si["filename"] + ".json")).write_text(json.dumps(si))
+    os.utime(saves, ns=(0, 12345))  # (in case both writes land in the same mtime tick)
+    assert catalog.newest_for_game(200)["filename"] == "save_200_2"
+    assert catalog.reimports == before + 1
+
+
+def test_queries(tmp_path):
+    catalog, saves = make_catalog(tmp_path)
+    for game_id, ts, is_undo in [(100, 1, False), (100, 3, False), (200, 2, False), (100, 4, True)]:
+        write_snapshot(catalog, saves, saveinfo(game_id, ts, is_undo))
+    assert [si["filename"] for si in catalog.all()] == [
+        "undo_100_4", "save_100_3", "save_200_2", "save_100_1"]
+    assert catalog.newest_for_game(100)["filename"] == "save_100_3"
+    assert [si["filename"] for si in catalog.oldest(2)] == ["save_100_1", "save_200_2"]
+    assert catalog.count(is_undo=True) == 1
+    assert catalog.total_size() == 40
@@ -0,0 +1,57 @@
+import asyncio
+import io
+import os
+import random
+
+from conftest import GAMES, saves_dir
+from steamback import chunks
+
+
+def data(n: int, seed: int = 1) -> bytes:
+    return random.Random(seed).randbytes(n)
+
+
+def test_split_reassembles_within_limits():
+    d = data(2 * 1024 * 1024)
+    parts = chunks.split(d)
+    assert b"".join(parts) == d
+    assert all(chunks.MIN_SIZE <= len(p) <= chunks.MAX_SIZE for p in parts[:-1])
+    assert chunks.split(b"") == []
+    assert chunks.split(b"small") == [b"small"]
+
+
+def test_iter_chunks_matches_split():
+    d = data(chunks._READ_SIZE * 2 + 12345)  # so iter_chunks has to refill part way through a chunk
+    assert list(chunks.iter_chunks(io.BytesIO(d))) == chunks.split(d)
+
+
+def test_boundaries_follow_the_contents():
+    d = data(1024 * 1024)
+    before = chunks.split(d)
+    after = chunks.split(d[:1000] + b"inserted" + d[1000:])
+    # only the chunk with the insert changes, the rest are shifted but the same
+    assert len(set(before) - set(after)) == 1
+    assert len(set(after) - set(before)) == 1
+
+
+def test_engine_chunked_files(engine):
+    engine.chunk_threshold = 1000  # just slot1.sav
+    si = asyncio.run(engine.do_backup(engine.all_games[200]))
+    assert si["chunked"]
+    entry = si["manifest"][""][os.path.join("saves", "slot1.sav")]
+    assert len(entry) == 4 and entry[3]
+    assert not os.path.exists(os.path.join(engine._saveinfo_to_dir(si), "saves", "slot1.sav"))
+
+    saves = saves_dir(engine.get_steam_root(), 200)
+    os.remove(os.path.join(saves, "slot1.sav"))
+    assert asyncio.run(engine.do_restore(si))["files_written"] == 1
+    with open(os.path.join(saves, "slot1.sav"), "rb") as f:
+        assert f.read() == GAMES[200]["slot1.sav"]
+
+    assert asyncio.run(engine.do_verify(si))["files_ok"] == 2
+    path = engine.chunk_store.object_path(entry[3][0])
+    os.chmod(path, 0o644)
+    with open(path, "r+b") as f:
+        f.write(b"X")
+    report = asyncio.run(engine.do_verify(si))
+    assert report["corrupt"] == [f'{ si["filename"] }/{ os.path.join("saves", "slot1.sav") }']
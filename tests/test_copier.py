@@ -0,0 +1,86 @@
+import errno
+import os
+
+from steamback import copier
+
+
+def no_reflink(src_fd, dst_fd, size):
+    raise OSError(errno.EOPNOTSUPP, "no reflinks here")
+
+
+def test_short_copy_file_range_falls_back(tmp_path, monkeypatch):
+    monkeypatch.setitem(copier._funcs, "reflink", no_reflink)
+    # like the filesystems which return 0 for data which is there
+    monkeypatch.setattr(copier.os, "copy_file_range", lambda *args: 0)
+    src = tmp_path / "src.sav"
+    src.write_bytes(os.urandom(300 * 1024))
+    c = copier.Copier()
+
+    c.copy2(str(src), str(tmp_path / "a.sav"))
+    assert (tmp_path / "a.sav").read_bytes() == src.read_bytes()
+    assert c.counts["copy_file_range"] == 0
+
+    # and copy_file_range isn't tried again for these devices
+    calls = []
+    monkeypatch.setattr(copier.os, "copy_file_range",
+                        lambda *args: calls.append(args) or 0)
+    c.copy2(str(src), str(tmp_path / "b.sav"))
+    assert (tmp_path / "b.sav").read_bytes() == src.read_bytes()
+    assert calls == []
+
+
+def test_short_everything_uses_copyfile(tmp_path, monkeypatch):
+    monkeypatch.setitem(copier._funcs, "reflink", no_reflink)
+    monkeypatch.setattr(copier.os, "copy_file_range", lambda *args: 0)
+    monkeypatch.setattr(copier.os, "sendfile", lambda *args: 0)
+    src = tmp_path / "src.sav"
+    src.write_bytes(b"x" * 5000)
+    c = copier.Copier()
+    c.copy2(str(src), str(tmp_path / "a.sav"))
+    assert (tmp_path / "a.sav").read_bytes() == src.read_bytes()
+    assert c.counts["copyfile"] == 1
+
+
+def test_forced_strategy_short_copy_raises(tmp_path, monkeypatch):
+    monkeypatch.setattr(copier.os, "copy_file_range", lambda *args: 0)
+    src = tmp_path / "src.sav"
+    src.write_bytes(b"x" * 5000)
+    c = copier.Copier("copy_file_range")
+    try:
+        c.copy2(str(src), str(tmp_path / "a.sav"))
+        assert False, "should have raised"
+    except OSError as e:
+        assert e.errno == errno.EIO
+
+
+def test_empty_file(tmp_path):
+    src = tmp_path / "empty.sav"
+    src.write_bytes(b"")
+    copier.Copier().copy2(str(src), str(tmp_path / "a.sav"))
+    assert (tmp_path / "a.sav").read_bytes() == b""
+
+
+def test_real_errors_arent_hidden_by_a_fallback(tmp_path, monkeypatch):
+    def denied(*args):
+        raise OSError(errno.EPERM, "not allowed")
+    monkeypatch.setitem(copier._funcs, "reflink", no_reflink)
+    monkeypatch.setattr(copier.os, "copy_file_range", denied)
+    src = tmp_path / "src.sav"
+    src.write_bytes(b"x" * 5000)
+    try:
+        copier.Copier().copy2(str(src), str(tmp_path / "a.sav"))
+        assert False, "should have raised"
+    except OSError as e:
+        assert e.errno == errno.EPERM
+
+
+def test_reflink_enotty_means_unsupported(tmp_path, monkeypatch):
+    def enotty(*args):
+        raise OSError(errno.ENOTTY, "Inappropriate ioctl for device")
+    monkeypatch.setattr(copier.fcntl, "ioctl", enotty)
+    src = tmp_path / "src.sav"
+    src.write_bytes(b"x" * 5000)
+    c = copier.Copier()
+    c.copy2(str(src), str(tmp_path / "a.sav"))
+    assert (tmp_path / "a.sav").read_bytes() == src.read_bytes()
+    assert c.counts["reflink"] == 0
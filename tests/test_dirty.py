@@ -0,0 +1,61 @@
+import os
+import time
+
+import pytest
+
+from steamback import inotify
+from steamback.dirty import DirtyTracker
+
+pytestmark = pytest.mark.skipif(
+    not inotify.available(), reason="needs inotify")
+
+
+def make_known(root, names: list[str]) -> dict:
+    files = {}
+    for k in names:
+        path = root / k
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"old")
+        st = os.stat(path)
+        files[k] = ["digest", st.st_size, st.st_mtime_ns]
+    return {str(root): files}
+
+
+def settle():
+    time.sleep(0.1)  # let the tracker's thread read the events
+
+
+def test_untouched_files_stay_clean(tmp_path):
+    known = make_known(tmp_path, ["a.sav", os.path.join("sub", "b.sav")])
+    tracker = DirtyTracker(known)
+    (tmp_path / "a.sav").write_bytes(b"new")
+    settle()
+    assert tracker.finish() == {str(tmp_path): {"a.sav"}}
+
+
+def test_directory_replaced_during_play(tmp_path):
+    b = os.path.join("sub", "deeper", "b.sav")
+    known = make_known(tmp_path, ["a.sav", b])
+    tracker = DirtyTracker(known)
+    # the game moves its old saves aside and writes new ones in a fresh directory
+    os.rename(tmp_path / "sub", tmp_path / "sub.old")
+    (tmp_path / "sub" / "deeper").mkdir(parents=True)
+    (tmp_path / "sub" / "deeper" / "b.sav").write_bytes(b"new")
+    (tmp_path / "sub" / "c.sav").write_bytes(b"new")
+    settle()
+    assert tracker.has_dirty()
+    dirty = tracker.finish()
+    assert dirty is not None
+    assert b in dirty[str(tmp_path)]
+    assert os.path.join("sub", "c.sav") in dirty[str(tmp_path)]
+    assert "a.sav" not in dirty[str(tmp_path)]
+
+
+def test_root_removed(tmp_path):
+    root = tmp_path / "saves"
+    known = make_known(root, ["a.sav"])
+    tracker = DirtyTracker(known)
+    os.rename(root, tmp_path / "elsewhere")
+    settle()
+    assert tracker.has_dirty() is None
+    assert tracker.finish() is None
@@ -0,0 +1,106 @@
+import threading
+
+import pytest
+
+from steamback import governor
+from steamback.governor import IoGovernor, TokenBucket
+
+
+class FakeTime:
+    """A clock which only moves when something sleeps"""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = 0.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, secs: float):
+        self.now += secs
+        self.slept += secs
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    t = FakeTime()
+    monkeypatch.setattr(governor, "time", t)
+    return t
+
+
+def gaming_governor() -> IoGovernor:
+    g = IoGovernor()
+    g.idle_ioprio = False  # (we can't know if the test machine allows it)
+    g.set_game_running(True)
+    g.begin_job(True)
+    return g
+
+
+def test_token_bucket_rate(clock):
+    b = TokenBucket(10)
+    assert b.take(10) == 0  # a full burst is free
+    assert b.take(5) == pytest.approx(0.5)
+    clock.now += 0.5
+    assert b.take(5) == pytest.approx(0.5)  # the first 5 only just paid off
+    clock.now += 100
+    assert b.take(10) == 0  # tokens never build up past the burst
+    assert b.take(1) == pytest.approx(0.1)
+
+
+def test_files_are_throttled_while_a_game_runs(clock):
+    g = gaming_governor()
+    g.game_files_per_sec = 20
+    for i in range(60):
+        g.account(1)
+    assert clock.slept == pytest.approx(2.0)  # 20 in the initial burst, then 20/sec
+    assert g.state()["throttled_secs"] == pytest.approx(2.0)
+
+    g.set_game_running(False)
+    clock.slept = 0
+    for i in range(60):
+        g.account(1)
+    assert clock.slept == 0
+
+
+def test_bytes_are_throttled_while_a_game_runs(clock):
+    g = gaming_governor()
+    for i in range(4):
+        g.account(g.game_bytes_per_sec // 2)
+    assert clock.slept == pytest.approx(1.0)
+
+
+def test_ungoverned_jobs_are_not_throttled(clock):
+    g = gaming_governor()
+    g.begin_job(False)
+    for i in range(1000):
+        g.account(1024 * 1024)
+    assert clock.slept == 0
+    assert g.state()["total_files"] == 1000
+
+
+def test_deletes_have_their_own_limit(clock):
+    g = gaming_governor()
+    g.game_files_per_sec = 2
+    for i in range(30):
+        g.account_delete()
+    assert clock.slept == pytest.approx(0.5)  # 20 in the burst, then 20/sec
+    clock.slept = 0
+    g.account(1)
+    g.account(1)
+    assert clock.slept == 0  # the deletes didn't use up any of the file rate
+    assert (g.state()["total_deletes"], g.state()["total_files"]) == (30, 2)
+
+
+def test_paused_until_the_game_exits():
+    g = gaming_governor()
+    g.pause_during_games = True
+    threading.Timer(0.1, g.set_game_running, [False]).start()
+    g.account(1)
+    assert not g.game_running
+
+    g.set_game_running(True)
+
+    def check():
+        raise InterruptedError()
+    with pytest.raises(InterruptedError):
+        g.account(1, check=check)
@@ -0,0 +1,66 @@
+import asyncio
+import os
+
+from conftest import GAMES, saves_dir, write_saves
+
+B = os.path.join("sub", "b.sav")
+
+
+def backup(engine, game_id: int) -> dict:
+    return asyncio.run(engine.do_backup(engine.all_games[game_id]))
+
+
+def snapshot_path(engine, si: dict, name: str) -> str:
+    return os.path.join(engine._saveinfo_to_dir(si), "saves", name)
+
+
+def two_snapshots(engine) -> tuple[dict, dict]:
+    engine.incremental_snapshots = True
+    first = backup(engine, 100)
+    write_saves(engine.get_steam_root(), 100, {"a.sav": b"changed"}, change_number=2)
+    return first, backup(engine, 100)
+
+
+def test_only_changed_files_are_in_the_snapshot(engine):
+    first, second = two_snapshots(engine)
+    assert not first.get("incremental") and second["incremental"]
+    assert os.path.exists(snapshot_path(engine, second, "a.sav"))
+    assert not os.path.exists(snapshot_path(engine, second, B))
+    # but the manifest still lists every file, referring to the object the first snapshot stored
+    files = second["manifest"][""]
+    assert set(files) == {os.path.join("saves", "a.sav"), os.path.join("saves", B)}
+    assert files[os.path.join("saves", B)][0] == first["manifest"][""][os.path.join("saves", B)][0]
+
+
+def test_restore_reads_unchanged_files_from_the_store(engine):
+    first, second = two_snapshots(engine)
+    saves = saves_dir(engine.get_steam_root(), 100)
+    for name in ("a.sav", B):
+        os.remove(os.path.join(saves, name))
+    asyncio.run(engine.do_restore(second))
+    with open(os.path.join(saves, "a.sav"), "rb") as f:
+        assert f.read() == b"changed"
+    with open(os.path.join(saves, B), "rb") as f:
+        assert f.read() == GAMES[100][B]
+
+
+def test_culling_the_base_keeps_referenced_objects(engine):
+    first, second = two_snapshots(engine)
+    engine.max_saves = 1
+    engine._cull_old_saves(100)
+    assert not os.path.exists(engine._saveinfo_to_dir(first))
+    digest = second["manifest"][""][os.path.join("saves", B)][0]
+    assert os.path.exists(engine.store.object_path(digest))
+    report = asyncio.run(engine.do_verify(second))
+    assert report["files_ok"] == 2 and not report["corrupt"] and not report["missing"]
+
+
+def test_verify_reports_a_corrupt_object(engine):
+    first, second = two_snapshots(engine)
+    path = engine.store.object_path(second["manifest"][""][os.path.join("saves", B)][0])
+    os.chmod(path, 0o644)
+    with open(path, "r+b") as f:
+        f.write(b"W")  # was "w"
+    report = asyncio.run(engine.do_verify(second))
+    assert report["corrupt"] == [f'{ second["filename"] }/{ os.path.join("saves", B) }']
+    assert report["files_ok"] == 1
@@ -0,0 +1,71 @@
+import os
+
+from steamback import vdf
+from steamback.library import LibraryIndex
+
+
+def write_manifest(steam, game_id: int, name: str):
+    path = steam / "steamapps" / f'appmanifest_{ game_id }.acf'
+    existed = path.exists()
+    old = os.stat(path).st_mtime_ns if existed else 0
+    path.write_text(f'"AppState"\n{{\n\t"appid"\t\t"{ game_id }"\n\t"name"\t\t"{ name }"\n}}\n')
+    if existed:
+        # make sure the change shows, whatever the filesystem's timestamp resolution
+        os.utime(path, ns=(old + 1_000_000_000, old + 1_000_000_000))
+
+
+def bump_dir(steam):
+    st = os.stat(steam / "steamapps")
+    os.utime(steam / "steamapps", ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+
+def parse_acf(path: str) -> dict:
+    return vdf.root_block(vdf.load_file(path))
+
+
+def make_library(tmp_path, games: dict):
+    steam = tmp_path / "steam"
+    (steam / "steamapps").mkdir(parents=True)
+    for game_id, name in games.items():
+        write_manifest(steam, game_id, name)
+    return steam
+
+
+def test_only_changed_manifests_are_parsed(tmp_path):
+    steam = make_library(tmp_path, {100: "A", 200: "B"})
+    index, games = LibraryIndex(), {}
+    index.update([str(steam)], games, parse_acf)
+    assert index.parsed == 2
+    info = games[100]
+    assert {g: i["game_name"] for g, i in games.items()} == {100: "A", 200: "B"}
+
+    index.update([str(steam)], games, parse_acf)
+    assert index.parsed == 2  # nothing changed
+
+    write_manifest(steam, 200, "B2")
+    index.update([str(steam)], games, parse_acf)
+    assert index.parsed == 3
+    assert games[200]["game_name"] == "B2"
+    assert games[100] is info  # kept, along with anything we learnt about it
+
+
+def test_added_and_removed_manifests(tmp_path):
+    steam = make_library(tmp_path, {100: "A", 200: "B"})
+    index, games = LibraryIndex(), {}
+    index.update([str(steam)], games, parse_acf)
+
+    write_manifest(steam, 300, "C")
+    os.remove(steam / "steamapps" / "appmanifest_100.acf")
+    bump_dir(steam)
+    r = index.update([str(steam)], games, parse_acf)
+    assert sorted(games) == sorted(i["game_id"] for i in r) == [200, 300]
+    assert index.parsed == 3
+
+
+def test_missing_library_is_skipped(tmp_path):
+    steam = make_library(tmp_path, {100: "A"})
+    index, games = LibraryIndex(), {}
+    index.update([str(steam), str(tmp_path / "sdcard")], games, parse_acf)
+    assert list(games) == [100]
+    index.update([], games, parse_acf)
+    assert games == {}
@@ -0,0 +1,83 @@
+import asyncio
+import subprocess
+import sys
+import time
+
+import pytest
+
+from steamback import procwatch
+from steamback.procwatch import ProcWatcher, game_id_from_cmdline
+
+pytestmark = pytest.mark.skipif(not procwatch.available(), reason="needs /proc")
+
+
+@pytest.fixture
+def fake_game(tmp_path):
+    """A process with the command line of a steam game (reaper SteamLaunch AppId=4242)"""
+    (tmp_path / "SteamLaunch").write_text("import time\ntime.sleep(60)\n")
+    p = subprocess.Popen([sys.executable, "SteamLaunch", "AppId=4242"], cwd=tmp_path)
+    # Popen can return before the exec, while the child still has no command line of its own
+    deadline = time.monotonic() + 10
+    while "SteamLaunch" not in procwatch._read_cmdline(p.pid) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    yield p
+    p.kill()
+    p.wait()
+
+
+def test_game_id_from_cmdline():
+    assert game_id_from_cmdline(["/steam/reaper", "SteamLaunch", "AppId=1318690", "--", "game.exe"]) == 1318690
+    assert game_id_from_cmdline(["/steam/reaper", "SteamLaunch", "AppId=12"]) == 12
+    assert game_id_from_cmdline(["/usr/bin/python3", "SteamLaunch.py", "AppId=12"]) is None
+    assert game_id_from_cmdline(["/steam/reaper", "SteamLaunch"]) is None
+    assert game_id_from_cmdline([]) is None
+
+
+def test_running_games(fake_game):
+    w = ProcWatcher()
+    assert 4242 in w.running_games()
+    w.running_games()  # (which reads every process again, in case we caught one before its exec)
+    read = w.cmdlines_read
+    assert 4242 in w.running_games()
+    assert w.cmdlines_read - read < 10  # from then on only new processes are read
+
+    fake_game.kill()  # still a zombie (we haven't reaped it), but not running the game
+    time.sleep(0.1)
+    assert 4242 not in w.running_games()
+    fake_game.wait()
+    assert 4242 not in w.running_games()
+    w.close()
+
+
+def test_wait_returns_when_a_game_exits(fake_game):
+    w = ProcWatcher()
+    assert 4242 in w.running_games()
+
+    async def wait():
+        asyncio.get_running_loop().call_later(0.1, fake_game.kill)
+        start = time.monotonic()
+        await w.wait(30)
+        return time.monotonic() - start
+    assert asyncio.run(wait()) < 10
+    w.close()
+
+
+def test_follow(fake_game):
+    w = ProcWatcher()
+    seen = []
+
+    async def follow():
+        changed = asyncio.Event()
+
+        def on_change(games):
+            seen.append(4242 in games)
+            changed.set()
+        task = asyncio.create_task(w.follow(on_change, interval=0.05))
+        await asyncio.wait_for(changed.wait(), 10)
+        changed.clear()
+        fake_game.kill()
+        await asyncio.wait_for(changed.wait(), 10)
+        task.cancel()
+    asyncio.run(follow())
+    assert seen == [True, False]
+    w.close()
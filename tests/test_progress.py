@@ -0,0 +1,60 @@
+import asyncio
+import os
+
+from conftest import saves_dir, write_saves
+
+
+def cancel_after(engine, monkeypatch, num_files: int) -> list:
+    cancelled = []
+    account = engine.governor.account
+
+    def cancelling_account(num_bytes, files=1, check=None):
+        if engine.governor.total_files + 1 >= num_files and not cancelled:
+            cancelled.append(engine.cancel())
+        account(num_bytes, files, check)
+    monkeypatch.setattr(engine.governor, "account", cancelling_account)
+    return cancelled
+
+
+def test_progress_of_a_backup(engine):
+    assert engine.get_progress() is None
+    asyncio.run(engine.do_backup(engine.all_games[100]))
+    p = engine.get_progress()
+    assert (p["op"], p["game_id"], p["files_done"], p["files_total"]) == ("backup", 100, 2, 2)
+    assert p["bytes_done"] == p["bytes_total"] == 505
+    assert p["finished"] and not p["cancelled"]
+    assert not engine.cancel()  # nothing to cancel
+
+
+def test_cancel_stops_a_backup_part_way(engine, monkeypatch):
+    write_saves(engine.get_steam_root(), 100, {f'slot{ n }.sav': b"s" * n for n in range(10)})
+    cancelled = cancel_after(engine, monkeypatch, 1)
+    assert asyncio.run(engine.do_backup(engine.all_games[100])) is None
+    assert cancelled == [True]
+    p = engine.get_progress()
+    assert p["cancelled"] and p["finished"]
+    assert p["files_done"] < p["files_total"]
+    # and the partial snapshot was thrown away
+    assert asyncio.run(engine.get_saveinfos()) == []
+    assert [f for f in os.listdir(engine._get_savesdir()) if f.startswith("save_")] == []
+
+
+def test_cancel_a_restore_while_it_makes_the_undo(engine, monkeypatch):
+    si = asyncio.run(engine.do_backup(engine.all_games[100]))
+    write_saves(engine.get_steam_root(), 100, {"a.sav": b"changed"}, change_number=2)
+    # the undo is just a.sav, so the cancel arrives after its last file
+    cancelled = cancel_after(engine, monkeypatch, engine.governor.total_files + 1)
+    assert asyncio.run(engine.do_restore(si)) is None
+    assert cancelled == [True]
+    with open(os.path.join(saves_dir(engine.get_steam_root(), 100), "a.sav"), "rb") as f:
+        assert f.read() == b"changed"  # no game files were touched
+    assert [s["filename"] for s in asyncio.run(engine.get_saveinfos())] == [si["filename"]]
+
+
+def test_restore_cant_be_cancelled_once_writing(engine, monkeypatch):
+    si = asyncio.run(engine.do_backup(engine.all_games[100]))
+    write_saves(engine.get_steam_root(), 100, {"a.sav": b"changed"}, change_number=2)
+    # the undo is one file, so this is the first file the restore itself writes
+    cancelled = cancel_after(engine, monkeypatch, engine.governor.total_files + 2)
+    assert asyncio.run(engine.do_restore(si))["files_written"] == 1
+    assert cancelled == [False]
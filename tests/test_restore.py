@@ -0,0 +1,55 @@
+import asyncio
+import os
+
+from conftest import GAMES, saves_dir, write_saves
+
+A = os.path.join("saves", "a.sav")
+
+
+def backup_and_change(engine, data: bytes) -> dict:
+    si = asyncio.run(engine.do_backup(engine.all_games[100]))
+    write_saves(engine.get_steam_root(), 100, {"a.sav": data}, change_number=2)
+    return si
+
+
+def read_save(engine, name: str) -> bytes:
+    with open(os.path.join(saves_dir(engine.get_steam_root(), 100), name), "rb") as f:
+        return f.read()
+
+
+def undos(engine) -> list[dict]:
+    return [si for si in asyncio.run(engine.get_saveinfos()) if si["is_undo"]]
+
+
+def test_only_changed_files_are_written(engine):
+    si = backup_and_change(engine, b"changed")
+    report = asyncio.run(engine.do_restore(si))
+    assert (report["files_written"], report["files_skipped"]) == (1, 1)
+    assert report["bytes_written"] == len(GAMES[100]["a.sav"])
+    assert read_save(engine, "a.sav") == GAMES[100]["a.sav"]
+    # the undo only holds the file the restore replaced
+    [undo] = undos(engine)
+    assert list(undo["manifest"][""]) == [A]
+    assert undo["partial"]
+
+
+def test_same_size_different_contents_is_rewritten(engine):
+    si = backup_and_change(engine, b"HELLO")  # same size as "hello", but a newer mtime
+    report = asyncio.run(engine.do_restore(si))
+    assert report["files_written"] == 1
+    assert read_save(engine, "a.sav") == b"hello"
+
+
+def test_same_contents_different_mtime_is_skipped(engine):
+    si = backup_and_change(engine, GAMES[100]["a.sav"])
+    report = asyncio.run(engine.do_restore(si))
+    assert (report["files_written"], report["files_skipped"]) == (0, 2)
+    assert [list(u["manifest"][""]) for u in undos(engine)] == [[]]
+
+
+def test_full_restore(engine):
+    engine.differential_restore = False
+    si = backup_and_change(engine, b"changed")
+    report = asyncio.run(engine.do_restore(si))
+    assert (report["files_written"], report["files_skipped"]) == (2, 0)
+    assert read_save(engine, "a.sav") == GAMES[100]["a.sav"]
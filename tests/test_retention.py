@@ -0,0 +1,62 @@
+import asyncio
+
+from conftest import write_saves
+from steamback import retention
+from steamback.retention import HOUR, DAY, Policy
+
+
+def saves(timestamps: list[int], in_session: set[int] = frozenset()) -> list[dict]:
+    # newest first, like Catalog.list_for_game
+    return [{"filename": f'save_100_{ ts }', "timestamp": ts, "in_session": ts in in_session}
+            for ts in sorted(timestamps, reverse=True)]
+
+
+def deleted(sis: list[dict], policy: Policy) -> list[int]:
+    return [si["timestamp"] for si in retention.select_to_delete(sis, policy)]
+
+
+def test_keep_last():
+    assert deleted(saves(range(5)), Policy(keep_last=3)) == [0, 1]  # oldest first
+    assert deleted(saves(range(5)), Policy(keep_last=10)) == []
+    assert deleted([], Policy(keep_last=0)) == []
+
+
+def test_buckets_keep_the_newest_of_each_period():
+    # three saves in each of the last four days
+    sis = saves([day * DAY + hour * HOUR for day in range(4) for hour in (1, 2, 3)])
+    kept = {si["timestamp"] for si in sis} - set(deleted(sis, Policy(keep_last=1, daily=3)))
+    assert kept == {3 * DAY + 3 * HOUR, 2 * DAY + 3 * HOUR, 1 * DAY + 3 * HOUR}
+
+
+def test_in_session_only_keeps_the_newest_few():
+    sis = saves(range(10), in_session={1, 3, 5, 7, 9})
+    # in-session saves don't use up keep_last, and only the newest two of them are kept
+    assert deleted(sis, Policy(keep_last=3, in_session=2)) == [0, 1, 2, 3, 5]
+
+
+def backup_changed(engine, game_id: int, n: int) -> dict:
+    write_saves(engine.get_steam_root(), game_id, {"a.sav": f'v{ n }'.encode()}, change_number=n)
+    return asyncio.run(engine.do_backup(engine.all_games[game_id]))
+
+
+def game_saves(engine, game_id: int) -> list[str]:
+    return [si["filename"] for si in asyncio.run(engine.get_saveinfos())
+            if not si["is_undo"] and si["game_info"]["game_id"] == game_id]
+
+
+def test_one_game_never_evicts_another(engine):
+    engine.max_saves = 2  # per game
+    b = backup_changed(engine, 200, 1)["filename"]
+    for n in range(2, 7):
+        backup_changed(engine, 100, n)
+    assert len(game_saves(engine, 100)) == 2
+    assert game_saves(engine, 200) == [b]
+
+
+def test_quota_keeps_each_games_newest(engine):
+    engine.quota_bytes = 1
+    for n in range(1, 4):
+        backup_changed(engine, 100, n)
+    newest_b = backup_changed(engine, 200, 4)["filename"]
+    assert len(game_saves(engine, 100)) == 1
+    assert game_saves(engine, 200) == [newest_b]
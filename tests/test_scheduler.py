@@ -0,0 +1,97 @@
+import asyncio
+
+from steamback.scheduler import BackupScheduler
+
+
+class FakeEngine:
+    """Records the backups asked for, each one waits until release is set
+    """
+
+    def __init__(self):
+        self.backups = []
+        self.release = asyncio.Event()
+
+    async def do_backup(self, game_info: dict, dry_run: bool = False, in_session: bool = False) -> dict:
+        self.backups.append((game_info["game_id"], in_session))
+        await self.release.wait()
+        return {"filename": f'save_{ game_info["game_id"] }'}
+
+
+def run(scenario):
+    async def main():
+        engine = FakeEngine()
+        scheduler = BackupScheduler(engine, workers=2)
+        await scenario(engine, scheduler)
+    asyncio.run(main())
+
+
+def test_duplicate_requests_are_merged():
+    async def scenario(engine, scheduler):
+        scheduler.submit({"game_id": 1})
+        await asyncio.sleep(0)  # game 1 starts
+        for _ in range(3):
+            scheduler.submit({"game_id": 1})  # queued behind the running backup, then merged
+        scheduler.submit({"game_id": 2})
+        engine.release.set()
+        await scheduler.join()
+        assert sorted(engine.backups) == [(1, False), (1, False), (2, False)]
+        assert scheduler.stats()["coalesced"] == 2
+        assert sorted(si["filename"] for si in scheduler.take_finished()) == [
+            "save_1", "save_1", "save_2"]
+    run(scenario)
+
+
+def test_regular_backup_covers_in_session():
+    async def scenario(engine, scheduler):
+        scheduler.submit({"game_id": 1}, in_session=True)
+        scheduler.submit({"game_id": 1})
+        scheduler.submit({"game_id": 2}, in_session=True)
+        scheduler.submit({"game_id": 2}, in_session=True)
+        engine.release.set()
+        await scheduler.join()
+        assert sorted(engine.backups) == [(1, False), (2, True)]
+    run(scenario)
+
+
+def test_same_game_never_runs_twice_at_once():
+    async def scenario(engine, scheduler):
+        scheduler.submit({"game_id": 1})
+        await asyncio.sleep(0)
+        scheduler.submit({"game_id": 1})
+        await asyncio.sleep(0.01)
+        assert engine.backups == [(1, False)]  # the second waits even though a worker is free
+        engine.release.set()
+        await scheduler.join()
+        assert engine.backups == [(1, False), (1, False)]
+    run(scenario)
+
+
+class FakeProcs:
+    def __init__(self):
+        self.running = []
+
+    def running_games(self) -> list[int]:
+        return self.running
+
+
+def test_watcher_notices_exits_while_watch_game_is_slow(engine):
+    from steamback.util import SteamWatcher
+
+    async def main():
+        release = asyncio.Event()
+
+        async def slow_watch_game(game_info: dict) -> bool:
+            await release.wait()  # i.e. stuck behind a restore on the engine's io thread
+            return True
+        engine.watch_game = slow_watch_game
+        watcher = SteamWatcher(engine)
+        watcher.procs = FakeProcs()
+
+        watcher.procs.running = [100]
+        assert (await asyncio.wait_for(watcher.check_once(), 1)).game_started
+        watcher.procs.running = []
+        await asyncio.wait_for(watcher.check_once(), 1)
+        assert watcher.scheduler.stats()["submitted"] == 1  # the end of session backup
+        release.set()
+        await watcher.scheduler.join()
+    asyncio.run(main())
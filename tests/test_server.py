@@ -0,0 +1,94 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+from steamback import client, server
+
+
+class FakeEngine:
+    """Just enough of Engine for Server to dispatch to
+    """
+
+    async def do_backup(self, game_info: dict, dry_run: bool = False, in_session: bool = False) -> dict:
+        return {"game_id": game_info["game_id"], "dry_run": dry_run, "in_session": in_session}
+
+    async def do_restore(self, save_info: dict) -> dict:
+        raise FileNotFoundError(save_info["filename"])
+
+    async def do_verify(self, save_info: dict, background: bool = False, stop=None) -> dict:
+        return {}
+
+    async def get_saveinfos(self) -> list[dict]:
+        return []
+
+    async def find_supported(self, game_infos: list = None) -> list[dict]:
+        return []
+
+    async def find_mounted(self, dirs: list) -> list[str]:
+        return dirs
+
+    def find_all_game_info(self) -> list[dict]:
+        return [{"thread": threading.current_thread().name}]
+
+
+def dispatch(request) -> dict:
+    s = server.Server(FakeEngine(), "unused")
+    line = request if isinstance(request, bytes) else json.dumps(request).encode()
+    return asyncio.run(s._dispatch(line, None))
+
+
+def call(method: str, params, id=1) -> dict:
+    return dispatch({"jsonrpc": "2.0", "id": id, "method": method, "params": params})
+
+
+def test_results():
+    assert call("find_mounted", [["/a"]]) == {
+        "jsonrpc": "2.0", "id": 1, "result": ["/a"]}
+    assert call("do_backup", {"game_info": {"game_id": 7}, "in_session": True})["result"] == {
+        "game_id": 7, "dry_run": False, "in_session": True}
+    assert call("find_mounted", [["/a"]], id=None) is None  # a notification gets no response
+    # the blocking parts of the engine must not run on the event loop's thread
+    assert call("find_all_game_info", [])["result"][0]["thread"] != threading.current_thread().name
+
+
+@pytest.mark.parametrize("request_, code", [
+    (b"not json", server.PARSE_ERROR),
+    ([1], server.INVALID_REQUEST),
+    ({"id": 1, "method": 3}, server.INVALID_REQUEST),
+    ({"id": 1, "method": "nope"}, server.METHOD_NOT_FOUND),
+    ({"id": 1, "method": "find_mounted", "params": 3}, server.INVALID_PARAMS),
+    ({"id": 1, "method": "find_mounted", "params": []}, server.INVALID_PARAMS),
+    ({"id": 1, "method": "do_backup", "params": {"nope": 1}}, server.INVALID_PARAMS),
+    ({"id": 1, "method": "do_restore", "params": [{"filename": "x"}]}, server.SERVER_ERROR),
+])
+def test_errors(request_, code):
+    assert dispatch(request_)["error"]["code"] == code
+
+
+@pytest.mark.skipif(not server.available(), reason="needs unix domain sockets")
+def test_client_round_trip(tmp_path):
+    async def main():
+        s = server.Server(FakeEngine(), str(tmp_path / "steamback.sock"))
+        await s.start()
+        c = await client.try_connect(s.path)
+        try:
+            assert (await c.do_backup({"game_id": 7}, in_session=True))["in_session"]
+            with pytest.raises(client.RemoteError) as e:
+                await c.do_restore({"filename": "x"})
+            assert e.value.code == server.SERVER_ERROR
+
+            got = asyncio.Event()
+
+            def broken(params):
+                raise RuntimeError("a bad subscriber")
+            await c.subscribe("backup", broken)
+            await c.subscribe("backup", lambda params: got.set())
+            s._notify("backup", {"game_info": {}, "saveinfo": None})
+            await asyncio.wait_for(got.wait(), 5)
+            assert await c.find_mounted(["/a"]) == ["/a"]  # still connected
+        finally:
+            await c.close()
+            await s.close()
+    asyncio.run(main())
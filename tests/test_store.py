@@ -0,0 +1,59 @@
+import hashlib
+import os
+
+from steamback.store import ObjectStore, hash_file
+
+
+def sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def test_add_dedups(tmp_path):
+    store = ObjectStore(str(tmp_path / "objects"))
+    (tmp_path / "a.sav").write_bytes(b"same")
+    (tmp_path / "b.sav").write_bytes(b"same")
+    d1 = store.add(str(tmp_path / "a.sav"), str(tmp_path / "snap1"))
+    d2 = store.add(str(tmp_path / "b.sav"), str(tmp_path / "snap2"))
+    assert d1 == d2 == sha256(b"same")
+    assert os.stat(tmp_path / "snap1").st_ino == os.stat(tmp_path / "snap2").st_ino
+    assert os.stat(store.object_path(d1)).st_nlink == 3
+
+
+def test_add_names_object_by_what_was_copied(tmp_path):
+    src = tmp_path / "live.sav"
+    src.write_bytes(b"before")
+
+    def copy_while_game_writes(s, d):
+        src.write_bytes(b"after")  # the game saves between our hashing and our copying
+        with open(s, "rb") as fs, open(d, "wb") as fd:
+            fd.write(fs.read())
+    store = ObjectStore(str(tmp_path / "objects"), copy_while_game_writes)
+    digest = store.add(str(src), str(tmp_path / "snap"))
+    assert digest == sha256(b"after")
+    assert hash_file(store.object_path(digest)) == digest
+    assert not store.has(sha256(b"before"))
+    assert not list((tmp_path / "objects").glob("*/*.tmp"))
+
+
+def test_unlinked_and_remove(tmp_path):
+    store = ObjectStore(str(tmp_path / "objects"))
+    for name in ["keep", "drop", "manifest_only"]:
+        (tmp_path / name).write_bytes(name.encode())
+    keep = store.add(str(tmp_path / "keep"), str(tmp_path / "snap_keep"))
+    drop = store.add(str(tmp_path / "drop"), str(tmp_path / "snap_drop"))
+    manifest_only = store.add(
+        str(tmp_path / "manifest_only"), str(tmp_path / "snap_manifest_only"))
+    os.remove(tmp_path / "snap_drop")
+    os.remove(tmp_path / "snap_manifest_only")
+    unlinked = store.unlinked([keep, drop, manifest_only, sha256(b"never stored")])
+    assert unlinked == {drop, manifest_only}
+    # (what Engine does: objects an incremental manifest still refers to are kept)
+    assert store.remove(unlinked - {manifest_only}) == 1
+    assert store.has(keep) and store.has(manifest_only) and not store.has(drop)
+
+
+def test_add_bytes(tmp_path):
+    store = ObjectStore(str(tmp_path / "objects"))
+    digest = store.add_bytes(b"chunk")
+    assert digest == sha256(b"chunk") and store.has(digest)
+    assert store.add_bytes(b"chunk") == digest
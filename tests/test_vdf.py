@@ -0,0 +1,42 @@
+import io
+
+import pytest
+
+from steamback import vdf
+from steamback.bench import write_remotecache
+
+
+def read_both(tmp_path, text: str) -> tuple:
+    path = tmp_path / "remotecache.vdf"
+    path.write_text(text)
+    return vdf.read_remotecache(str(path)), vdf._read_remotecache_tokens(io.StringIO(text), str(path))
+
+
+def test_matches_tokenizer(tmp_path):
+    path = tmp_path / "remotecache.vdf"
+    write_remotecache(str(path), 300)  # (with some escaped quotes)
+    fast, tokens = read_both(tmp_path, path.read_text())
+    assert fast.change_number == tokens.change_number == -6703994677807818784
+    assert fast.paths == tokens.paths
+    assert fast.entries == tokens.entries
+    assert fast.entries[100].path == 'worlds/world100/save "100".db'
+
+
+@pytest.mark.parametrize("text", [
+    # a comment, braces in a name, a bare word and fields in an unusual order
+    '"1"\n{\n// hi\n\t"a"\n\t{\n\t\t"size"\t"3"\n\t}\n}\n',
+    '"1"\n{\n\t"a}b"\n\t{\n\t\t"size"\t"3"\n\t}\n}\n',
+    '"1"\n{\n\t"a"\n\t{\n\t\t"size"\t3\n\t}\n\t"ChangeNumber"\t"7"\n}\n',
+    '"1"\n{\n\t"a"\n\t{\n\t\t"root"\t"1"\n\t\t"size"\t"x"\n\t}\n\t"b"\n\t{\n\t\t"size"\t"2"\n\t\t"root"\t"1"\n\t}\n}\n',
+])
+def test_unusual_files(tmp_path, text):
+    fast, tokens = read_both(tmp_path, text)
+    assert (fast.change_number, fast.paths, fast.entries) == (
+        tokens.change_number, tokens.paths, tokens.entries)
+
+
+def test_malformed(tmp_path):
+    path = tmp_path / "remotecache.vdf"
+    path.write_text('"1"\n{\n\t"a"\n\t{\n\t\t"size"\t"3"\n\t}\n')
+    with pytest.raises(vdf.VdfError):
+        vdf.read_remotecache(str(path))
@@ -0,0 +1,98 @@
+import asyncio
+import os
+import threading
+import time
+
+from steamback import util, verify
+
+A = os.path.join("saves", "a.sav")
+B = os.path.join("saves", "sub", "b.sav")
+
+
+def backup(engine, game_id: int = 100) -> dict:
+    return asyncio.run(engine.do_backup(engine.all_games[game_id]))
+
+
+def test_clean_snapshot(engine):
+    si = backup(engine)
+    report = asyncio.run(engine.do_verify(si))
+    assert report == {"files_ok": 2, "bytes_ok": 505, "corrupt": [], "missing": [], "unverified": 0,
+                      "filename": si["filename"]}
+
+
+def test_corrupt_and_missing(engine):
+    si = backup(engine)
+    d = engine._saveinfo_to_dir(si)
+    path = os.path.join(d, B)
+    os.chmod(path, 0o644)
+    with open(path, "r+b") as f:
+        f.seek(100)
+        f.write(b"W")
+    # gone from both the snapshot and the store
+    digest = si["manifest"][""][A][0]
+    os.remove(os.path.join(d, A))
+    os.remove(engine.store.object_path(digest))
+    report = asyncio.run(engine.do_verify(si))
+    assert report["corrupt"] == [f'{ si["filename"] }/{ B }']
+    assert report["missing"] == [f'{ si["filename"] }/{ A }']
+    assert report["files_ok"] == 0
+
+
+def test_old_snapshots_use_steams_hashes(engine):
+    si = backup(engine)
+    del si["manifest"]  # like a snapshot from before we kept manifests
+    assert asyncio.run(engine.do_verify(si))["files_ok"] == 2
+    path = os.path.join(engine._saveinfo_to_dir(si), A)
+    os.chmod(path, 0o644)
+    with open(path, "wb") as f:
+        f.write(b"HELLO")
+    assert asyncio.run(engine.do_verify(si))["corrupt"] == [f'{ si["filename"] }/{ A }']
+
+
+def test_throttle():
+    t = verify.Throttle(100000)
+    start = time.monotonic()
+    for i in range(3):
+        t.consume(10000)
+    assert time.monotonic() - start >= 0.2  # the first read is free, the others wait for the one before
+
+
+def test_scrubber_verifies_every_snapshot(engine, monkeypatch):
+    backup(engine, 100)
+    backup(engine, 200)
+    verified = []
+    do_verify = engine.do_verify
+
+    async def recording_verify(si, background=False, stop=None):
+        assert background
+        verified.append(si["filename"])
+        return await do_verify(si, background, stop)
+    monkeypatch.setattr(engine, "do_verify", recording_verify)
+
+    s = util.Scrubber(engine)
+    assert s.time_until_due() > 0
+    s._next = 0
+    assert s.time_until_due() == 0
+
+    async def scrub():
+        while s.time_until_due() == 0:
+            await s.start()
+        assert not s.is_running()
+    asyncio.run(scrub())
+    assert sorted(verified) == sorted(si["filename"] for si in asyncio.run(engine.get_saveinfos()))
+    assert s.time_until_due() > s.interval - 60  # not again until the next interval
+
+
+def test_stopped_scrub_is_retried(engine):
+    si = backup(engine)
+    s = util.Scrubber(engine)
+    s._next = 0
+    stop = threading.Event()
+    stop.set()
+    asyncio.run(s.step(stop))
+    assert s._queue == [si["filename"]]  # interrupted, so still to do
+    asyncio.run(s.step())
+    assert s._queue == []
+
+    s.postpone(100)
+    assert s.time_until_due() >= 99
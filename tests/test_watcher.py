@@ -0,0 +1,45 @@
+import asyncio
+import errno
+
+import pytest
+
+from conftest import write_saves
+from steamback import inotify, util
+
+
+def test_falls_back_without_inotify(engine, monkeypatch):
+    monkeypatch.setattr(inotify, "available", lambda: False)
+    w = util.make_watcher(engine)
+    assert isinstance(w, util.SteamWatcher)
+    assert w.session_interval is None
+
+
+def test_falls_back_when_inotify_fails(engine, monkeypatch):
+    def no_instances_left():
+        raise OSError(errno.EMFILE, "Too many open files")
+    monkeypatch.setattr(inotify, "available", lambda: True)
+    monkeypatch.setattr(inotify, "Inotify", no_instances_left)
+    assert isinstance(util.make_watcher(engine), util.SteamWatcher)
+
+
+def test_in_session_snapshots_need_the_steam_watcher(engine):
+    w = util.make_watcher(engine, 600)
+    assert isinstance(w, util.SteamWatcher)
+    assert w.session_interval == 600
+
+
+@pytest.mark.skipif(not inotify.available(), reason="needs inotify")
+def test_backs_up_when_steam_rewrites_the_remotecache(engine):
+    w = util.make_watcher(engine)
+    assert isinstance(w, util.RemoteCacheWatcher)
+    w.debounce = 0
+
+    async def main():
+        assert await w.check_once() == []
+        write_saves(engine.get_steam_root(), 200, {"slot1.sav": b"synced"}, change_number=2)
+        await w.check_once()
+        await w.scheduler.join()
+        return w.scheduler.take_finished()
+    [si] = asyncio.run(main())
+    assert si["game_info"]["game_id"] == 200
+    w.inotify.close()